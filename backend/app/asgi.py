@@ -0,0 +1,143 @@
+"""ASGI entrypoint: the async chat stream in front of the Flask app.
+
+`GET /api/chat/message` is served by the asyncio pipeline
+(`AsyncChatService`), every other route is passed through to Flask. Run it
+with uvicorn from the backend directory:
+
+    uvicorn app.asgi:app --host 0.0.0.0 --port 5000
+
+`python main.py` / `flask run` keep serving the sync pipeline.
+"""
+
+from a2wsgi import WSGIMiddleware
+from app import create_app
+from app.chat.admission import AdmissionRejected, admission
+from app.chat.async_services import AsyncChatService
+from app.chat.services import conversations
+from app.chat.utils.sse import acoalesce, frame
+from app.config import Config
+from contextlib import aclosing
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+import json
+
+flask_app = create_app()
+chat_service = AsyncChatService(flask_app)
+
+
+def session_user_id(request) -> int | None:
+    """Read `user_id` from the Flask session cookie
+
+    Args:
+        request (Request): The incoming request
+
+    Returns:
+        int | None: The logged in user's id, None if there is no valid session
+    """
+    serializer = SecureCookieSessionInterface().get_signing_serializer(flask_app)
+    cookie = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if serializer is None or not cookie:
+        return None
+    max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+    try:
+        return serializer.loads(cookie, max_age=max_age).get("user_id")
+    except BadSignature:
+        return None
+
+
+async def send_message(request):
+    user_id = session_user_id(request)
+    if user_id is None:
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    message = request.query_params.get("message")
+    if not message:
+        return JSONResponse({"error": "Message required"}, status_code=400)
+    try:
+        session_id = int(request.query_params["session_id"])
+    except KeyError:
+        session_id = None
+    except ValueError:
+        return JSONResponse({"error": "Invalid session_id"}, status_code=400)
+    # admitted before the history is loaded, so a refused turn costs no
+    # database work
+    try:
+        ticket = admission.admit(user_id)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            {"error": "Too many requests", "reason": e.reason},
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        conversation = await chat_service.in_app_context(
+            conversations.get, user_id, session_id
+        )
+    except BaseException:
+        admission.finish(ticket)
+        raise
+    if conversation is None:
+        admission.finish(ticket)
+        return JSONResponse({"error": "Chat session not found"}, status_code=404)
+    # one turn per conversation at a time, a second one would interleave its
+    # messages with the first one's
+    if not conversation.start_turn():
+        admission.finish(ticket)
+        return JSONResponse(
+            {"error": "A reply is already in progress"}, status_code=409
+        )
+
+    def end_turn():
+        conversation.end_turn()
+        admission.finish(ticket)
+
+    async def generate_response():
+        session_event = {"type": "session", "session_id": conversation.session_id}
+        try:
+            yield frame(json.dumps(session_event))
+            # a queued turn reports its place until a slot frees up
+            async for position in admission.aqueue_positions(ticket):
+                yield frame(json.dumps({"type": "queue", "position": position}))
+            frames = acoalesce(
+                chat_service.process_message(message, conversation),
+                Config.SSE_COALESCE_WINDOW,
+                Config.SSE_COALESCE_MAX_CHARS,
+            )
+            # closing the frames cancels the turn if the client went away
+            async with aclosing(frames):
+                async for chunk in frames:
+                    yield chunk
+        except AdmissionRejected as e:
+            busy = {
+                "type": "error",
+                "text": "Server busy",
+                "retry_after": e.retry_after,
+            }
+            yield frame(json.dumps(busy))
+        except Exception as e:
+            yield frame(json.dumps({"type": "error", "text": str(e)}))
+        finally:
+            end_turn()
+
+    return StreamingResponse(
+        generate_response(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "http://localhost:5173",
+            "Access-Control-Allow-Credentials": "true",
+        },
+        # also frees the ticket if the stream never started
+        background=BackgroundTask(end_turn),
+    )
+
+
+app = Starlette(
+    routes=[
+        Route("/api/chat/message", send_message, methods=["GET"]),
+        Mount("/", app=WSGIMiddleware(flask_app)),
+    ]
+)
@@ -0,0 +1,260 @@
+"""Admission control for chat turns.
+
+At most `CHAT_MAX_CONCURRENT_TURNS` turns run at once per process, further
+turns wait in a short FIFO queue (`CHAT_MAX_QUEUED_TURNS`, at most one
+waiting turn per user) for up to `CHAT_QUEUE_TIMEOUT` seconds. Each user also
+has a token bucket of `CHAT_USER_BURST` turns refilled at
+`CHAT_USER_TURNS_PER_MINUTE`. Requests over either limit are rejected with a
+retry delay, which the routes send as a 429 with `Retry-After`.
+
+The controller is thread safe and serves both the Flask (threads) and the
+ASGI (asyncio) stream. Only the ASGI stream queues: a queued Flask turn would
+hold a worker thread while it waits, so Flask turns are rejected when every
+slot is taken.
+"""
+
+from app.chat.metrics import ACTIVE_TURNS, QUEUE_DEPTH, QUEUE_WAIT, REJECTED_TURNS
+from app.config import Config
+from collections import OrderedDict, deque
+import asyncio
+import math
+import threading
+import time
+
+
+class AdmissionRejected(Exception):
+    """A turn was refused, `retry_after` is the suggested delay in seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`burst` tokens, refilled at `rate` tokens per second"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is free
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class Ticket:
+    """A turn's place in the queue, admitted once it holds a slot"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.enqueued = time.monotonic()
+        self.admitted_at: float | None = None
+        self.finished = False
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def admitted(self) -> bool:
+        return self.admitted_at is not None
+
+    def _wake(self):
+        for loop, event in self._waiters:
+            loop.call_soon_threadsafe(event.set)
+
+
+class AdmissionController:
+    """Global concurrency limit, bounded wait queue and per user rate limits"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 16,
+        max_queue: int = 32,
+        queue_timeout: float = 30,
+        user_turns_per_minute: float = 10,
+        user_burst: int = 3,
+        max_users: int = 10000,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_turns_per_minute / 60
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._queue: deque[Ticket] = deque()
+        self._running = 0
+        self._buckets: OrderedDict[object, TokenBucket] = OrderedDict()
+        # moving average of turn durations, used to estimate Retry-After
+        self._turn_seconds = 10.0
+
+    def admit(self, user_id, queue: bool = True) -> Ticket:
+        """Take a slot for a turn, or a place in the queue
+
+        Args:
+            user_id: The user starting the turn
+            queue (bool): Wait in the queue when every slot is taken, False
+                rejects the turn instead
+
+        Returns:
+            Ticket: Admitted right away or queued, see `aqueue_positions`
+
+        Raises:
+            AdmissionRejected: Every slot is taken and `queue` is False, the
+                queue is full, the user already has a turn waiting or is over
+                their rate limit
+        """
+        with self._lock:
+            ticket = Ticket(user_id)
+            if self._running >= self.max_concurrent:
+                if not queue:
+                    raise self._reject("busy", self._retry_after())
+                if len(self._queue) >= self.max_queue:
+                    raise self._reject("queue_full", self._retry_after())
+                if any(t.user_id == user_id for t in self._queue):
+                    raise self._reject("already_queued", self._retry_after())
+            wait = self._bucket(user_id).take()
+            if wait:
+                raise self._reject("rate_limited", wait)
+            if self._running < self.max_concurrent:
+                self._start(ticket)
+            else:
+                self._queue.append(ticket)
+                QUEUE_DEPTH.set(len(self._queue))
+            return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1 based place of a queued ticket, 0 once it is admitted"""
+        with self._lock:
+            if ticket.admitted or ticket.finished:
+                return 0
+            return self._queue.index(ticket) + 1
+
+    def finish(self, ticket: Ticket):
+        """Free the ticket's slot or queue place, safe to call more than once"""
+        with self._lock:
+            self._release(ticket)
+
+    async def aqueue_positions(self, ticket: Ticket, interval: float = 1.0):
+        """Wait for a queued ticket's slot, yielding its place when it changes
+
+        Waits on the event loop without holding a thread.
+
+        Args:
+            ticket (Ticket): The ticket from `admit`
+            interval (float): Seconds between position checks
+
+        Yields:
+            int: The ticket's place in the queue
+
+        Raises:
+            AdmissionRejected: No slot freed up within `queue_timeout`
+        """
+        event = asyncio.Event()
+        ticket._waiters.append((asyncio.get_running_loop(), event))
+        last = None
+        while True:
+            position = self.position(ticket)
+            if position == 0:
+                return
+            if position != last:
+                last = position
+                yield position
+            try:
+                await asyncio.wait_for(event.wait(), self._wait_time(ticket, interval))
+            except asyncio.TimeoutError:
+                pass
+            self._check_timeout(ticket)
+
+    def stats(self) -> dict:
+        """Current load, used to tune the limits
+
+        Returns:
+            dict: Running and queued turns and the configured limits
+        """
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": len(self._queue),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "avg_turn_seconds": round(self._turn_seconds, 2),
+                "retry_after": self._retry_after(),
+            }
+
+    def _release(self, ticket: Ticket):
+        if ticket.finished:
+            return
+        ticket.finished = True
+        if not ticket.admitted:
+            self._queue.remove(ticket)
+            QUEUE_DEPTH.set(len(self._queue))
+            return
+        self._running -= 1
+        duration = time.monotonic() - ticket.admitted_at
+        self._turn_seconds = 0.9 * self._turn_seconds + 0.1 * duration
+        if self._queue:
+            self._start(self._queue.popleft())
+            QUEUE_DEPTH.set(len(self._queue))
+        ACTIVE_TURNS.set(self._running)
+
+    def _start(self, ticket: Ticket):
+        ticket.admitted_at = time.monotonic()
+        self._running += 1
+        ACTIVE_TURNS.set(self._running)
+        QUEUE_WAIT.observe(ticket.admitted_at - ticket.enqueued)
+        ticket._wake()
+
+    def _bucket(self, user_id) -> TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(
+                self.user_rate, self.user_burst
+            )
+            # forgotten users start over with a full bucket
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(user_id)
+        return bucket
+
+    def _retry_after(self) -> int:
+        # time for the queue ahead of a new turn to drain
+        turns = len(self._queue) + 1
+        return max(1, math.ceil(self._turn_seconds * turns / self.max_concurrent))
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        REJECTED_TURNS.labels(reason).inc()
+        return AdmissionRejected(reason, max(1, math.ceil(min(retry_after, 3600))))
+
+    def _wait_time(self, ticket: Ticket, interval: float) -> float:
+        left = self.queue_timeout - (time.monotonic() - ticket.enqueued)
+        return max(0.0, min(interval, left))
+
+    def _check_timeout(self, ticket: Ticket):
+        with self._lock:
+            if ticket.admitted or ticket.finished:
+                return
+            if time.monotonic() - ticket.enqueued >= self.queue_timeout:
+                self._release(ticket)
+                raise self._reject("timeout", self._retry_after())
+
+
+admission = AdmissionController(
+    max_concurrent=Config.CHAT_MAX_CONCURRENT_TURNS,
+    max_queue=Config.CHAT_MAX_QUEUED_TURNS,
+    queue_timeout=Config.CHAT_QUEUE_TIMEOUT,
+    user_turns_per_minute=Config.CHAT_USER_TURNS_PER_MINUTE,
+    user_burst=Config.CHAT_USER_BURST,
+)
@@ -0,0 +1,169 @@
+from app.chat.conversations import Conversation
+from app.chat.metrics import TurnTimer, observe_usage
+from app.chat.services import ChatService, conversations, tool_executor
+from app.chat.utils.clients import get_async_openai_client
+from app.tracing import tracer
+from contextlib import aclosing
+import asyncio
+import contextvars
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncChatService(ChatService):
+    """asyncio version of the chat pipeline, served by `app.asgi`
+
+    Model streams go through the AsyncOpenAI client, so a turn waiting on the
+    model holds no thread and one worker can serve many SSE sessions. Tools
+    stay sync (Composio's SDK has no async client and recommend uses the
+    database session) and run on the shared `tool_executor`, each call in
+    its own app context.
+
+    Tool tracking, parsing and the chat history are shared with ChatService,
+    so both pipelines emit the same events.
+    """
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.app = app
+        self.allm = get_async_openai_client()
+
+    async def process_message(self, message, conversation: Conversation):
+        """Processes a message
+
+        A client disconnect cancels the turn like `ChatService.process_message`.
+
+        Args:
+            message (str): The message to process
+            conversation (Conversation): The user's chat session
+
+        Yields:
+            dict | str: The same events as `ChatService.process_message`
+        """
+        pending = {}
+        with tracer.span(
+            "chat_turn", pipeline="async", session_id=conversation.session_id
+        ) as span:
+            try:
+                turn = self._process_message(message, conversation, pending)
+                async with aclosing(turn):
+                    async for chunk in turn:
+                        yield chunk
+            # starlette cancels the response task when the client disconnects
+            except (asyncio.CancelledError, GeneratorExit):
+                cancelled = self.cancel_turn(pending, conversation, "async")
+                span.set(cancelled=True, tools_cancelled=cancelled)
+                raise
+
+    async def _process_message(
+        self, message, conversation: Conversation, pending: dict
+    ):
+        timer = TurnTimer("async")
+        # add user message to chat history
+        conversation.add("user", message)
+        logger.debug("process_message called with message: %s", message)
+
+        # keep track of tool calls, each one is dispatched to the tool pool as
+        # soon as its arguments are complete, while the model keeps streaming
+        tool_calls = {}
+        loop = asyncio.get_running_loop()
+        results = {}
+        answer = []
+        with tracer.span("model_stream", call="initial") as span:
+            # stream the response, closed early if the client disconnects
+            stream = await self.allm.responses.create(
+                model=self.model_name,
+                input=self.context_window.fit(conversation.messages),
+                tools=self.tools,
+                tool_choice="auto",
+                stream=True,
+            )
+            async with stream:
+                events = 0
+                async for event in stream:
+                    events += 1
+                    if event.type == "response.output_text.delta":
+                        timer.token()
+                        yield {"type": "init_response", "text": event.delta}
+                        answer.append(event.delta)
+                    elif event.type == "response.completed":
+                        observe_usage(event.response, "initial")
+                    else:
+                        tool_idx = self.track_tool_call(tool_calls, event)
+                        request = (
+                            self.tool_request(tool_idx, tool_calls[tool_idx])
+                            if tool_idx is not None
+                            else None
+                        )
+                        if request is not None:
+                            tool_name, parsed_args = request
+                            # a context copy keeps the tool in this turn's trace
+                            future = loop.run_in_executor(
+                                tool_executor,
+                                contextvars.copy_context().run,
+                                self.run_tool,
+                                tool_name,
+                                parsed_args,
+                                self.app,
+                            )
+                            pending[future] = (tool_idx, tool_name, parsed_args)
+                            yield self.tool_use_event(tool_name, parsed_args)
+
+                    # yield results of tools that finished while the model streams
+                    for future in [f for f in pending if f.done()]:
+                        yield self.tool_result_event(
+                            results, pending.pop(future), future
+                        )
+            span.set(events=events, tool_calls=len(tool_calls))
+
+        # wait for the remaining tools, results stream out as they finish
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: pending[f][0]):
+                yield self.tool_result_event(results, pending.pop(future), future)
+
+        self.add_tool_results(conversation, results)
+
+        # IF we called tools we must form a final response from their results
+        if tool_calls:
+            with tracer.span("model_stream", call="final") as span:
+                final_stream = await self.allm.responses.create(
+                    model=self.model_name,
+                    input=self.context_window.fit(conversation.messages),
+                    stream=True,
+                )
+                async with final_stream:
+                    events = 0
+                    async for ev in final_stream:
+                        events += 1
+                        if ev.type == "response.output_text.delta":
+                            timer.token()
+                            yield {"type": "final_response", "text": ev.delta}
+                            answer.append(ev.delta)
+                        elif ev.type == "response.completed":
+                            observe_usage(ev.response, "final")
+                span.set(events=events)
+
+        if answer:
+            conversation.add("assistant", "".join(answer))
+        await self.in_app_context(conversations.save, conversation)
+        timer.done()
+
+    async def in_app_context(self, func, *args):
+        """Run a sync, database backed call on a worker thread
+
+        Args:
+            func (callable): The function to call
+            *args: Its arguments
+
+        Returns:
+            Any: What `func` returned
+        """
+
+        def call():
+            with self.app.app_context():
+                return func(*args)
+
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(None, context.run, call)
@@ -0,0 +1,167 @@
+from functools import lru_cache
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts fall back to an estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# per message framing tokens (role, separators) added by the chat format
+MESSAGE_OVERHEAD = 4
+# rough characters per token for english text, used without tiktoken
+CHARS_PER_TOKEN = 4
+TRUNCATED = " ... [truncated]"
+TOOL_RESULT_PREFIX = "TOOL_NAME:"
+
+
+class ContextWindow:
+    """Fit a conversation into a prompt token budget
+
+    The first (developer) message is always kept. The newest messages are
+    kept until `budget` tokens are used, tool results longer than
+    `tool_result_tokens` are truncated first. Dropped turns are replaced by
+    a short note listing what the user asked earlier, at most
+    `summary_tokens` long, so the model keeps the gist without the cost.
+
+    Tokens are counted with tiktoken when it is installed, otherwise
+    estimated from the text length.
+    """
+
+    def __init__(
+        self,
+        budget: int = 8000,
+        tool_result_tokens: int = 1500,
+        summary_tokens: int = 300,
+        model: str = "gpt-4.1-mini",
+    ):
+        self.budget = budget
+        self.tool_result_tokens = tool_result_tokens
+        self.summary_tokens = summary_tokens
+        self.encoding = _encoding(model)
+        self._count = lru_cache(maxsize=4096)(self._count_uncached)
+
+    def count(self, text: str) -> int:
+        """Count the tokens of a text
+
+        Args:
+            text (str): The text
+
+        Returns:
+            int: The number of tokens
+        """
+        return self._count(text)
+
+    def message_tokens(self, message: dict) -> int:
+        """Count the tokens a message adds to the prompt"""
+        return self.count(message["content"]) + MESSAGE_OVERHEAD
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut a text down to at most `max_tokens` tokens
+
+        Args:
+            text (str): The text
+            max_tokens (int): The token limit
+
+        Returns:
+            str: The text, marked as truncated if it was cut
+        """
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return self.encoding.decode(tokens[:max_tokens]) + TRUNCATED
+        return text[: max_tokens * CHARS_PER_TOKEN] + TRUNCATED
+
+    def fit(self, messages: list[dict]) -> list[dict]:
+        """Select the messages to send to the model
+
+        Args:
+            messages (list[dict]): The conversation, the pinned developer
+                prompt first
+
+        Returns:
+            list[dict]: A new list within the budget, the input is not changed
+        """
+        if not messages:
+            return []
+        pinned, history = messages[0], [self._clip(m) for m in messages[1:]]
+        used = self.message_tokens(pinned)
+        if used + sum(self.message_tokens(m) for m in history) <= self.budget:
+            return [pinned] + history
+
+        # keep the newest messages, leaving room for the summary
+        kept = []
+        for message in reversed(history):
+            tokens = self.message_tokens(message)
+            if not kept:
+                # the newest message is always sent, cut down if need be
+                if used + tokens > self.budget:
+                    room = max(self.budget - used - MESSAGE_OVERHEAD, 1)
+                    content = self.truncate(message["content"], room)
+                    message = {**message, "content": content}
+                    tokens = self.message_tokens(message)
+            elif used + tokens > self.budget - self.summary_tokens:
+                break
+            kept.append(message)
+            used += tokens
+
+        dropped = history[: len(history) - len(kept)]
+        summary = self.summarize(dropped)
+        logger.debug(
+            "Context window dropped %d messages, %d tokens", len(dropped), used
+        )
+        return [pinned] + ([summary] if summary else []) + kept[::-1]
+
+    def summarize(self, messages: list[dict]) -> dict | None:
+        """Note what the user asked in the dropped messages
+
+        Args:
+            messages (list[dict]): The dropped messages, oldest first
+
+        Returns:
+            dict | None: A developer message, None if there is nothing to note
+        """
+        asked = [m["content"] for m in messages if m["role"] == "user"]
+        if not asked:
+            return None
+        header = "Earlier in this conversation (older messages omitted) the user asked:"
+        lines, used = [], self.count(header)
+        # the most recent questions are the most useful, keep those
+        for question in reversed(asked):
+            line = "- " + self.truncate(" ".join(question.split()), 40)
+            tokens = self.count(line)
+            if used + tokens > self.summary_tokens:
+                break
+            lines.append(line)
+            used += tokens
+        if not lines:
+            return None
+        return {"role": "developer", "content": "\n".join([header] + lines[::-1])}
+
+    def _clip(self, message: dict) -> dict:
+        # oversized tool results are cut down, everything else is sent as is
+        content = message["content"]
+        if not content.startswith(TOOL_RESULT_PREFIX):
+            return message
+        clipped = self.truncate(content, self.tool_result_tokens)
+        return message if clipped is content else {**message, "content": clipped}
+
+    def _count_uncached(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:  # encodings are downloaded on first use
+        logger.warning("tiktoken unavailable, estimating token counts: %s", e)
+        return None
@@ -1,21 +1,36 @@
-from flask import Blueprint, jsonify, request, stream_with_context, Response
-from app.chat.services import ChatService
+from flask import Blueprint, jsonify, request, session, stream_with_context, Response
+from app.chat.services import (
+    ChatService,
+    conversations,
+    embedding_cache,
+    semantic_cache,
+    tool_cache,
+)
 from app.auth.decorators import login_required
-import sys
+from app.chat.admission import AdmissionRejected, admission
+from app.chat.utils.sse import coalesce, frame
+from app.config import Config
+from app.tracing import InMemoryExporter, tracer
+from contextlib import closing
 import json
 
 chat = Blueprint("chat", __name__)
 chat_service = ChatService()
 
 
-def generate_response(message):
+def generate_response(message, conversation):
+    session_event = {"type": "session", "session_id": conversation.session_id}
+    yield frame(json.dumps(session_event))
     try:
-        for chunk in chat_service.process_message(message):
-            if isinstance(chunk, str):
-                yield f"data: {chunk}\n\n"
-                sys.stdout.flush()
+        turn = chat_service.process_message(message, conversation)
+        # the server closes this generator when the client disconnects,
+        # closing the turn stops the model stream and pending tools
+        with closing(turn):
+            yield from coalesce(
+                turn, Config.SSE_COALESCE_WINDOW, Config.SSE_COALESCE_MAX_CHARS
+            )
     except Exception as e:
-        yield f"data: {json.dumps({'type': 'error', 'text': str(e)})}\n\n"
+        yield frame(json.dumps({"type": "error", "text": str(e)}))
 
 
 @chat.route("/message", methods=["GET"])
@@ -24,9 +39,35 @@ def send_message():
     message = request.args.get("message")  # ✅ read from query params for GET
     if not message:
         return jsonify({"error": "Message required"}), 400
+    # defaults to the user's latest chat session
+    try:
+        session_id = int(request.args["session_id"])
+    except KeyError:
+        session_id = None
+    except ValueError:
+        return jsonify({"error": "Invalid session_id"}), 400
+    # admitted before the history is loaded, so a refused turn costs no
+    # database work, and never queued: a waiting turn would hold this thread
+    try:
+        ticket = admission.admit(session["user_id"], queue=False)
+    except AdmissionRejected as e:
+        return too_many_requests(e)
+    try:
+        conversation = conversations.get(session["user_id"], session_id)
+    except Exception:
+        admission.finish(ticket)
+        raise
+    if conversation is None:
+        admission.finish(ticket)
+        return jsonify({"error": "Chat session not found"}), 404
+    # one turn per conversation at a time, a second one would interleave its
+    # messages with the first one's
+    if not conversation.start_turn():
+        admission.finish(ticket)
+        return jsonify({"error": "A reply is already in progress"}), 409
 
-    return Response(
-        stream_with_context(generate_response(message)),
+    response = Response(
+        stream_with_context(generate_response(message, conversation)),
         content_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -36,9 +77,80 @@ def send_message():
         },
     )
 
+    def end_turn():
+        conversation.end_turn()
+        admission.finish(ticket)
+
+    # runs when the stream ends or the client goes away, started or not
+    response.call_on_close(end_turn)
+    return response
+
+
+def too_many_requests(rejected: AdmissionRejected):
+    """The 429 response for a turn refused by admission control"""
+    body = {"error": "Too many requests", "reason": rejected.reason}
+    headers = {"Retry-After": str(rejected.retry_after)}
+    return jsonify(body), 429, headers
+
+
+@chat.route("/sessions", methods=["POST"])
+@login_required
+def new_session():
+    """Start a new chat session, later messages default to it."""
+    conversation = conversations.create(session["user_id"])
+    return jsonify({"session_id": conversation.session_id}), 201
+
 
 @chat.route("/health", methods=["GET"])
 @login_required
 def health_check():
     """Simple health check for the chat service."""
     return jsonify({"status": "healthy", "service": "chat"}), 200
+
+
+@chat.route("/embedding-cache", methods=["GET"])
+@login_required
+def embedding_cache_stats():
+    """Hit/miss counters for the query embedding cache."""
+    return jsonify(embedding_cache.stats()), 200
+
+
+@chat.route("/semantic-cache", methods=["GET"])
+@login_required
+def semantic_cache_stats():
+    """Hit/miss counters for the semantic recommend cache."""
+    return jsonify(semantic_cache.stats()), 200
+
+
+@chat.route("/tool-cache", methods=["GET"])
+@login_required
+def tool_cache_stats():
+    """Hit/miss counters for the composio result cache."""
+    return jsonify(tool_cache.stats()), 200
+
+
+@chat.route("/conversations", methods=["GET"])
+@login_required
+def conversation_stats():
+    """Conversations held in memory and the store limits."""
+    return jsonify(conversations.stats()), 200
+
+
+@chat.route("/admission", methods=["GET"])
+@login_required
+def admission_stats():
+    """Running and queued chat turns and the admission limits."""
+    return jsonify(admission.stats()), 200
+
+
+@chat.route("/traces", methods=["GET"])
+@login_required
+def recent_traces():
+    """Latest finished spans, kept when `TRACING_EXPORTER` is memory."""
+    limit = request.args.get("limit", default=200, type=int)
+    if not isinstance(tracer.exporter, InMemoryExporter):
+        return jsonify({"enabled": tracer.enabled, "spans": []}), 200
+    return (
+        jsonify({"enabled": tracer.enabled, "spans": tracer.exporter.recent(limit)}),
+        200,
+    )
@@ -0,0 +1,258 @@
+from app.chat.models import ChatMessage, ChatSession
+from app.chat.utils.prompts import CHATBOT_PROMPT
+from app.extensions import db
+from collections import OrderedDict
+from sqlalchemy import select
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Conversation:
+    """The chat history of one chat session, as sent to the model
+
+    The developer prompt is pinned as the first message and is not stored.
+    At most `max_messages` other messages are kept, older ones stay in the
+    database only. Messages added since the last save are kept in `unsaved`.
+
+    A conversation runs one turn at a time: `start_turn` refuses a second
+    one until `end_turn`, and the messages added in between are the turn's.
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        session_id: int,
+        messages: list[dict] | None = None,
+        max_messages: int = 50,
+    ):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.max_messages = max_messages
+        self.messages = [{"role": "developer", "content": CHATBOT_PROMPT}]
+        self.messages += (messages or [])[-max_messages:]
+        self.unsaved: list[dict] = []
+        self.last_used = time.monotonic()
+        self._turn: list[dict] | None = None
+        self._turn_lock = threading.Lock()
+
+    @property
+    def in_turn(self) -> bool:
+        """Whether a turn is running on this conversation"""
+        return self._turn is not None
+
+    def start_turn(self) -> bool:
+        """Start a turn unless one is already running
+
+        Returns:
+            bool: True if the turn started, False if another one is running
+        """
+        with self._turn_lock:
+            if self._turn is not None:
+                return False
+            self._turn = []
+            return True
+
+    def end_turn(self):
+        """End the running turn, its messages stay in the history
+
+        Returns:
+            None
+        """
+        with self._turn_lock:
+            self._turn = None
+
+    def add(self, role: str, content: str):
+        """Add a message to the history
+
+        Args:
+            role (str): The role of the message sender
+            content (str): The message content
+
+        Returns:
+            None
+        """
+        message = {"role": role, "content": content}
+        self.messages.append(message)
+        self.unsaved.append(message)
+        if self._turn is not None:
+            self._turn.append(message)
+        # keep the pinned prompt plus the latest max_messages
+        if len(self.messages) - 1 > self.max_messages:
+            del self.messages[1 : len(self.messages) - self.max_messages]
+
+    def discard_turn(self):
+        """Drop the messages of the running turn, e.g. one that was
+        cancelled before its answer
+
+        The messages are matched by identity, so equal messages of earlier
+        turns stay.
+
+        Returns:
+            None
+        """
+        with self._turn_lock:
+            dropped = {id(message) for message in self._turn or []}
+            if self._turn is not None:
+                self._turn = []
+        self.unsaved = [m for m in self.unsaved if id(m) not in dropped]
+        self.messages[1:] = [m for m in self.messages[1:] if id(m) not in dropped]
+
+
+class ConversationStore:
+    """Active conversations keyed by user and chat session
+
+    Conversations live in an in-process LRU of at most `max_sessions`
+    entries, a conversation unused for `idle_ttl` seconds is dropped. A
+    conversation that is not in memory is rehydrated from `chat_messages` on
+    first use. Messages are written back with `save` at the end of a turn,
+    so evicting a conversation never loses anything.
+
+    The database methods need an app context.
+    """
+
+    def __init__(
+        self, max_sessions: int = 1000, idle_ttl: int = 1800, max_messages: int = 50
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self._active: OrderedDict[tuple[str, int], Conversation] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, session_id: int | None = None) -> Conversation | None:
+        """Get a user's conversation, loading it from the database if needed
+
+        Args:
+            user_id: The logged in user's id
+            session_id (int | None): The chat session, defaults to the user's
+                latest one (a new one is created if they have none)
+
+        Returns:
+            Conversation | None: The conversation, None if the session does
+                not exist or belongs to another user
+        """
+        user_id = str(user_id)
+        if session_id is None:
+            session_id = db.session.execute(
+                select(ChatSession.id)
+                .where(ChatSession.user_id == user_id)
+                .order_by(ChatSession.id.desc())
+                .limit(1)
+            ).scalar()
+            if session_id is None:
+                return self.create(user_id)
+
+        key = (user_id, session_id)
+        with self._lock:
+            self._evict()
+            conversation = self._active.get(key)
+            if conversation is not None:
+                self._active.move_to_end(key)
+                conversation.last_used = time.monotonic()
+                return conversation
+
+        conversation = self._load(user_id, session_id)
+        if conversation is None:
+            return None
+        return self._remember(conversation)
+
+    def create(self, user_id) -> Conversation:
+        """Start a new chat session for a user
+
+        Args:
+            user_id: The logged in user's id
+
+        Returns:
+            Conversation: The new, empty conversation
+        """
+        chat_session = ChatSession(user_id=str(user_id))
+        db.session.add(chat_session)
+        db.session.commit()
+        conversation = Conversation(
+            chat_session.user_id, chat_session.id, max_messages=self.max_messages
+        )
+        return self._remember(conversation)
+
+    def save(self, conversation: Conversation):
+        """Write the messages added since the last save
+
+        Args:
+            conversation (Conversation): The conversation to save
+
+        Returns:
+            None
+        """
+        messages, conversation.unsaved = conversation.unsaved, []
+        if not messages:
+            return
+        try:
+            db.session.add_all(
+                ChatMessage(
+                    session_id=conversation.session_id,
+                    role=message["role"],
+                    content=message["content"],
+                )
+                for message in messages
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            conversation.unsaved[:0] = messages
+            logger.warning(
+                "Saving chat session %s failed: %s", conversation.session_id, e
+            )
+
+    def stats(self) -> dict:
+        """Number of conversations held in memory
+
+        Returns:
+            dict: Active conversations, those running a turn and the limits
+        """
+        with self._lock:
+            return {
+                "active": len(self._active),
+                "in_turn": sum(c.in_turn for c in self._active.values()),
+                "max_sessions": self.max_sessions,
+                "idle_ttl": self.idle_ttl,
+            }
+
+    def _load(self, user_id: str, session_id: int) -> Conversation | None:
+        chat_session = db.session.get(ChatSession, session_id)
+        if chat_session is None or chat_session.user_id != user_id:
+            return None
+        rows = db.session.execute(
+            select(ChatMessage.role, ChatMessage.content)
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.id.desc())
+            .limit(self.max_messages)
+        ).all()
+        messages = [{"role": row.role, "content": row.content} for row in rows[::-1]]
+        return Conversation(
+            user_id, session_id, messages, max_messages=self.max_messages
+        )
+
+    def _remember(self, conversation: Conversation) -> Conversation:
+        key = (conversation.user_id, conversation.session_id)
+        with self._lock:
+            # another request may have loaded the same session meanwhile
+            conversation = self._active.setdefault(key, conversation)
+            self._active.move_to_end(key)
+            conversation.last_used = time.monotonic()
+            self._evict()
+        return conversation
+
+    def _evict(self):
+        # entries are in last used order, so idle ones are at the front. A
+        # conversation with a running turn stays, or the next request would
+        # load a second copy of it and run a turn next to the first
+        deadline = time.monotonic() - self.idle_ttl
+        excess = len(self._active) - self.max_sessions
+        for key, conversation in list(self._active.items()):
+            if excess <= 0 and conversation.last_used > deadline:
+                break
+            if not conversation.in_turn:
+                del self._active[key]
+                excess -= 1
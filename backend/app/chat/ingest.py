@@ -0,0 +1,179 @@
+from app.chat.models import Movie, Vector
+from app.chat.utils.embedding_store import EmbeddingStore
+from app.extensions import db
+from sqlalchemy import select, text
+import csv
+import json
+import time
+
+
+def upsert_movies(rows: list[dict], update: bool = False) -> int:
+    """Insert a batch of movies with one statement and one round-trip
+
+    The batch is sent as two arrays and expanded with `unnest`, which is far
+    cheaper than executemany (one round-trip per row with psycopg2). Runs
+    inside the caller's transaction, nothing is committed here.
+
+    Args:
+        rows (list[dict]): Movie rows with `title` and `embedding`
+        update (bool): Overwrite embeddings of titles that already exist,
+            otherwise they are left untouched
+
+    Returns:
+        int: The number of rows sent
+    """
+    if not rows:
+        return 0
+    conflict = (
+        "DO UPDATE SET embedding = EXCLUDED.embedding" if update else "DO NOTHING"
+    )
+    sql = text(f"""
+        INSERT INTO movies (title, embedding)
+        SELECT title, CAST(embedding AS vector)
+        FROM unnest(CAST(:titles AS text[]), CAST(:embeddings AS text[]))
+            AS batch(title, embedding)
+        ON CONFLICT (title) {conflict}
+    """)
+    db.session.execute(
+        sql,
+        {
+            "titles": [row["title"] for row in rows],
+            "embeddings": [json.dumps(row["embedding"]) for row in rows],
+        },
+    )
+    return len(rows)
+
+
+def read_catalog(csv_path: str) -> list[dict]:
+    """Read the catalog csv (`title`, `description`, ...) into dicts
+
+    Args:
+        csv_path (str): Path to the catalog csv
+
+    Returns:
+        list[dict]: One dict per movie, keyed by column name
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _int_or_none(value) -> int | None:
+    return int(value) if value not in (None, "") else None
+
+
+def update_metadata(catalog: list[dict]) -> int:
+    """Copy catalog metadata onto existing movies in one statement
+
+    Sets `description`, `year`, `genre` and `runtime` from the csv columns of
+    the same name (missing columns become NULL). Only rows that actually
+    change are touched, so re-running does not rewrite the table (or the
+    generated `search_vector`).
+
+    Args:
+        catalog (list[dict]): Catalog rows keyed by column name
+
+    Returns:
+        int: The number of movies updated
+    """
+    if not catalog:
+        return 0
+    sql = text("""
+        UPDATE movies
+        SET description = batch.description,
+            year = batch.year,
+            genre = batch.genre,
+            runtime = batch.runtime
+        FROM unnest(
+            CAST(:titles AS text[]),
+            CAST(:descriptions AS text[]),
+            CAST(:years AS int[]),
+            CAST(:genres AS text[]),
+            CAST(:runtimes AS int[])
+        ) AS batch(title, description, year, genre, runtime)
+        WHERE movies.title = batch.title
+          AND (movies.description, movies.year, movies.genre, movies.runtime)
+              IS DISTINCT FROM
+              (batch.description, batch.year, batch.genre, batch.runtime)
+    """)
+    result = db.session.execute(
+        sql,
+        {
+            "titles": [row["title"] for row in catalog],
+            "descriptions": [row.get("description") or None for row in catalog],
+            "years": [_int_or_none(row.get("year")) for row in catalog],
+            "genres": [(row.get("genre") or "").lower() or None for row in catalog],
+            "runtimes": [_int_or_none(row.get("runtime")) for row in catalog],
+        },
+    )
+    return result.rowcount
+
+
+def ingest_store(
+    path: str,
+    batch_size: int = 500,
+    update: bool = False,
+    catalog: list[dict] | None = None,
+    progress=print,
+) -> dict:
+    """Load an embedding store into the `movies` table
+
+    Existing titles are fetched once up front so known movies are skipped
+    (unless `update` is set). Rows are streamed from the memory-mapped store
+    and written in `batch_size` multi-row upserts, all inside a single
+    transaction that is committed at the end. Running it again is a no-op.
+
+    Args:
+        path (str): The embedding store directory
+        batch_size (int): Rows per insert statement
+        update (bool): Overwrite embeddings of titles that already exist
+        catalog (list[dict] | None): Catalog csv rows, their descriptions and
+            metadata are applied in the same transaction
+        progress (callable): Called with a status line after every batch
+
+    Returns:
+        dict: Counts of movies `seen`, rows `written`, titles `skipped` and
+            `updated` movies (metadata changed)
+    """
+    started = time.perf_counter()
+    store = EmbeddingStore.load(path)
+    if store.dim != Vector.dim:
+        raise ValueError(
+            f"Store {path} holds {store.dim}-d vectors, movies.embedding is "
+            f"vector({Vector.dim})"
+        )
+    existing = set(db.session.execute(select(Movie.title)).scalars())
+    todo = [
+        i for i, title in enumerate(store.titles) if update or title not in existing
+    ]
+    skipped = len(store) - len(todo)
+
+    written = 0
+    try:
+        for start in range(0, len(todo), batch_size):
+            rows = [
+                {
+                    "title": store.titles[i],
+                    "embedding": store.matrix[i].astype("float32").tolist(),
+                }
+                for i in todo[start : start + batch_size]
+            ]
+            written += upsert_movies(rows, update=update)
+            progress(f"ingested {written}/{len(todo)} movies")
+        updated = update_metadata(catalog or [])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    progress(
+        f"ingested {written}/{len(todo)} movies, "
+        f"skipped {skipped} existing, updated {updated} with metadata "
+        f"in {elapsed:.2f}s"
+    )
+    return {
+        "seen": len(store),
+        "written": written,
+        "skipped": skipped,
+        "updated": updated,
+    }
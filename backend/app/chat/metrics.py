@@ -0,0 +1,147 @@
+"""Prometheus metrics for the chat pipeline, served at `/metrics`.
+
+Updating a metric is a lock and an add, cheap enough to leave on. When
+several worker processes serve the app set `PROMETHEUS_MULTIPROC_DIR` so the
+endpoint aggregates all of them.
+"""
+
+from flask import Blueprint, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+import os
+import time
+
+# model streams and turns take seconds, tools and searches milliseconds
+TURN_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+TIME_TO_FIRST_TOKEN = Histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from receiving a message to the first streamed text",
+    ["pipeline"],
+    buckets=TURN_BUCKETS,
+)
+STREAM_DURATION = Histogram(
+    "chat_stream_duration_seconds",
+    "Time from receiving a message to the end of its response stream",
+    ["pipeline"],
+    buckets=TURN_BUCKETS,
+)
+TOOL_DURATION = Histogram(
+    "chat_tool_duration_seconds",
+    "Tool call latency",
+    ["tool"],
+    buckets=FAST_BUCKETS,
+)
+TOOL_ERRORS = Counter(
+    "chat_tool_errors_total",
+    "Tool calls that raised or returned an error",
+    ["tool"],
+)
+RECOMMEND_DURATION = Histogram(
+    "recommend_duration_seconds",
+    "Vector search latency of recommend (embedding included)",
+    buckets=FAST_BUCKETS,
+)
+EMBEDDING_DURATION = Histogram(
+    "embedding_request_duration_seconds",
+    "Latency of one embeddings api request",
+    buckets=FAST_BUCKETS,
+)
+CANCELLED_TURNS = Counter(
+    "chat_cancelled_turns_total",
+    "Chat turns abandoned because the client disconnected",
+    ["pipeline"],
+)
+MODEL_TOKENS = Counter(
+    "chat_model_tokens_total",
+    "Tokens used by model calls, `cached` is the cached part of `input`",
+    ["call", "kind"],
+)
+ACTIVE_TURNS = Gauge(
+    "chat_active_turns",
+    "Chat turns running",
+    multiprocess_mode="livesum",
+)
+QUEUE_DEPTH = Gauge(
+    "chat_queue_depth",
+    "Chat turns waiting for a slot",
+    multiprocess_mode="livesum",
+)
+QUEUE_WAIT = Histogram(
+    "chat_queue_wait_seconds",
+    "Time a chat turn waited for a slot",
+    buckets=(0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+REJECTED_TURNS = Counter(
+    "chat_rejected_turns_total",
+    "Chat turns refused by admission control",
+    ["reason"],
+)
+HEDGED_REQUESTS = Counter(
+    "http_hedged_requests_total",
+    "Duplicate requests sent for slow embeddings calls, and how often they won",
+    ["outcome"],
+)
+
+metrics = Blueprint("metrics", __name__)
+
+
+class TurnTimer:
+    """Records time to first token and stream duration of one chat turn"""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.started = time.perf_counter()
+        self.first_token = None
+
+    def token(self):
+        """Call on every streamed text delta, only the first one is recorded"""
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+            TIME_TO_FIRST_TOKEN.labels(self.pipeline).observe(
+                self.first_token - self.started
+            )
+
+    def done(self):
+        """Call once the response stream is complete"""
+        STREAM_DURATION.labels(self.pipeline).observe(
+            time.perf_counter() - self.started
+        )
+
+
+def observe_usage(response, call: str):
+    """Count the tokens of a finished model response
+
+    Args:
+        response: The `response` of a `response.completed` stream event
+        call (str): Which call of the turn, "initial" or "final"
+
+    Returns:
+        None
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    MODEL_TOKENS.labels(call, "input").inc(usage.input_tokens or 0)
+    MODEL_TOKENS.labels(call, "output").inc(usage.output_tokens or 0)
+    details = getattr(usage, "input_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) if details else 0
+    MODEL_TOKENS.labels(call, "cached").inc(cached or 0)
+
+
+@metrics.route("/metrics", methods=["GET"])
+def export_metrics():
+    """Metrics in the Prometheus text format."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
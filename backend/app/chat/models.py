@@ -1,3 +1,4 @@
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.types import UserDefinedType
 from datetime import datetime
 from app.extensions import db
@@ -5,22 +6,62 @@ from app.extensions import db
 
 # Define pgvector type
 class Vector(UserDefinedType):
+    dim = 1536  # change depending on vector dimension size
+
     def get_col_spec(self):
-        return "vector(1536)"  # change depending on vector dimension size
+        return f"vector({self.dim})"
 
 
 class Movie(db.Model):
     __tablename__ = "movies"
+    __table_args__ = (
+        # ingestion upserts on the title
+        db.UniqueConstraint("title", name="uq_movies_title"),
+        # approximate nearest neighbour index for `embedding <-> :query`
+        db.Index(
+            "ix_movies_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_l2_ops"},
+        ),
+        # full text index for the lexical half of hybrid search
+        db.Index("ix_movies_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String, nullable=False)
+    description = db.Column(db.Text)
+    # metadata used as pre-filters for vector search
+    year = db.Column(db.Integer, index=True)
+    genre = db.Column(db.String, index=True)
+    runtime = db.Column(db.Integer, index=True)  # minutes
     embedding = db.Column(Vector)  # pgvector column
+    # maintained by postgres, title terms weigh more than description terms
+    search_vector = db.Column(
+        TSVECTOR,
+        db.Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    )
+
+
+class EmbeddingCacheEntry(db.Model):
+    __tablename__ = "embedding_cache"
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of model + query
+    model = db.Column(db.String, nullable=False)
+    query = db.Column(db.Text, nullable=False)
+    embedding = db.Column(Vector, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 
 class ChatSession(db.Model):
     __tablename__ = "chat_sessions"
     id = db.Column(db.Integer, primary_key=True)  # SERIAL integer
-    user_id = db.Column(db.String, nullable=False)
+    user_id = db.Column(db.String, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     messages = db.relationship(
@@ -32,7 +73,7 @@ class ChatMessage(db.Model):
     __tablename__ = "chat_messages"
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(
-        db.Integer, db.ForeignKey("chat_sessions.id"), nullable=False
+        db.Integer, db.ForeignKey("chat_sessions.id"), nullable=False, index=True
     )
     role = db.Column(db.String, nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -1,20 +1,46 @@
+from app.chat.context_window import ContextWindow
+from app.chat.metrics import (
+    CANCELLED_TURNS,
+    EMBEDDING_DURATION,
+    RECOMMEND_DURATION,
+    TOOL_DURATION,
+    TOOL_ERRORS,
+    TurnTimer,
+    observe_usage,
+)
+from app.chat.conversations import Conversation, ConversationStore
 from app.chat.utils.composio_tools import composio_tools
-from app.chat.utils.prompts import CHATBOT_PROMPT
 from app.chat.utils.formaters import (
+    parse_batch_vector_search_results,
     parse_composio_news_search_results,
     parse_composio_search_results,
     parse_vector_search_results,
 )
-from app.extensions import db
+from app.chat.utils.clients import get_composio_client, get_openai_client, hedged
+from app.chat.utils.embedding_cache import EmbeddingCache
+from app.chat.utils.semantic_cache import SemanticCache
+from app.chat.utils.tool_cache import ToolResultCache
+from app.chat.utils.projections import encode_compact, project_tool_result
+from app.chat.vector_search import (
+    FILTERS,
+    catalog_version,
+    clean_filters,
+    fuse,
+    get_search_backend,
+    hybrid_candidates,
+    text_search,
+)
+from app.config import Config
+from app.tracing import tracer
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
+from flask import current_app, has_app_context
 from openai import OpenAI
-from composio import Composio
-import os
+import contextvars
 import json
 import logging
-import traceback
-from sqlalchemy import text
+import time
 
 # logging stuff
 logging.basicConfig(
@@ -24,10 +50,54 @@ logger = logging.getLogger(__name__)
 # load env
 load_dotenv(Path("../../.env"))
 
+embedding_cache = EmbeddingCache(
+    max_size=Config.EMBEDDING_CACHE_SIZE,
+    ttl=Config.EMBEDDING_CACHE_TTL,
+    persist=Config.EMBEDDING_CACHE_PERSIST,
+    persist_ttl=Config.EMBEDDING_CACHE_PERSIST_TTL,
+)
+
+# shared by every chat turn so concurrent tool calls stay bounded process-wide
+tool_executor = ThreadPoolExecutor(
+    max_workers=Config.TOOL_MAX_WORKERS, thread_name_prefix="tool"
+)
+
+# chunks of large get_embeddings calls, single chunk calls stay on the caller
+embedding_executor = ThreadPoolExecutor(
+    max_workers=Config.EMBEDDING_MAX_WORKERS, thread_name_prefix="embedding"
+)
+
+# composio results, news goes stale fast, general search much slower
+tool_cache = ToolResultCache(
+    ttls={
+        "COMPOSIO_SEARCH_NEWS_SEARCH": Config.TOOL_CACHE_NEWS_TTL,
+        "COMPOSIO_SEARCH_SEARCH": Config.TOOL_CACHE_SEARCH_TTL,
+    },
+    max_entries=Config.TOOL_CACHE_SIZE,
+)
+
+# chat history per user and chat session, persisted in chat_messages
+conversations = ConversationStore(
+    max_sessions=Config.CHAT_SESSION_CACHE_SIZE,
+    idle_ttl=Config.CHAT_SESSION_IDLE_TTL,
+    max_messages=Config.CHAT_HISTORY_MAX_MESSAGES,
+)
+
+# recommend results for near-identical queries, dropped when `movies` changes
+semantic_cache = SemanticCache(
+    max_entries=Config.SEMANTIC_CACHE_SIZE,
+    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+    version_fn=catalog_version,
+    check_interval=Config.SEMANTIC_CACHE_CHECK_INTERVAL,
+)
+
 
 def get_embedding(text: str) -> list[float]:
     """Get the embedding of a text
 
+    Repeat queries are served from the embedding cache, misses go to the
+    embeddings api through the shared OpenAI client.
+
     args:
         text (str): The text to get the embedding of
 
@@ -35,59 +105,212 @@ def get_embedding(text: str) -> list[float]:
         list[float]: The embedding of the text
 
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    response = client.embeddings.create(model="text-embedding-3-small", input=text)
-    return response.data[0].embedding
+    return get_embeddings([text])[0]
 
 
-def recommend(query: str, top_k: int = 3):
+def _embed_chunk(texts: list[str], model: str) -> list[list[float]]:
+    """Embed one provider-sized chunk of texts in a single request
+
+    args:
+        texts (list[str]): The texts to embed
+        model (str): The embedding model name
+
+    returns:
+        list[list[float]]: The embeddings in the same order as the texts
+
+    """
+    # small requests are cheap to send twice when the first one lags
+    delay = (
+        Config.EMBEDDING_HEDGE_DELAY
+        if len(texts) <= Config.EMBEDDING_HEDGE_MAX_TEXTS
+        else 0
+    )
+    with tracer.span("embedding_request", texts=len(texts)), EMBEDDING_DURATION.time():
+        response = hedged(
+            lambda: get_openai_client().embeddings.create(model=model, input=texts),
+            delay,
+        )
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+def get_embeddings(texts: list[str], use_cache: bool = True) -> list[list[float]]:
+    """Get the embeddings of many texts
+
+    Cached texts are answered from the embedding cache. The rest are
+    deduplicated and split into chunks of `EMBEDDING_BATCH_SIZE`. One chunk
+    is sent from the calling thread, more are sent concurrently on the
+    shared `EMBEDDING_MAX_WORKERS` thread pool.
+
+    args:
+        texts (list[str]): The texts to get the embeddings of
+        use_cache (bool): Read from and write to the embedding cache. Turn
+            this off for bulk catalog jobs so they don't crowd out queries.
+
+    returns:
+        list[list[float]]: The embeddings, in the same order as the texts
+
+    """
+    model = Config.EMBEDDING_MODEL
+    if use_cache:
+        embeddings = embedding_cache.get_many(texts, model)
+    else:
+        embeddings = [None] * len(texts)
+
+    # texts that still need an api call, deduplicated on the cache key
+    pending: dict[str, list[int]] = {}
+    for i, (text, embedding) in enumerate(zip(texts, embeddings)):
+        if embedding is None:
+            pending.setdefault(embedding_cache.normalize(text), []).append(i)
+    if not pending:
+        return embeddings
+
+    to_embed = [texts[indexes[0]] for indexes in pending.values()]
+    size = Config.EMBEDDING_BATCH_SIZE
+    chunks = [to_embed[i : i + size] for i in range(0, len(to_embed), size)]
+    if len(chunks) == 1:
+        fresh = _embed_chunk(chunks[0], model)
+    else:
+        # one context copy per chunk keeps the requests in the caller's trace
+        futures = [
+            embedding_executor.submit(
+                contextvars.copy_context().run, _embed_chunk, chunk, model
+            )
+            for chunk in chunks
+        ]
+        fresh = [embedding for future in futures for embedding in future.result()]
+
+    for indexes, embedding in zip(pending.values(), fresh):
+        for i in indexes:
+            embeddings[i] = embedding
+    if use_cache:
+        embedding_cache.put_many(to_embed, model, fresh)
+    return embeddings
+
+
+@RECOMMEND_DURATION.time()
+def recommend(
+    query: str,
+    top_k: int = 3,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    filters: dict | None = None,
+):
     """
     Recommend documents based on user's preference or query.
 
+    The vector ranking is cached by query vector, a query whose embedding is
+    within `SEMANTIC_CACHE_THRESHOLD` cosine similarity of a recent one (with
+    the same arguments) reuses that query's candidates without searching.
+    With `RECOMMEND_HYBRID` on the full text ranking depends on the exact
+    words, so it is run for every query and fused with the (cached) vector
+    candidates.
+
     Args:
         query (str): The user's preference or query.
         top_k (int): The number of documents to recommend.
+        ef_search (int | None): Per query override of `VECTOR_EF_SEARCH`.
+        probes (int | None): Per query override of `VECTOR_PROBES`.
+        filters (dict | None): Metadata pre-filters (year, min_year,
+            max_year, genre, min_runtime, max_runtime).
 
     Returns:
         list: A list of recommended documents.
     """
-    # Generate embedding for user's preference or query
-    logger.info(f"[DEBUG] GETTING EMBEDDING FOR QUERY: {query}")
-    query_vector = get_embedding(query)
-    logger.info("[DEBUG] SEARCHING MOVIES")
-    sql = text("""
-        SELECT id, title
-        FROM movies
-        ORDER BY embedding <-> CAST(:query_vector AS vector)
-        LIMIT :top_k
-    """)
-
-    result = db.session.execute(sql, {"query_vector": query_vector, "top_k": top_k})
-    logger.info(f"[DEBUG] RESULT: {result}")
-    return [{"movie": r.title} for r in result]
+    with tracer.span("recommend", top_k=top_k) as span:
+        # Generate embedding for user's preference or query
+        query_vector = get_embedding(query)
+        limit = hybrid_candidates(top_k) if Config.RECOMMEND_HYBRID else top_k
+        scope = (
+            limit,
+            ef_search,
+            probes,
+            tuple(sorted(clean_filters(filters).items())),
+        )
+        backend = get_search_backend()
+        candidates = semantic_cache.get(query_vector, scope)
+        span.set(semantic_cache_hit=candidates is not None)
+        if candidates is None:
+            candidates = backend.search(
+                query_vector,
+                limit,
+                ef_search=ef_search,
+                probes=probes,
+                filters=filters,
+            )
+            semantic_cache.put(query_vector, candidates, scope)
+        if Config.RECOMMEND_HYBRID:
+            result = fuse([candidates, text_search(query, limit, filters)], top_k)
+        else:
+            result = candidates
+        span.set(backend=backend.name, results=len(result))
+        logger.debug("recommend %r (%s): %s", query, backend.name, result)
+        return [{"movie": r["title"]} for r in result]
+
+
+def recommend_many(
+    queries: list[str],
+    top_k: int = 3,
+    dedupe: bool = False,
+    filters: dict | None = None,
+):
+    """
+    Recommend documents for several queries at once.
+
+    All queries are embedded in one request and searched in one database
+    round-trip.
+
+    Args:
+        queries (list[str]): The user's preferences or queries.
+        top_k (int): The number of documents to recommend per query.
+        dedupe (bool): Never recommend the same document for two queries.
+            Documents are handed out round-robin by rank so every query
+            keeps its best remaining matches. Each query then scans up to
+            `top_k * len(queries)` rows, at most 1000 (the largest
+            `hnsw.ef_search`), beyond that a query can come back short.
+        filters (dict | None): Metadata pre-filters, applied to every query.
+
+    Returns:
+        list: One `{"query", "movies"}` group per query, in order.
+    """
+    with tracer.span("recommend_many", queries=len(queries), top_k=top_k):
+        query_vectors = get_embeddings(queries)
+        backend = get_search_backend()
+        # with dedupe a query can lose up to top_k rows to each earlier query
+        limit = top_k * len(queries) if dedupe else top_k
+        results = backend.search_many(query_vectors, limit, filters=filters)
+
+    if dedupe:
+        seen = set()
+        picked = [[] for _ in queries]
+        for rank in range(limit):
+            for group, rows in zip(picked, results):
+                if len(group) < top_k and rank < len(rows):
+                    if rows[rank]["id"] not in seen:
+                        seen.add(rows[rank]["id"])
+                        group.append(rows[rank])
+        results = picked
+
+    logger.debug("recommend_many (%s): %s", backend.name, results)
+    return [
+        {"query": query, "movies": [{"movie": r["title"]} for r in rows]}
+        for query, rows in zip(queries, results)
+    ]
 
 
 class ChatService:
     def __init__(self):
-        self.chat_history: list[dict] = []
         self.model_name: str = "gpt-4.1-mini"
         self.tools = composio_tools
-        self.composio = Composio()
+        self.tool_names = {tool["name"] for tool in composio_tools}
+        self.composio = get_composio_client()
         self.user_id = "0000-1111-2222"
-        self.llm: OpenAI = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        if not self.chat_history:
-            self.add_chat_history(role="developer", message=CHATBOT_PROMPT)
-
-    def add_chat_history(self, role: str, message: str):
-        """Adds a message to the chat history
-
-        Args:
-            role (str): The role of the message sender
-            message (str): The message content
-        Returns:
-            None
-        """
-        self.chat_history.append({"role": role, "content": message})
+        self.llm: OpenAI = get_openai_client()
+        self.context_window = ContextWindow(
+            budget=Config.CONTEXT_TOKEN_BUDGET,
+            tool_result_tokens=Config.CONTEXT_TOOL_RESULT_TOKENS,
+            summary_tokens=Config.CONTEXT_SUMMARY_TOKENS,
+            model=self.model_name,
+        )
 
     def parse_result(self, tool_name: str, result: dict):
         """Parse the result of a tool call
@@ -100,13 +323,16 @@ class ChatService:
         """
         if "news" in tool_name.lower():
             parsed_result = parse_composio_news_search_results(result)
-            logger.info("Used news search parser")
+            logger.debug("Used news search parser")
+        elif "batch" in tool_name.lower():
+            parsed_result = parse_batch_vector_search_results(result)
+            logger.debug("Used batch vector search parser")
         elif "movies" in tool_name.lower():
             parsed_result = parse_vector_search_results(result)
-            logger.info("Used vector search parser")
+            logger.debug("Used vector search parser")
         else:
             parsed_result = parse_composio_search_results(result)
-            logger.info("Used general search parser")
+            logger.debug("Used general search parser")
         return parsed_result
 
     def execute_tool(self, tool_name: str, tool_args: dict):
@@ -120,209 +346,362 @@ class ChatService:
             Any: The result of the tool
 
         """
-        logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
-        logger.info(
-            f"Tool Name Type {type(tool_name)}, Tool Args Type {type(tool_args)}"
-        )
+        logger.debug("Executing tool %s with args %s", tool_name, tool_args)
+        started = time.perf_counter()
         try:
             if tool_name == "recommend_movies":
-                return recommend(tool_args["query"], tool_args["top_k"])
-            result = self.composio.tools.execute(
-                slug=tool_name,
-                user_id=self.user_id,
-                arguments=tool_args,
+                return recommend(
+                    tool_args["query"],
+                    tool_args.get("top_k") or 3,
+                    filters={k: v for k, v in tool_args.items() if k in FILTERS},
+                )
+            if tool_name == "recommend_movies_batch":
+                return recommend_many(
+                    tool_args["queries"],
+                    tool_args.get("top_k") or 3,
+                    dedupe=tool_args.get("dedupe", True),
+                    filters={k: v for k, v in tool_args.items() if k in FILTERS},
+                )
+            result = tool_cache.get_or_call(
+                tool_name,
+                tool_args,
+                lambda: self.composio.tools.execute(
+                    slug=tool_name,
+                    user_id=self.user_id,
+                    arguments=tool_args,
+                ),
             )
-            logger.info(f"Raw Composio result: {result}")
-            logger.info(f"Composio result type: {type(result)}")
+            logger.debug("Composio result for %s: %r", tool_name, result)
             return result
         except Exception as e:
             error_msg = f"Tool execution failed: {str(e)}"
-            logger.info("!!! TOOL EXECUTION EXCEPTION !!!")
-            logger.info(f"Error type: {type(e).__name__}")
-            logger.info(f"Error message: {str(e)}")
-            logger.info(f"Traceback: {traceback.format_exc()}")
+            logger.warning("Tool %s failed: %s", tool_name, e, exc_info=True)
 
             return {"error": error_msg}
+        finally:
+            TOOL_DURATION.labels(self.tool_label(tool_name)).observe(
+                time.perf_counter() - started
+            )
 
-    def process_message(self, message):
-        """Processes a message
+    def tool_label(self, tool_name: str) -> str:
+        """Metric label for a tool, unknown names share one label"""
+        return tool_name if tool_name in self.tool_names else "unknown"
+
+    def run_tool(self, tool_name: str, tool_args: dict, app=None):
+        """Execute a tool and parse its result, safe to run on a worker thread
 
         Args:
-            message (str): The message to process
+            tool_name (str): The name of the tool to execute
+            tool_args (dict): The arguments to pass to the tool
+            app (Flask | None): The app to push a context for, database backed
+                tools need one on worker threads
 
         Returns:
-            None
+            dict: The parsed result
+        """
+        if app is None:
+            return self._run_tool(tool_name, tool_args)
+        with app.app_context():
+            return self._run_tool(tool_name, tool_args)
 
+    def _run_tool(self, tool_name: str, tool_args: dict):
+        with tracer.span("tool_call", tool=tool_name) as span:
+            try:
+                result = self.execute_tool(tool_name, tool_args)
+            except TypeError:
+                result = self.execute_tool(tool_name, tool_args.get("location"))
+            if isinstance(result, dict) and (
+                result.get("error") or result.get("successful") is False
+            ):
+                TOOL_ERRORS.labels(self.tool_label(tool_name)).inc()
+                span.set(failed=True)
+            return self.parse_result(tool_name, result)
+
+    def track_tool_call(self, tool_calls: dict, event):
+        """Accumulate function call events of a response stream
+
+        Args:
+            tool_calls (dict): Tool call slots keyed by output index, updated
+                in place
+            event: An event of a `responses.create` stream
+
+        Returns:
+            int | None: The output index of a call whose arguments just
+                completed, otherwise None
         """
-        logger.info(f"[DEBUG] chat_history: {self.chat_history}")
-        # add user message to chat history
-        self.add_chat_history(role="user", message=message)
-        # log the message
-        logger.info(f"process_message called with message: {message}")
-        # stream the response
-        stream = self.llm.responses.create(
-            model=self.model_name,
-            input=self.chat_history,
-            tools=self.tools,
-            tool_choice="auto",
-            stream=True,
+        # name of the tool is in response.output.item
+        if event.type == "response.output_item.added":
+            if event.item.type != "function_call":
+                return None
+        elif event.type not in (
+            "response.function_call_arguments.delta",
+            "response.function_call_arguments.done",
+        ):
+            return None
+
+        # output_index is the index of the tool call
+        # because they come in chunks we need to keep track of the index
+        idx = getattr(event, "output_index", 0)
+        if idx not in tool_calls:
+            # if the index is not in the tool calls dict, add it
+            tool_calls[idx] = {
+                "name": None,
+                "arguments_fragments": [],
+                "arguments": None,
+                "done": False,
+            }
+
+        if event.type == "response.output_item.added":
+            tool_calls[idx]["name"] = event.item.name  # get the name of the tool
+        # a tool argument (they come in chunks as strings)
+        elif event.type == "response.function_call_arguments.delta":
+            # delta (arguments) may be a string fragment so we add it
+            args_frag = (
+                event.delta if isinstance(event.delta, str) else json.dumps(event.delta)
+            )
+            # add up the argument strings for the tool call
+            tool_calls[idx]["arguments_fragments"].append(args_frag)
+        # the tool call is done
+        else:
+            # mark the tool call as done
+            tool_calls[idx]["done"] = True
+            # join the argument fragments into a single string
+            tool_calls[idx]["arguments"] = "".join(
+                tool_calls[idx]["arguments_fragments"]
+            ).strip()
+            return idx
+        return None
+
+    def tool_request(self, tool_idx: int, tool: dict):
+        """Get the name and parsed arguments of a finished tool call
+
+        Args:
+            tool_idx (int): The output index of the tool call
+            tool (dict): The tool call slot built by `track_tool_call`
+
+        Returns:
+            tuple[str, dict] | None: The tool name and arguments, None when
+                the call has no name
+        """
+        tool_name = tool["name"]
+        if not tool_name:  # if tool name is None
+            logger.debug("No tool name for idx=%s, skipping", tool_idx)
+            return None
+        # try to parse the arguments
+        try:
+            parsed_args = json.loads(tool["arguments"])
+        except (json.JSONDecodeError, TypeError):
+            parsed_args = {}
+            logger.debug("Failed to parse args for idx=%s, using {}", tool_idx)
+        return tool_name, parsed_args
+
+    def tool_use_event(self, tool_name: str, parsed_args: dict) -> str:
+        """The `tool_use` SSE event for a dispatched tool call"""
+        return json.dumps(
+            {"type": "tool_use", "tool_name": tool_name, "tool_input": parsed_args}
         )
 
-        # keep track of tool calls
-        tool_calls = {}
+    def tool_result_event(self, results: dict, call: tuple, future) -> str:
+        """Record a finished tool call and build its `tool_result` SSE event
 
-        # initial call
-        for event in stream:
-            print(
-                f"\n[DEBUG EVENT] type={event.type}, idx={getattr(event, 'output_index', None)}, delta={getattr(event, 'delta', None)}"
-            )
+        The result is projected and encoded once, the event and
+        `add_tool_results` (the chat history) send the same json.
 
-            # if there is text, print it
-            if event.type == "response.output_text.delta":
-                # yield the text
-                yield json.dumps({"type": "init_response", "text": event.delta})
-                logger.info(f"response.output_text.delta: {event.delta}")
-                print(event.delta, end="", flush=True)
-            # if there is no text, print a newline
-            elif event.type == "response.output_text.done":
-                print()
-
-            # else if there is a tool call
-            # name of the tool is in response.output.item
-            elif (
-                event.type == "response.output_item.added"
-                and event.item.type == "function_call"
-            ):
-                # output_index is the index of the tool call
-                # because they come in chunks we need to keep track of the index
-                idx = getattr(event, "output_index", 0)
-                if idx not in tool_calls:
-                    # if the index is not in the tool calls dict, add it
-                    tool_calls[idx] = {
-                        "name": None,
-                        "arguments_fragments": [],
-                        "arguments": None,
-                        "done": False,
-                    }
-                    logger.info(f"[DEBUG] Added tool call slot idx={idx}")
-                tool_calls[idx]["name"] = event.item.name  # get the name of the tool
-
-            # else if there is a tool argument (they come in chunks as strings)
-            elif event.type == "response.function_call_arguments.delta":
-                # output_index is the index of the tool call
-                idx = getattr(event, "output_index", 0)
-                if idx not in tool_calls:  # if not in the tool calls dict, add it
-                    tool_calls[idx] = {
-                        "name": None,
-                        "arguments_fragments": [],
-                        "arguments": None,
-                        "done": False,
-                    }
-                # delta (arguments) may be a string fragment so we add it
-                args_frag = (
-                    event.delta
-                    if isinstance(event.delta, str)
-                    else json.dumps(event.delta)
-                )
-                # add up the argument strings for the tool call
-                tool_calls[idx]["arguments_fragments"].append(args_frag)
-                logger.info(f"[DEBUG] Arg fragment for idx={idx}: {args_frag}")
-
-            # else if the tool call is done
-            elif event.type == "response.function_call_arguments.done":
-                # output_index is the index of the tool call
-                idx = getattr(event, "output_index", 0)
-                # if the index is not in the tool calls dict, add it
-                if idx not in tool_calls:
-                    tool_calls[idx] = {
-                        "name": None,
-                        "arguments_fragments": [],
-                        "arguments": None,
-                        "done": False,
-                    }
-                # mark the tool call as done
-                tool_calls[idx]["done"] = True
-                # join the argument fragments into a single string
-                tool_calls[idx]["arguments"] = "".join(
-                    tool_calls[idx]["arguments_fragments"]
-                ).strip()
-                # log statment for tool done
-                logger.info(f"[DEBUG] Marked tool idx={idx} done")
-
-        logger.info(f"TOOL CALLS: {tool_calls}")
-
-        # Execute the tool calls
-        for tool_idx, tool in tool_calls.items():
-            tool_name = tool["name"]
-            args_str = tool["arguments"]
-
-            if not tool_name:  # if tool name is None
-                print(f"[DEBUG] No tool name for idx={tool_idx}, skipping")
-                continue  # continue
-
-            # try to parse the arguments
-            try:
-                parsed_args = json.loads(args_str)
-            except json.JSONDecodeError:
-                parsed_args = {}
-                logger.info(
-                    f"[DEBUG] Failed to parse args for idx={tool_idx}, using empty dict"
-                )
-            # yield the tool call
-            yield json.dumps(
-                {"type": "tool_use", "tool_name": tool_name, "tool_input": parsed_args}
+        Args:
+            results (dict): `(tool_name, encoded_result)` keyed by output
+                index, updated in place for `add_tool_results`
+            call (tuple): The `(tool_idx, tool_name, parsed_args)` of the call
+            future (Future): The finished call
+
+        Returns:
+            str: The json encoded event
+        """
+        tool_idx, tool_name, parsed_args = call
+        projected = project_tool_result(
+            tool_name,
+            future.result(),
+            Config.TOOL_RESULT_MAX_ITEMS,
+            Config.TOOL_RESULT_MAX_CHARS,
+        )
+        encoded = encode_compact(projected)
+        results[tool_idx] = (tool_name, encoded)
+        logger.debug("Tool result for idx=%s: %s", tool_idx, encoded)
+        # the encoded result goes into the event as is, it is not encoded twice
+        return (
+            '{"type": "tool_result", "tool_name": %s, "tool_input": %s, '
+            '"tool_result": %s}'
+            % (
+                json.dumps(tool_name, ensure_ascii=False),
+                json.dumps(parsed_args, ensure_ascii=False, default=str),
+                encoded,
             )
+        )
+
+    def add_tool_results(self, conversation: Conversation, results: dict):
+        """Add tool results to the chat history in tool call order
+
+        Args:
+            conversation (Conversation): The conversation of the turn
+            results (dict): `(tool_name, encoded_result)` keyed by output index
+
+        Returns:
+            None
+        """
+        for tool_idx in sorted(results):
+            tool_name, encoded = results[tool_idx]
+            conversation.add("assistant", f"TOOL_NAME: {tool_name}, RESULT: {encoded}")
+
+    def process_message(self, message, conversation: Conversation):
+        """Processes a message
+
+        The message, tool results and answer are added to the conversation,
+        which is saved once the turn is complete. The caller starts the turn
+        with `conversation.start_turn` and ends it. The turn is traced as a
+        `chat_turn` span.
+
+        When the client disconnects the server closes this generator: the
+        model stream is closed, tool calls that have not started are
+        cancelled, no further model call is made, the turn's messages are
+        dropped from the history and the turn is counted as cancelled.
+
+        Args:
+            message (str): The message to process
+            conversation (Conversation): The user's chat session
+
+        Yields:
+            dict | str: Text deltas as `{"type", "text"}` dicts, which
+                `coalesce` merges, every other event json encoded
+
+        """
+        futures = {}
+        with tracer.span(
+            "chat_turn", pipeline="sync", session_id=conversation.session_id
+        ) as span:
             try:
-                result = self.execute_tool(tool_name, parsed_args)
-            except TypeError:
-                result = self.execute_tool(tool_name, parsed_args.get("location"))
-
-            logger.info(f"[DEBUG] Tool result for idx={tool_idx}: {result}")
-            parsed_result = self.parse_result(tool_name, result)
-            logger.info(f"[DEBUG] Tool result for idx={tool_idx}: {parsed_result}")
-
-            # yield the tool result
-            yield json.dumps(
-                {
-                    "type": "tool_result",
-                    "tool_name": tool_name,
-                    "tool_input": parsed_args,
-                    "tool_result": parsed_result,
-                }
-            )
-            logger.info(f"[DEBUG] Tool result for idx={tool_idx}: {parsed_result}")
-
-            # Add the tool call result to the chat history
-            self.chat_history.append(
-                {
-                    "role": "assistant",
-                    "content": f"TOOL_NAME: {tool_name}, RESULT: {parsed_result}",
-                }
-            )
-        logger.info(f"[DEBUG] chat_history: {self.chat_history}")
+                yield from self._process_message(message, conversation, futures)
+            except GeneratorExit:
+                cancelled = self.cancel_turn(futures, conversation)
+                span.set(cancelled=True, tools_cancelled=cancelled)
+                raise
 
-        # Get the final answer
-        # IF we called tools to get updated information then we must form a final response
-        if tool_calls:
-            logger.info("[DEBUG] Calling model for final answer...")
-            # Call the model again with the tool call results
-            final_stream = self.llm.responses.create(
+    def cancel_turn(
+        self, futures, conversation: Conversation, pipeline: str = "sync"
+    ) -> int:
+        """Cancel a turn whose client disconnected
+
+        Pending tool calls are cancelled and the user message (and any tool
+        results) of the turn are dropped from the history, so the next turn
+        doesn't see a question that never got an answer.
+
+        Args:
+            futures (Iterable): The tool call futures of the turn, calls that
+                already run finish on their worker and are dropped
+            conversation (Conversation): The conversation of the turn
+            pipeline (str): The pipeline label of the cancelled turns metric
+
+        Returns:
+            int: The number of calls cancelled before they started
+        """
+        conversation.discard_turn()
+        cancelled = sum(future.cancel() for future in list(futures))
+        CANCELLED_TURNS.labels(pipeline).inc()
+        logger.debug("Client disconnected, %d tool calls cancelled", cancelled)
+        return cancelled
+
+    def _process_message(self, message, conversation: Conversation, futures: dict):
+        timer = TurnTimer("sync")
+        # add user message to chat history
+        conversation.add("user", message)
+        logger.debug("process_message called with message: %s", message)
+
+        # keep track of tool calls, each one is dispatched to the tool pool as
+        # soon as its arguments are complete, while the model keeps streaming
+        tool_calls = {}
+        app = current_app._get_current_object() if has_app_context() else None
+        results = {}
+        answer = []
+
+        # initial call
+        with tracer.span("model_stream", call="initial") as span:
+            # stream the response, closed early if the client disconnects
+            stream = self.llm.responses.create(
                 model=self.model_name,
-                input=self.chat_history,
+                input=self.context_window.fit(conversation.messages),
+                tools=self.tools,
+                tool_choice="auto",
                 stream=True,
             )
+            with stream:
+                events = 0
+                for event in stream:
+                    events += 1
+                    # if there is text, yield it
+                    if event.type == "response.output_text.delta":
+                        timer.token()
+                        yield {"type": "init_response", "text": event.delta}
+                        answer.append(event.delta)
+                    elif event.type == "response.completed":
+                        observe_usage(event.response, "initial")
+                    # else it may be part of a tool call
+                    else:
+                        tool_idx = self.track_tool_call(tool_calls, event)
+                        request = (
+                            self.tool_request(tool_idx, tool_calls[tool_idx])
+                            if tool_idx is not None
+                            else None
+                        )
+                        if request is not None:
+                            tool_name, parsed_args = request
+                            # a context copy keeps the tool in this turn's trace
+                            future = tool_executor.submit(
+                                contextvars.copy_context().run,
+                                self.run_tool,
+                                tool_name,
+                                parsed_args,
+                                app,
+                            )
+                            futures[future] = (tool_idx, tool_name, parsed_args)
+                            # yield the tool call
+                            yield self.tool_use_event(tool_name, parsed_args)
+
+                    # yield results of tools that finished while the model streams
+                    for future in [f for f in futures if f.done()]:
+                        yield self.tool_result_event(
+                            results, futures.pop(future), future
+                        )
+            span.set(events=events, tool_calls=len(tool_calls))
+
+        # wait for the remaining tools, results stream out as they finish
+        for future in as_completed(futures):
+            yield self.tool_result_event(results, futures[future], future)
+
+        # Add the tool call results to the chat history
+        self.add_tool_results(conversation, results)
 
-            print("Assistant (final): ", end="", flush=True)
-            # Stream partial text
-            for ev in final_stream:
-                logger.info(
-                    f"\n[DEBUG EVENT FINAL] type={ev.type}, delta={getattr(ev, 'delta', None)}"
+        # Get the final answer
+        # IF we called tools to get updated information then we must form a final response
+        if tool_calls:
+            with tracer.span("model_stream", call="final") as span:
+                # Call the model again with the tool call results
+                final_stream = self.llm.responses.create(
+                    model=self.model_name,
+                    input=self.context_window.fit(conversation.messages),
+                    stream=True,
                 )
-                # if there is text, print it/yield it
-                if ev.type == "response.output_text.delta":
-                    yield json.dumps({"type": "final_response", "text": ev.delta})
-                    logger.info(ev.delta)
-                    print(ev.delta, end="", flush=True)
-                # if there is no text, print a newline
-                elif ev.type == "response.output_text.done":
-                    print()
+                with final_stream:
+                    events = 0
+                    # Stream partial text
+                    for ev in final_stream:
+                        events += 1
+                        if ev.type == "response.output_text.delta":
+                            timer.token()
+                            yield {"type": "final_response", "text": ev.delta}
+                            answer.append(ev.delta)
+                        elif ev.type == "response.completed":
+                            observe_usage(ev.response, "final")
+                span.set(events=events)
+
+        if answer:
+            conversation.add("assistant", "".join(answer))
+        conversations.save(conversation)
+        timer.done()
@@ -0,0 +1,178 @@
+"""Shared clients for the OpenAI and Composio APIs.
+
+Every client is created once per process on an httpx connection pool sized
+by the `HTTP_*` settings, so requests reuse keep-alive connections instead of
+paying for a new TLS handshake each time. Both SDKs retry connection errors,
+429 and 5xx responses with jittered exponential backoff (honoring
+`Retry-After`), `HTTP_MAX_RETRIES` sets how often. HTTP/2 is used when
+`HTTP2` is on and the `h2` package is installed (`httpx[http2]`).
+
+`OPENAI_BASE_URL` and `COMPOSIO_BASE_URL` point the SDKs at another host,
+such as a proxy or a local fake of either API.
+"""
+
+from app.chat.metrics import HEDGED_REQUESTS
+from app.config import Config
+from composio import Composio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+import contextvars
+import httpx
+import importlib.util
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_openai_client: OpenAI | None = None
+_clients_lock = threading.Lock()
+_async_openai_client: AsyncOpenAI | None = None
+_composio_client: Composio | None = None
+
+# requests and their hedges, separate from the callers' pools so a hedge is
+# never queued behind the request it duplicates
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=Config.EMBEDDING_HEDGE_WORKERS, thread_name_prefix="hedge"
+)
+
+
+def http_options() -> dict:
+    """Pool, timeout and protocol settings shared by every client
+
+    returns:
+        dict: Keyword arguments for `httpx.Client` and `httpx.AsyncClient`
+
+    """
+    http2 = Config.HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2 is on but h2 is not installed, using HTTP/1.1")
+        http2 = False
+    return {
+        "limits": httpx.Limits(
+            max_connections=Config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(
+            Config.HTTP_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT
+        ),
+        "http2": http2,
+    }
+
+
+def get_openai_client() -> OpenAI:
+    """Get the shared OpenAI client
+
+    The client (and its connection pool) is created once per process so that
+    repeated calls reuse the same keep-alive connections instead of paying for
+    a new TLS handshake on every request.
+
+    returns:
+        OpenAI: The shared OpenAI client
+
+    """
+    global _openai_client
+    if _openai_client is None:
+        with _clients_lock:
+            if _openai_client is None:
+                options = http_options()
+                _openai_client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    timeout=options["timeout"],
+                    max_retries=Config.HTTP_MAX_RETRIES,
+                    http_client=DefaultHttpxClient(**options),
+                )
+    return _openai_client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Get the shared AsyncOpenAI client
+
+    Used by the asyncio chat pipeline. Like the sync client it is created
+    once, call it from the event loop that serves requests so its connection
+    pool is bound to that loop.
+
+    returns:
+        AsyncOpenAI: The shared AsyncOpenAI client
+
+    """
+    global _async_openai_client
+    if _async_openai_client is None:
+        with _clients_lock:
+            if _async_openai_client is None:
+                options = http_options()
+                _async_openai_client = AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    timeout=options["timeout"],
+                    max_retries=Config.HTTP_MAX_RETRIES,
+                    http_client=DefaultAsyncHttpxClient(**options),
+                )
+    return _async_openai_client
+
+
+def get_composio_client() -> Composio:
+    """Get the shared Composio client
+
+    Tool calls of every user go through one client and connection pool.
+
+    returns:
+        Composio: The shared Composio client
+
+    """
+    global _composio_client
+    if _composio_client is None:
+        with _clients_lock:
+            if _composio_client is None:
+                _composio_client = Composio(
+                    timeout=int(Config.HTTP_TIMEOUT),
+                    max_retries=Config.HTTP_MAX_RETRIES,
+                    http_client=httpx.Client(**http_options()),
+                )
+    return _composio_client
+
+
+def hedged(call, delay: float):
+    """Run an idempotent request, sending a duplicate if it is slow
+
+    When `call` has not returned after `delay` seconds the same request is
+    sent again and whichever finishes first wins, which cuts the tail
+    latency of small requests at the cost of some duplicate load. The loser
+    is cancelled if it is still waiting for a worker, one that already runs
+    finishes and its result is dropped. Only use it for requests that are
+    safe to send twice, like embeddings.
+
+    args:
+        call (Callable[[], T]): The request
+        delay (float): Seconds to wait before hedging, 0 sends one request
+
+    returns:
+        T: The result of the first request to succeed
+
+    raises:
+        Exception: The error of the last request if both fail
+
+    """
+    if delay <= 0:
+        return call()
+    # each request runs in its own copy of the caller's context (and trace)
+    context = contextvars.copy_context()
+    first = _hedge_executor.submit(context.copy().run, call)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    HEDGED_REQUESTS.labels("sent").inc()
+    second = _hedge_executor.submit(context.copy().run, call)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    HEDGED_REQUESTS.labels("won").inc()
+                for loser in pending:
+                    loser.cancel()
+                return future.result()
+            error = future.exception()
+    raise error
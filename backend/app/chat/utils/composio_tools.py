@@ -34,7 +34,7 @@ composio_tools = [
     {
         "type": "function",
         "name": "recommend_movies",
-        "description": "Recommend movies based on a query.",
+        "description": "Recommend movies based on a query. Use the optional filters for year, genre or runtime constraints instead of putting them in the query.",
         "parameters": {
             "type": "object",
             "properties": {
@@ -46,9 +46,82 @@ composio_tools = [
                     "type": "integer",
                     "description": "The number of results to return.",
                 },
+                "year": {
+                    "type": "integer",
+                    "description": "Only return movies released in this year.",
+                },
+                "min_year": {
+                    "type": "integer",
+                    "description": "Only return movies released in or after this year.",
+                },
+                "max_year": {
+                    "type": "integer",
+                    "description": "Only return movies released in or before this year.",
+                },
+                "genre": {
+                    "type": "string",
+                    "description": "Only return movies of this genre, e.g. horror, thriller, action, comedy.",
+                },
+                "min_runtime": {
+                    "type": "integer",
+                    "description": "Only return movies at least this many minutes long.",
+                },
+                "max_runtime": {
+                    "type": "integer",
+                    "description": "Only return movies at most this many minutes long.",
+                },
             },
             "required": ["query"],
             "additionalProperties": False,
         },
     },
+    {
+        "type": "function",
+        "name": "recommend_movies_batch",
+        "description": "Recommend movies for several queries (preference angles) at once. Prefer this over several recommend_movies calls in the same turn.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "queries": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "The search queries for the embedding database, one per preference angle.",
+                },
+                "top_k": {
+                    "type": "integer",
+                    "description": "The number of results to return per query.",
+                },
+                "dedupe": {
+                    "type": "boolean",
+                    "description": "Do not return the same movie for two queries. Defaults to true.",
+                },
+                "year": {
+                    "type": "integer",
+                    "description": "Only return movies released in this year.",
+                },
+                "min_year": {
+                    "type": "integer",
+                    "description": "Only return movies released in or after this year.",
+                },
+                "max_year": {
+                    "type": "integer",
+                    "description": "Only return movies released in or before this year.",
+                },
+                "genre": {
+                    "type": "string",
+                    "description": "Only return movies of this genre, e.g. horror, thriller, action, comedy.",
+                },
+                "min_runtime": {
+                    "type": "integer",
+                    "description": "Only return movies at least this many minutes long.",
+                },
+                "max_runtime": {
+                    "type": "integer",
+                    "description": "Only return movies at most this many minutes long.",
+                },
+            },
+            "required": ["queries"],
+            "additionalProperties": False,
+        },
+    },
 ]
@@ -0,0 +1,240 @@
+from app.extensions import db
+from collections import OrderedDict
+from sqlalchemy import text
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Two-tier cache for query embeddings
+
+    The first tier is an in-process LRU with a size and TTL limit. The second
+    tier is the `embedding_cache` table in postgres, which survives restarts
+    and is shared between workers. Entries are keyed by the normalized query
+    text and the embedding model name. Persistent entries expire after
+    `persist_ttl` seconds and are pruned at most every `prune_interval`.
+
+    The table is read and written on connections of its own, so a cache
+    write never commits (or a failure rolls back) the caller's session.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: int = 3600,
+        persist: bool = True,
+        persist_ttl: int = 30 * 24 * 3600,
+        prune_interval: float = 3600,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.persist = persist
+        self.persist_ttl = persist_ttl
+        self.prune_interval = prune_interval
+        self._pruned = time.monotonic()
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query so trivially different strings share an entry
+
+        Args:
+            query (str): The raw query text
+
+        Returns:
+            str: The query lower cased with collapsed whitespace
+        """
+        return " ".join(query.split()).casefold()
+
+    def make_key(self, query: str, model: str) -> str:
+        """Build the cache key for a query and model
+
+        Args:
+            query (str): The raw query text
+            model (str): The embedding model name
+
+        Returns:
+            str: A sha256 hex digest of the model and normalized query
+        """
+        raw = f"{model}\x00{self.normalize(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, model: str) -> list[float] | None:
+        """Look up an embedding, checking memory first and then postgres
+
+        Args:
+            query (str): The raw query text
+            model (str): The embedding model name
+
+        Returns:
+            list[float] | None: The cached embedding or None on a miss
+        """
+        return self.get_many([query], model)[0]
+
+    def get_many(self, queries: list[str], model: str) -> list[list[float] | None]:
+        """Look up several embeddings with at most one postgres round-trip
+
+        Args:
+            queries (list[str]): The raw query texts
+            model (str): The embedding model name
+
+        Returns:
+            list[list[float] | None]: One entry per query, None on a miss
+        """
+        keys = [self.make_key(query, model) for query in queries]
+        found: list[list[float] | None] = [None] * len(keys)
+        now = time.monotonic()
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                stored_at, embedding = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    found[i] = embedding
+                else:
+                    del self._entries[key]
+
+        missing = [key for key, embedding in zip(keys, found) if embedding is None]
+        if self.persist and missing:
+            loaded = self._load(missing)
+            for i, key in enumerate(keys):
+                if found[i] is None and key in loaded:
+                    found[i] = loaded[key]
+                    self._remember(key, loaded[key])
+                    with self._lock:
+                        self.persistent_hits += 1
+
+        with self._lock:
+            self.misses += sum(1 for embedding in found if embedding is None)
+        return found
+
+    def put(self, query: str, model: str, embedding: list[float]):
+        """Store an embedding in both tiers
+
+        Args:
+            query (str): The raw query text
+            model (str): The embedding model name
+            embedding (list[float]): The embedding to store
+
+        Returns:
+            None
+        """
+        self.put_many([query], model, [embedding])
+
+    def put_many(self, queries: list[str], model: str, embeddings: list[list[float]]):
+        """Store several embeddings in both tiers with a single insert
+
+        Args:
+            queries (list[str]): The raw query texts
+            model (str): The embedding model name
+            embeddings (list[list[float]]): The embeddings, in query order
+
+        Returns:
+            None
+        """
+        rows = []
+        for query, embedding in zip(queries, embeddings):
+            key = self.make_key(query, model)
+            self._remember(key, embedding)
+            rows.append(
+                {
+                    "key": key,
+                    "model": model,
+                    "query": self.normalize(query),
+                    "embedding": json.dumps(embedding),
+                }
+            )
+        if self.persist and rows:
+            self._store(rows)
+
+    def clear(self):
+        """Drop every in-process entry (the persistent tier is left as is)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters used to size the cache
+
+        Returns:
+            dict: Counters and current size of the in-process tier
+        """
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.persistent_hits) / lookups if lookups else 0.0
+                ),
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+            }
+
+    def _remember(self, key: str, embedding: list[float]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _load(self, keys: list[str]) -> dict[str, list[float]]:
+        sql = text("""
+            SELECT key, embedding::text AS embedding
+            FROM embedding_cache
+            WHERE key = ANY(:keys)
+              AND created_at > now() - make_interval(secs => :ttl)
+        """)
+        try:
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    sql, {"keys": keys, "ttl": self.persist_ttl}
+                ).all()
+        except Exception:
+            logger.warning("Embedding cache lookup failed", exc_info=True)
+            return {}
+        return {row.key: json.loads(row.embedding) for row in rows}
+
+    def _store(self, rows: list[dict]):
+        # a re-stored expired entry gets a fresh timestamp
+        sql = text("""
+            INSERT INTO embedding_cache (key, model, query, embedding, created_at)
+            VALUES (:key, :model, :query, CAST(:embedding AS vector), now())
+            ON CONFLICT (key) DO UPDATE
+            SET embedding = EXCLUDED.embedding, created_at = EXCLUDED.created_at
+        """)
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(sql, rows)
+                if self._prune_due():
+                    self._prune(connection)
+        except Exception:
+            logger.warning("Embedding cache write failed", exc_info=True)
+
+    def _prune_due(self) -> bool:
+        with self._lock:
+            if time.monotonic() - self._pruned < self.prune_interval:
+                return False
+            self._pruned = time.monotonic()
+            return True
+
+    def _prune(self, connection):
+        sql = text("""
+            DELETE FROM embedding_cache
+            WHERE created_at <= now() - make_interval(secs => :ttl)
+        """)
+        deleted = connection.execute(sql, {"ttl": self.persist_ttl}).rowcount
+        logger.debug("Pruned %s expired embedding cache entries", deleted)
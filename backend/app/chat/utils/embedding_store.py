@@ -0,0 +1,226 @@
+"""Columnar on-disk store for movie embeddings.
+
+A store is a directory with three files:
+
+    header.json      format version, model, dimension, dtype and row count
+    index.json       titles (and optional database ids and metadata columns),
+                     one entry per matrix row
+    embeddings.npy   the (count, dim) float32 or float16 matrix
+
+The matrix is opened memory-mapped, so loading is zero-copy and the pages are
+shared between processes. See `build_embeddings.py` for converting the
+legacy pickles or re-embedding the catalog csv.
+"""
+
+from pathlib import Path
+import csv
+import json
+import os
+import pickle
+import numpy as np
+
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+INDEX_FILE = "index.json"
+MATRIX_FILE = "embeddings.npy"
+DTYPES = ("float32", "float16")
+
+
+class EmbeddingStore:
+    """A loaded embedding store (see the module docstring for the layout)"""
+
+    def __init__(
+        self,
+        path: Path,
+        header: dict,
+        titles: list[str],
+        matrix: np.ndarray,
+        ids: list[int] | None = None,
+        metadata: dict[str, list] | None = None,
+    ):
+        self.path = path
+        self.header = header
+        self.titles = titles
+        self.matrix = matrix
+        self.ids = ids
+        self.metadata = metadata or {}
+
+    @property
+    def model(self) -> str:
+        return self.header["model"]
+
+    @property
+    def dim(self) -> int:
+        return self.header["dim"]
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @staticmethod
+    def exists(path: str | Path) -> bool:
+        """Check whether a directory holds a complete store"""
+        path = Path(path)
+        return all(
+            (path / name).exists() for name in (HEADER_FILE, INDEX_FILE, MATRIX_FILE)
+        )
+
+    @classmethod
+    def load(cls, path: str | Path, mmap: bool = True) -> "EmbeddingStore":
+        """Open a store
+
+        Args:
+            path (str | Path): The store directory
+            mmap (bool): Memory-map the matrix instead of reading it
+
+        Returns:
+            EmbeddingStore: The store, its matrix is read-only when mapped
+        """
+        path = Path(path)
+        with open(path / HEADER_FILE) as f:
+            header = json.load(f)
+        if header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store format in {path}")
+        with open(path / INDEX_FILE) as f:
+            index = json.load(f)
+        matrix = np.load(path / MATRIX_FILE, mmap_mode="r" if mmap else None)
+        if matrix.shape != (header["count"], header["dim"]):
+            raise ValueError(
+                f"Embedding store {path} is corrupt: header says "
+                f"{(header['count'], header['dim'])}, matrix is {matrix.shape}"
+            )
+        return cls(
+            path,
+            header,
+            index["titles"],
+            matrix,
+            index.get("ids"),
+            index.get("metadata"),
+        )
+
+    @classmethod
+    def write(
+        cls,
+        path: str | Path,
+        titles: list[str],
+        matrix: np.ndarray,
+        model: str,
+        dtype: str = "float32",
+        ids: list[int] | None = None,
+        metadata: dict[str, list] | None = None,
+    ) -> "EmbeddingStore":
+        """Write a store, replacing any store already in the directory
+
+        Files are written under temporary names and renamed, with the header
+        last, so a reader never sees a half written store.
+
+        Args:
+            path (str | Path): The store directory
+            titles (list[str]): One title per matrix row
+            matrix (np.ndarray): The (count, dim) embedding matrix
+            model (str): The embedding model that produced the vectors
+            dtype (str): "float32" or "float16" on disk
+            ids (list[int] | None): Optional database ids, one per row
+            metadata (dict[str, list] | None): Optional columns (e.g. year),
+                each with one json-serializable value per row
+
+        Returns:
+            EmbeddingStore: The freshly written store, memory-mapped
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype}")
+        matrix = np.ascontiguousarray(matrix, dtype=dtype)
+        if matrix.ndim != 2 or len(matrix) != len(titles):
+            raise ValueError("matrix must be 2d with one row per title")
+        if ids is not None and len(ids) != len(titles):
+            raise ValueError("ids must have one entry per title")
+        if any(len(column) != len(titles) for column in (metadata or {}).values()):
+            raise ValueError("metadata columns must have one entry per title")
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        header = {
+            "format_version": FORMAT_VERSION,
+            "model": model,
+            "dim": int(matrix.shape[1]),
+            "dtype": dtype,
+            "count": int(matrix.shape[0]),
+        }
+        index = {"titles": list(titles)}
+        if ids is not None:
+            index["ids"] = [int(i) for i in ids]
+        if metadata:
+            index["metadata"] = {name: list(col) for name, col in metadata.items()}
+
+        suffix = f".{os.getpid()}.tmp"
+        with open(path / (MATRIX_FILE + suffix), "wb") as f:
+            np.save(f, matrix)
+        with open(path / (INDEX_FILE + suffix), "w") as f:
+            json.dump(index, f)
+        with open(path / (HEADER_FILE + suffix), "w") as f:
+            json.dump(header, f, indent=2)
+        for name in (MATRIX_FILE, INDEX_FILE, HEADER_FILE):
+            os.replace(path / (name + suffix), path / name)
+        return cls.load(path)
+
+    def as_float32(self) -> np.ndarray:
+        """The matrix as float32, zero-copy when the store is float32"""
+        return np.asarray(self.matrix, dtype=np.float32)
+
+
+def convert_pickles(
+    source: str | Path,
+    destination: str | Path,
+    model: str = "text-embedding-3-small",
+    dtype: str = "float32",
+) -> EmbeddingStore:
+    """Convert a directory of pickled embeddings responses into a store
+
+    Only run this on pickles you produced yourself, unpickling runs code.
+
+    Args:
+        source (str | Path): Directory of `<title>.pkl` files, each holding an
+            OpenAI `CreateEmbeddingResponse`
+        destination (str | Path): The store directory to write
+        model (str): The model recorded in the header
+        dtype (str): "float32" or "float16" on disk
+
+    Returns:
+        EmbeddingStore: The written store
+    """
+    titles, vectors = [], []
+    for path in sorted(Path(source).glob("*.pkl")):
+        with open(path, "rb") as f:
+            response = pickle.load(f)
+        titles.append(path.stem)
+        vectors.append(response.data[0].embedding)
+    return EmbeddingStore.write(
+        destination, titles, np.asarray(vectors), model=model, dtype=dtype
+    )
+
+
+def embed_catalog(
+    csv_path: str | Path, destination: str | Path, dtype: str = "float32"
+) -> EmbeddingStore:
+    """Embed every `description` in a catalog csv and write a store
+
+    Args:
+        csv_path (str | Path): A csv with `title` and `description` columns
+        destination (str | Path): The store directory to write
+        dtype (str): "float32" or "float16" on disk
+
+    Returns:
+        EmbeddingStore: The written store
+    """
+    from app.chat.services import get_embeddings
+    from app.config import Config
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    vectors = get_embeddings([row["description"] for row in rows], use_cache=False)
+    return EmbeddingStore.write(
+        destination,
+        [row["title"] for row in rows],
+        np.asarray(vectors),
+        model=Config.EMBEDDING_MODEL,
+        dtype=dtype,
+    )
@@ -1,6 +1,7 @@
 from app.chat.utils.schemas import (
     SearchResults,
     VectorSearchResults,
+    BatchVectorSearchResults,
     NewsSearchResults,
     AvailableOn,
     CastMember,
@@ -9,12 +10,72 @@ from app.chat.utils.schemas import (
     PopularMovies,
     PopularMovie,
     Headlines,
+    ComposioMovieInfo,
+    ComposioNewsResult,
+    ComposioPopularMovie,
+    join_roles,
 )
-import traceback
+from pydantic import TypeAdapter
+from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# built once, each validates a whole payload into plain dicts in one call
+MOVIE_INFO_ADAPTER = TypeAdapter(ComposioMovieInfo)
+POPULAR_MOVIES_ADAPTER = TypeAdapter(List[ComposioPopularMovie])
+NEWS_ADAPTER = TypeAdapter(List[ComposioNewsResult])
 
 
 def parse_composio_search_results(composio_result: dict) -> dict:
-    """Parse COMPOSIO_SEARCH_SEARCH results into UnifiedSearchResponse format."""
+    """Parse COMPOSIO_SEARCH_SEARCH results into UnifiedSearchResponse format.
+
+    The payload is validated into the result in one pass. Payloads that do not
+    validate are parsed again item by item, so errors read the same as before.
+    """
+    try:
+        search_data = composio_result.get("data", {}).get("results", {})
+        if "available_on" in search_data:
+            available_on_info = search_data.get("available_on", [])
+            knowledge = search_data.get("knowledge_graph", {})
+            reviews = knowledge.get("editorial_reviews", [])
+            # item by item a review without a rating is an error, keep that
+            if any("rating" not in review for review in reviews):
+                return parse_composio_search_results_by_item(composio_result)
+            return MOVIE_INFO_ADAPTER.validate_python(
+                {
+                    "available_on": available_on_info,
+                    "cast": knowledge.get("cast", []),
+                    "director": knowledge.get("director", ""),
+                    "description": knowledge.get("description", ""),
+                    "reviews": reviews,
+                    "headlines": knowledge.get("organic_results", []),
+                }
+            )
+        knowledge = search_data.get("knowledge_graph", {})
+        popular_movies = POPULAR_MOVIES_ADAPTER.validate_python(
+            knowledge.get("popular_movies", [])
+        )
+        return {"popular_movies": popular_movies}
+    except Exception:
+        return parse_composio_search_results_by_item(composio_result)
+
+
+def parse_composio_news_search_results(composio_result: dict) -> dict:
+    """Parse COMPOSIO_SEARCH_NEWS_SEARCH results into UnifiedSearchResponse format.
+
+    Validated in one pass like `parse_composio_search_results`.
+    """
+    try:
+        search_data = composio_result.get("data", {}).get("results", {})
+        news = NEWS_ADAPTER.validate_python(search_data.get("news_results", []))
+        return {"results": news}
+    except Exception:
+        return parse_composio_news_search_results_by_item(composio_result)
+
+
+def parse_composio_search_results_by_item(composio_result: dict) -> dict:
+    """Parse COMPOSIO_SEARCH_SEARCH results one item at a time (reference)."""
     try:
         search_data = composio_result.get("data", {}).get("results", {})
         if "available_on" in search_data:
@@ -39,7 +100,7 @@ def parse_composio_search_results(composio_result: dict) -> dict:
             for member in cast_info:
                 cast_member = CastMember(
                     name=member.get("name", ""),
-                    role=member.get("extensions", ""),
+                    role=join_roles(member.get("extensions", "")),
                 )
                 cast.append(cast_member)
 
@@ -84,12 +145,12 @@ def parse_composio_search_results(composio_result: dict) -> dict:
 
         return
     except Exception as e:
-        print(traceback.format_exc())
+        logger.warning("Failed to parse COMPOSIO search results", exc_info=True)
         return {"error": f"Failed to parse COMPOSIO news search results: {str(e)}"}
 
 
-def parse_composio_news_search_results(composio_result: dict) -> dict:
-    """Parse COMPOSIO_SEARCH_NEWS_SEARCH results into UnifiedSearchResponse format."""
+def parse_composio_news_search_results_by_item(composio_result: dict) -> dict:
+    """Parse COMPOSIO_SEARCH_NEWS_SEARCH results one item at a time (reference)."""
     try:
         search_data = composio_result.get("data", {}).get("results", {})
 
@@ -111,7 +172,7 @@ def parse_composio_news_search_results(composio_result: dict) -> dict:
         return news_search_results.model_dump()
 
     except Exception as e:
-        print(traceback.format_exc())
+        logger.warning("Failed to parse COMPOSIO news search results", exc_info=True)
         return {"error": f"Failed to parse COMPOSIO news search results: {str(e)}"}
 
 
@@ -124,3 +185,21 @@ def parse_vector_search_results(result: list):
 
     vector_search_results = SearchResults(results=movies)
     return vector_search_results.model_dump()
+
+
+def parse_batch_vector_search_results(result: list):
+    """Parse recommend_movies_batch results, one group per query."""
+    if isinstance(result, dict):  # tool error
+        return result
+    groups = []
+    for group in result:
+        movies = [
+            VectorSearchResults(title=movie_item.get("movie"))
+            for movie_item in group.get("movies", [])
+        ]
+        groups.append(
+            BatchVectorSearchResults(query=group.get("query", ""), results=movies)
+        )
+
+    batch_search_results = SearchResults(results=groups)
+    return batch_search_results.model_dump()
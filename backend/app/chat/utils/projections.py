@@ -0,0 +1,135 @@
+import json
+
+
+def _clip(text, max_chars: int):
+    if not isinstance(text, str) or len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "..."
+
+
+def _compact(item: dict) -> dict:
+    # empty strings, lists and None carry nothing for the model
+    return {k: v for k, v in item.items() if v not in (None, "", [], {})}
+
+
+def project_movie_info(result: dict, max_items: int, max_chars: int) -> dict:
+    """Keep the facts of a movie lookup, drop links and thumbnails"""
+    if "popular_movies" in result:
+        return {
+            "popular_movies": [
+                _compact(
+                    {
+                        "name": movie.get("name"),
+                        "info": (movie.get("general_info") or [])[:max_items],
+                    }
+                )
+                for movie in result["popular_movies"][:max_items]
+            ]
+        }
+    return _compact(
+        {
+            "director": result.get("director"),
+            "description": _clip(result.get("description"), max_chars),
+            "cast": [
+                (
+                    f"{member['name']} ({member['role']})"
+                    if member.get("role")
+                    else member["name"]
+                )
+                for member in result.get("cast", [])[:max_items]
+                if member.get("name")
+            ],
+            "available_on": [
+                _compact({"name": item.get("name"), "price": item.get("price")})
+                for item in result.get("available_on", [])[:max_items]
+            ],
+            "reviews": [
+                _compact({"title": review.get("title"), "rating": review.get("rating")})
+                for review in result.get("reviews", [])[:max_items]
+            ],
+            "headlines": [
+                _compact(
+                    {
+                        "source": headline.get("source"),
+                        "snippet": _clip(headline.get("snippet"), max_chars),
+                    }
+                )
+                for headline in result.get("headlines", [])[:max_items]
+            ],
+        }
+    )
+
+
+def project_news(result: dict, max_items: int, max_chars: int) -> dict:
+    """Keep title, date, source and a short snippet of each article"""
+    return {
+        "results": [
+            _compact(
+                {
+                    "title": item.get("title"),
+                    "date": item.get("date"),
+                    "source": item.get("source"),
+                    "snippet": _clip(item.get("snippet"), max_chars),
+                }
+            )
+            for item in result.get("results", [])[:max_items]
+        ]
+    }
+
+
+def project_movies(result: dict, max_items: int, max_chars: int) -> dict:
+    """Recommended titles, all of them: the model chose `top_k`"""
+    return {"titles": [item["title"] for item in result.get("results", [])]}
+
+
+def project_movies_batch(result: dict, max_items: int, max_chars: int) -> dict:
+    """Recommended titles per query"""
+    return {
+        "results": [
+            {
+                "query": group["query"],
+                "titles": [item["title"] for item in group.get("results", [])],
+            }
+            for group in result.get("results", [])
+        ]
+    }
+
+
+def project_tool_result(
+    tool_name: str, result, max_items: int = 5, max_chars: int = 200
+):
+    """Select what the model needs from a parsed tool result
+
+    Args:
+        tool_name (str): The tool that produced the result
+        result (dict): The result of `ChatService.parse_result`
+        max_items (int): Longest list kept, recommended titles are not capped
+        max_chars (int): Longest description or snippet kept
+
+    Returns:
+        dict: The projected result, errors are passed through unchanged
+    """
+    if not isinstance(result, dict) or "error" in result:
+        return result
+    name = tool_name.lower()
+    if "news" in name:
+        project = project_news
+    elif "batch" in name:
+        project = project_movies_batch
+    elif "movies" in name:
+        project = project_movies
+    else:
+        project = project_movie_info
+    return project(result, max_items, max_chars)
+
+
+def encode_compact(projected) -> str:
+    """Encode a projected tool result as compact json for the chat history
+
+    Args:
+        projected (dict): The result of `project_tool_result`
+
+    Returns:
+        str: json without whitespace between items
+    """
+    return json.dumps(projected, separators=(",", ":"), ensure_ascii=False, default=str)
@@ -1,5 +1,6 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Annotated, List, Optional
+from typing_extensions import TypedDict
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, with_config
 
 
 class AvailableOn(BaseModel):
@@ -60,9 +61,92 @@ class VectorSearchResults(BaseModel):
     title: str
 
 
+class BatchVectorSearchResults(BaseModel):
+    query: str
+    results: List[VectorSearchResults]
+
+
 class SearchResults(BaseModel):
     results: List
 
 
 class UnifiedSearchResponse(BaseModel):
     search_results: SearchResults
+
+
+def join_roles(value):
+    """Cast `extensions` come as a string or a list of roles, join a list"""
+    if isinstance(value, list):
+        return ", ".join(str(role) for role in value)
+    return value
+
+
+# Composio payloads, validated straight into the parsed dicts: the schemas
+# above as TypedDicts with the raw response's key names and the defaults the
+# item by item parsers use for missing keys. Keys keep the schemas' order.
+PAYLOAD_CONFIG = ConfigDict(validate_default=True)
+
+
+@with_config(PAYLOAD_CONFIG)
+class ComposioAvailableOn(TypedDict):
+    link: Annotated[Optional[str], Field(default="")]
+    name: Annotated[Optional[str], Field(default="")]
+    price: Annotated[Optional[str], Field(default="")]
+    thumbnail: Annotated[Optional[str], Field(default="")]
+
+
+@with_config(PAYLOAD_CONFIG)
+class ComposioCastMember(TypedDict):
+    name: Annotated[Optional[str], Field(default="")]
+    role: Annotated[
+        Optional[str],
+        BeforeValidator(join_roles),
+        Field(default="", validation_alias="extensions"),
+    ]
+
+
+@with_config(PAYLOAD_CONFIG)
+class ComposioReview(TypedDict):
+    # a review without a rating fails item by item, the formatter checks
+    # for it before validating
+    rating: Annotated[Optional[int], Field(default=None)]
+    title: Annotated[Optional[str], Field(default="")]
+    link: Annotated[Optional[str], Field(default="")]
+
+
+@with_config(PAYLOAD_CONFIG)
+class ComposioHeadlines(TypedDict):
+    link: Annotated[Optional[str], Field(default="")]
+    source: Annotated[Optional[str], Field(default="")]
+    snippet: Annotated[Optional[str], Field(default="")]
+
+
+@with_config(PAYLOAD_CONFIG)
+class ComposioMovieInfo(TypedDict):
+    available_on: List[ComposioAvailableOn]
+    cast: List[ComposioCastMember]
+    director: Optional[str]
+    description: Optional[str]
+    reviews: List[ComposioReview]
+    headlines: List[ComposioHeadlines]
+
+
+@with_config(PAYLOAD_CONFIG)
+class ComposioPopularMovie(TypedDict):
+    img: Annotated[Optional[str], Field(default="", validation_alias="image")]
+    link: Annotated[Optional[str], Field(default="")]
+    name: Annotated[Optional[str], Field(default="")]
+    general_info: Annotated[
+        Optional[List[str]], Field(default_factory=list, validation_alias="extensions")
+    ]
+
+
+@with_config(PAYLOAD_CONFIG)
+class ComposioNewsResult(TypedDict):
+    title: Annotated[str, Field(default="")]
+    date: Annotated[str, Field(default="")]
+    snippet: Annotated[str, Field(default="")]
+    link: Annotated[str, Field(default="")]
+    source: Annotated[str, Field(default="")]
+    favicon: Annotated[str, Field(default="")]
+    position: Annotated[str, BeforeValidator(str), Field(default="")]
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import threading
+import time
+import numpy as np
+
+
+class SemanticCache:
+    """Cache of recommend results keyed by query vector similarity
+
+    A lookup returns the results of the most similar cached query vector if
+    its cosine similarity is at least `threshold` and it was stored with the
+    same `scope` (top_k, filters, ...). Unit vectors are kept in one
+    preallocated matrix so a lookup is a single matrix-vector product.
+
+    Entries are evicted least recently used once `max_entries` is reached.
+    The whole cache is dropped when `version_fn` (e.g. `catalog_version`)
+    reports a new value, checked at most every `check_interval` seconds, or
+    when `invalidate` is called.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        threshold: float = 0.95,
+        version_fn=None,
+        check_interval: float = 30.0,
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.version_fn = version_fn
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # serializes version checks, kept apart from `_lock` so lookups are
+        # not held up while `version_fn` queries the database
+        self._version_lock = threading.Lock()
+        self._vectors: np.ndarray | None = None  # allocated on first put
+        # slot -> (scope, results), ordered from least to most recently used
+        self._entries: OrderedDict[int, tuple] = OrderedDict()
+        self._free: list[int] = list(range(max_entries - 1, -1, -1))
+        self._version = None
+        self._checked_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, query_vector: list[float], scope: tuple = ()):
+        """Find results cached for a near-identical query
+
+        Args:
+            query_vector (list[float]): The query embedding
+            scope (tuple): Everything besides the vector the results depend on
+
+        Returns:
+            list | None: The cached results or None on a miss
+        """
+        self._check_version()
+        query = self._unit(query_vector)
+        with self._lock:
+            if self._entries and query is not None and self._vectors is not None:
+                slots = np.fromiter(self._entries.keys(), dtype=np.int64)
+                similarity = self._vectors[slots] @ query
+                for i in np.argsort(-similarity):
+                    if similarity[i] < self.threshold:
+                        break
+                    slot = int(slots[i])
+                    entry_scope, results = self._entries[slot]
+                    if entry_scope == scope:
+                        self._entries.move_to_end(slot)
+                        self.hits += 1
+                        return results
+            self.misses += 1
+            return None
+
+    def put(self, query_vector: list[float], results: list, scope: tuple = ()):
+        """Cache the results of a query
+
+        Args:
+            query_vector (list[float]): The query embedding
+            results (list): The results to return for similar queries
+            scope (tuple): Everything besides the vector the results depend on
+
+        Returns:
+            None
+        """
+        query = self._unit(query_vector)
+        if query is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(query):
+                self._vectors = np.zeros((self.max_entries, len(query)), np.float32)
+                self._entries.clear()
+                self._free = list(range(self.max_entries - 1, -1, -1))
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+            self._vectors[slot] = query
+            self._entries[slot] = (scope, results)
+
+    def invalidate(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters used to tune the threshold and size
+
+        Returns:
+            dict: Counters and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+            }
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        with self._version_lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            version = self.version_fn()
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidate()
+                self._version = version
+
+    @staticmethod
+    def _unit(vector: list[float]) -> np.ndarray | None:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
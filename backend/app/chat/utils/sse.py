@@ -0,0 +1,160 @@
+import asyncio
+import json
+import time
+
+# events whose text is streamed in deltas and may be merged
+TEXT_EVENTS = ("init_response", "final_response")
+_DONE = object()
+
+
+def frame(payload: str) -> str:
+    """Wrap a json encoded event in an SSE frame"""
+    return f"data: {payload}\n\n"
+
+
+def is_text(event) -> bool:
+    """Whether an event is a text delta that may be merged with others"""
+    return isinstance(event, dict) and event.get("type") in TEXT_EVENTS
+
+
+class FrameCoalescer:
+    """Merge consecutive text deltas into fewer SSE frames
+
+    The chat service yields text deltas as `{"type", "text"}` dicts and
+    every other event json encoded. Text deltas of the same kind are
+    buffered and sent as one event once the oldest buffered delta is
+    `window` seconds old or `max_chars` characters are buffered. Any other
+    event (tool use, tool result, errors) flushes the buffer before it is
+    sent. The first delta of a stream, and the first
+    after any other event, is sent right away so the model output does not
+    appear later than before. A window of 0 turns coalescing off.
+    """
+
+    def __init__(self, window: float = 0.05, max_chars: int = 256):
+        self.window = window
+        self.max_chars = max_chars
+        self._kind: str | None = None
+        self._parts: list[str] = []
+        self._size = 0
+        self._started = 0.0
+        self._first = True
+
+    def push(self, event: dict | str) -> list[str]:
+        """Add an event from the chat service
+
+        Args:
+            event (dict | str): A text delta or a json encoded event
+
+        Returns:
+            list[str]: The frames to send now, possibly none
+        """
+        if not is_text(event) or self.window <= 0:
+            self._first = True
+            payload = json.dumps(event) if isinstance(event, dict) else event
+            return self.flush() + [frame(payload)]
+        frames = self.flush() if event["type"] != self._kind else []
+        if not self._parts:
+            self._kind = event["type"]
+            self._started = time.monotonic()
+        self._parts.append(event["text"])
+        self._size += len(event["text"])
+        if self._first or self._size >= self.max_chars or self.time_left() == 0:
+            self._first = False
+            frames += self.flush()
+        return frames
+
+    def flush(self) -> list[str]:
+        """Send whatever text is buffered
+
+        Returns:
+            list[str]: One frame with the merged text, none if nothing is buffered
+        """
+        if not self._parts:
+            return []
+        text = "".join(self._parts)
+        self._parts, self._size = [], 0
+        return [frame(json.dumps({"type": self._kind, "text": text}))]
+
+    def time_left(self) -> float | None:
+        """Seconds until the buffered text is due, None if nothing is buffered"""
+        if not self._parts:
+            return None
+        return max(self.window - (time.monotonic() - self._started), 0)
+
+
+def coalesce(events, window: float = 0.05, max_chars: int = 256):
+    """SSE frames for the events of a chat turn, text deltas merged
+
+    A buffer is only checked when the next event arrives, a pause in the
+    model stream delays buffered text until then or the end of the stream.
+
+    Args:
+        events (Iterable[dict | str]): Text deltas and json encoded events
+        window (float): Longest time in seconds a delta is held back
+        max_chars (int): Buffered characters that force a flush
+
+    Yields:
+        str: SSE frames
+    """
+    coalescer = FrameCoalescer(window, max_chars)
+    try:
+        for payload in events:
+            yield from coalescer.push(payload)
+    except Exception:
+        yield from coalescer.flush()
+        raise
+    yield from coalescer.flush()
+
+
+async def acoalesce(events, window: float = 0.05, max_chars: int = 256):
+    """Async `coalesce`, buffered text is also sent when its window ends
+
+    The events are consumed by a separate task so a slow model stream does
+    not hold back text that is due.
+
+    Args:
+        events (AsyncIterable[dict | str]): Text deltas and json encoded events
+        window (float): Longest time in seconds a delta is held back
+        max_chars (int): Buffered characters that force a flush
+
+    Yields:
+        str: SSE frames
+    """
+    coalescer = FrameCoalescer(window, max_chars)
+    # bounded, a slow client still slows down the model stream
+    queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+    async def produce():
+        try:
+            async for payload in events:
+                await queue.put(payload)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    getter = None
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=coalescer.time_left())
+            if not done:
+                for buffered in coalescer.flush():
+                    yield buffered
+                continue
+            item, getter = getter.result(), None
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                for buffered in coalescer.flush():
+                    yield buffered
+                raise item
+            for ready in coalescer.push(item):
+                yield ready
+        for buffered in coalescer.flush():
+            yield buffered
+    finally:
+        if getter is not None:
+            getter.cancel()
+        producer.cancel()
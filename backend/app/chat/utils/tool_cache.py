@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ToolResultCache:
+    """TTL cache with single-flight for external tool calls
+
+    Results are keyed by the tool slug and the canonicalized arguments and
+    kept for the tool's TTL (`ttls`, falling back to `default_ttl`, 0 turns
+    caching off for a tool). At most `max_entries` results are held, the
+    least recently used go first. Error results are never cached.
+
+    Concurrent calls with the same key share one in-flight request, callers
+    that arrive while it runs wait for its result instead of calling again.
+    """
+
+    def __init__(
+        self,
+        ttls: dict[str, float] | None = None,
+        default_ttl: float = 0,
+        max_entries: int = 512,
+    ):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+
+    @staticmethod
+    def canonicalize(value):
+        """Normalize arguments so equivalent calls share a key
+
+        Strings get collapsed whitespace and are case folded, dict keys are
+        sorted when serialized.
+        """
+        if isinstance(value, str):
+            return " ".join(value.split()).casefold()
+        if isinstance(value, dict):
+            return {k: ToolResultCache.canonicalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [ToolResultCache.canonicalize(v) for v in value]
+        return value
+
+    def make_key(self, slug: str, arguments: dict) -> str:
+        """Build the cache key for a tool call
+
+        Args:
+            slug (str): The tool slug
+            arguments (dict): The tool arguments
+
+        Returns:
+            str: The slug and canonical json of the arguments
+        """
+        canonical = json.dumps(
+            self.canonicalize(arguments or {}),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return f"{slug}:{canonical}"
+
+    def get_or_call(self, slug: str, arguments: dict, call):
+        """Return a cached result or run the call, once per key at a time
+
+        Args:
+            slug (str): The tool slug
+            arguments (dict): The tool arguments
+            call (callable): Runs the tool, takes no arguments
+
+        Returns:
+            Any: The tool result, errors raised by `call` reach every waiter
+        """
+        key = self.make_key(slug, arguments)
+        ttl = self.ttls.get(slug, self.default_ttl)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            logger.debug("Waiting for in-flight %s call", slug)
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            if ttl > 0 and self.cacheable(result):
+                self._store(key, result, ttl)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    @staticmethod
+    def cacheable(result) -> bool:
+        """Whether a result may be cached, failed calls are retried"""
+        if isinstance(result, dict):
+            return result.get("successful") is not False and not result.get("error")
+        return result is not None
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters used to tune the TTLs and size
+
+        Returns:
+            dict: Counters, `shared` counts calls served by an in-flight call
+        """
+        with self._lock:
+            lookups = self.hits + self.shared + self.misses
+            return {
+                "hits": self.hits,
+                "shared": self.shared,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "in_flight": len(self._in_flight),
+                "max_entries": self.max_entries,
+                "ttls": dict(self.ttls),
+            }
+
+    def _store(self, key: str, result, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
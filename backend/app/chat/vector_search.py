@@ -0,0 +1,547 @@
+from app.chat.models import Vector
+from app.chat.utils.embedding_store import EmbeddingStore
+from app.config import Config
+from app.extensions import db
+from pathlib import Path
+from sqlalchemy import text
+import hashlib
+import json
+import logging
+import shutil
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# extra candidates taken from the fast distance pass and re-ranked exactly,
+# so float rounding in the expanded form can't change the final order
+RERANK_MARGIN = 16
+
+# largest hnsw.ef_search pgvector accepts
+MAX_EF_SEARCH = 1000
+
+# metadata filters accepted by `search`: name -> (column, comparison)
+FILTERS = {
+    "year": ("year", "="),
+    "min_year": ("year", ">="),
+    "max_year": ("year", "<="),
+    "genre": ("genre", "="),
+    "min_runtime": ("runtime", ">="),
+    "max_runtime": ("runtime", "<="),
+}
+
+
+def clean_filters(filters: dict | None) -> dict:
+    """Drop unknown and empty filters and normalize the values
+
+    Args:
+        filters (dict | None): Filters as passed by the caller (or the model)
+
+    Returns:
+        dict: Only the known filters that have a value
+    """
+    cleaned = {}
+    for name, value in (filters or {}).items():
+        if name not in FILTERS or value in (None, ""):
+            continue
+        cleaned[name] = str(value).strip().lower() if name == "genre" else int(value)
+    return cleaned
+
+
+def filter_clause(filters: dict) -> tuple[str, dict]:
+    """Build a SQL predicate for the metadata filters
+
+    Args:
+        filters (dict): Filters returned by `clean_filters`
+
+    Returns:
+        tuple[str, dict]: The predicate ("TRUE" when empty) and its params
+    """
+    conditions, params = [], {}
+    for name, value in filters.items():
+        column, comparison = FILTERS[name]
+        conditions.append(f"{column} {comparison} :filter_{name}")
+        params[f"filter_{name}"] = value
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def set_vector_search_params(
+    ef_search: int | None = None,
+    probes: int | None = None,
+    filtered: bool = False,
+    limit: int = 0,
+):
+    """Set the ANN recall knobs for the current transaction
+
+    `hnsw.ef_search` is used by the HNSW index and `ivfflat.probes` by an
+    IVFFlat one, setting both is harmless. An HNSW scan returns at most
+    `ef_search` rows, so it is raised to `limit` when the query needs more,
+    up to pgvector's maximum of 1000.
+    For filtered queries the index scan is made iterative (pgvector >= 0.8)
+    so it keeps walking the graph until enough rows pass the filter instead
+    of returning too few. The values are transaction local so they only
+    apply to the query that follows.
+
+    Args:
+        ef_search (int | None): HNSW candidate list size, defaults to config
+        probes (int | None): IVFFlat lists to probe, defaults to config
+        filtered (bool): Whether the query has metadata filters
+        limit (int): Rows one index scan of the query has to return
+
+    Returns:
+        None
+    """
+    iterative_scan = Config.VECTOR_ITERATIVE_SCAN if filtered else "off"
+    ef_search = min(max(ef_search or Config.VECTOR_EF_SEARCH, limit), MAX_EF_SEARCH)
+    db.session.execute(
+        text("""
+            SELECT set_config('hnsw.ef_search', :ef_search, true),
+                   set_config('ivfflat.probes', :probes, true),
+                   set_config('hnsw.iterative_scan', :iterative_scan, true),
+                   set_config('ivfflat.iterative_scan', :iterative_scan, true)
+        """),
+        {
+            "ef_search": str(ef_search),
+            "probes": str(probes or Config.VECTOR_PROBES),
+            "iterative_scan": iterative_scan,
+        },
+    )
+
+
+def catalog_version() -> str:
+    """Cheap fingerprint of the `movies` table
+
+    Combines the planner's row estimate, the max id (read from the primary
+    key index) and postgres' insert/update/delete counters for the table, so
+    any write changes the value without scanning the table. The counters are
+    reported by the stats collector, a write can take a moment to show.
+
+    Returns:
+        str: An opaque version string
+    """
+    row = db.session.execute(
+        text("""
+            SELECT c.reltuples::bigint AS rows,
+                   (SELECT coalesce(max(id), 0) FROM movies) AS max_id,
+                   coalesce(s.n_tup_ins + s.n_tup_upd + s.n_tup_del, 0) AS writes
+            FROM pg_class c
+            LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+            WHERE c.oid = 'movies'::regclass
+        """)
+    ).one()
+    return f"{row.rows}:{row.max_id}:{row.writes}"
+
+
+def hybrid_candidates(top_k: int) -> int:
+    """Length of each ranking fused by a hybrid search returning `top_k`"""
+    return max(top_k, Config.RECOMMEND_CANDIDATES)
+
+
+def text_search(query_text: str, limit: int, filters: dict | None = None) -> list[dict]:
+    """Rank movies by full text match over `movies.search_vector`
+
+    The terms are ORed, `plainto_tsquery` would AND them and "movies like
+    drop" would then match nothing. Ties in `ts_rank_cd` are broken by id.
+
+    Args:
+        query_text (str): The raw query
+        limit (int): The number of movies to return
+        filters (dict | None): Metadata filters, see `FILTERS`
+
+    Returns:
+        list[dict]: `id` and `title` of each matching movie, best first
+    """
+    where, params = filter_clause(clean_filters(filters))
+    sql = text(f"""
+        SELECT id, title
+        FROM movies, (
+            SELECT replace(
+                plainto_tsquery('english', :query_text)::text, '&', '|'
+            )::tsquery AS query
+        ) text_query
+        WHERE search_vector @@ query AND {where}
+        ORDER BY ts_rank_cd(search_vector, query) DESC, id
+        LIMIT :limit
+    """)
+    result = db.session.execute(
+        sql, {"query_text": query_text, "limit": limit, **params}
+    )
+    return [{"id": r.id, "title": r.title} for r in result]
+
+
+def fuse(rankings: list[list[dict]], top_k: int) -> list[dict]:
+    """Merge rankings with reciprocal rank fusion
+
+    A movie scores `1 / (RECOMMEND_RRF_K + rank)` in every ranking it is in,
+    ties are broken by id.
+
+    Args:
+        rankings (list[list[dict]]): Result lists of `search`/`text_search`
+        top_k (int): The number of movies to return
+
+    Returns:
+        list[dict]: `id` and `title` of each movie, best first
+    """
+    scores, rows = {}, {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row["id"]] = scores.get(row["id"], 0.0) + 1.0 / (
+                Config.RECOMMEND_RRF_K + rank
+            )
+            rows.setdefault(row["id"], row)
+    best = sorted(scores, key=lambda id: (-scores[id], id))[:top_k]
+    return [rows[id] for id in best]
+
+
+def hybrid_search(
+    backend,
+    query_vector: list[float],
+    top_k: int,
+    query_text: str,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    filters: dict | None = None,
+) -> list[dict]:
+    """Fuse a backend's vector ranking with the full text ranking
+
+    Both backends go through here so they rank hybrid queries the same way.
+
+    Args:
+        backend (PgVectorSearch | NumpySearch): Gives the vector ranking
+        query_vector (list[float]): The query embedding
+        top_k (int): The number of movies to return
+        query_text (str): The raw query, ranked by `text_search`
+        ef_search (int | None): Per query override of `VECTOR_EF_SEARCH`
+        probes (int | None): Per query override of `VECTOR_PROBES`
+        filters (dict | None): Metadata filters, see `FILTERS`
+
+    Returns:
+        list[dict]: `id` and `title` of each movie, best first
+    """
+    candidates = hybrid_candidates(top_k)
+    vector_hits = backend.search(
+        query_vector, candidates, ef_search, probes, filters=filters
+    )
+    return fuse([vector_hits, text_search(query_text, candidates, filters)], top_k)
+
+
+class PgVectorSearch:
+    """Nearest neighbour search inside postgres with pgvector
+
+    With a `query_text` the vector ranking is fused with a full text ranking
+    over `movies.search_vector` using reciprocal rank fusion (see
+    `hybrid_search`), so exact titles and names surface even when their
+    embedding is not the closest.
+
+    Metadata filters are pushed into the `WHERE` clause of both rankings.
+    Selective filters let the planner use the btree indexes on the metadata
+    columns and rank the few matching rows exactly, broad ones stay on the
+    HNSW index with an iterative scan.
+    """
+
+    name = "pgvector"
+
+    def search(
+        self,
+        query_vector: list[float],
+        top_k: int,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        query_text: str | None = None,
+        filters: dict | None = None,
+    ) -> list[dict]:
+        """Find the movies closest to a query vector
+
+        Args:
+            query_vector (list[float]): The query embedding
+            top_k (int): The number of movies to return
+            ef_search (int | None): Per query override of `VECTOR_EF_SEARCH`
+            probes (int | None): Per query override of `VECTOR_PROBES`
+            query_text (str | None): The raw query, enables hybrid ranking
+            filters (dict | None): Metadata filters, see `FILTERS`
+
+        Returns:
+            list[dict]: `id` and `title` of each movie, best first
+        """
+        if query_text:
+            return hybrid_search(
+                self, query_vector, top_k, query_text, ef_search, probes, filters
+            )
+        filters = clean_filters(filters)
+        set_vector_search_params(ef_search, probes, bool(filters), top_k)
+        where, params = filter_clause(filters)
+        sql = text(f"""
+            SELECT id, title
+            FROM movies
+            WHERE {where}
+            ORDER BY embedding <-> CAST(:query_vector AS vector)
+            LIMIT :top_k
+        """)
+        result = db.session.execute(
+            sql, {"query_vector": query_vector, "top_k": top_k, **params}
+        )
+        return [{"id": r.id, "title": r.title} for r in result]
+
+    def search_many(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        filters: dict | None = None,
+    ) -> list[list[dict]]:
+        """Run one k-NN search per query vector in a single statement
+
+        The vectors are sent as one array, unnested with their position and
+        each one drives a `LATERAL` index scan, so n queries cost a single
+        round-trip. Ranking is vector only.
+
+        Args:
+            query_vectors (list[list[float]]): The query embeddings
+            top_k (int): The number of movies to return per query
+            ef_search (int | None): Per query override of `VECTOR_EF_SEARCH`
+            probes (int | None): Per query override of `VECTOR_PROBES`
+            filters (dict | None): Metadata filters, see `FILTERS`
+
+        Returns:
+            list[list[dict]]: One result list per query vector, in order
+        """
+        if not query_vectors:
+            return []
+        filters = clean_filters(filters)
+        # every LATERAL scan is its own index scan and needs top_k rows
+        set_vector_search_params(ef_search, probes, bool(filters), top_k)
+        where, params = filter_clause(filters)
+        sql = text(f"""
+            SELECT queries.position, nearest.id, nearest.title
+            FROM unnest(CAST(:query_vectors AS text[]))
+                WITH ORDINALITY AS queries(vector, position)
+            CROSS JOIN LATERAL (
+                SELECT id, title,
+                       embedding <-> CAST(queries.vector AS vector) AS distance
+                FROM movies
+                WHERE {where}
+                ORDER BY distance
+                LIMIT :top_k
+            ) nearest
+            ORDER BY queries.position, nearest.distance, nearest.id
+        """)
+        result = db.session.execute(
+            sql,
+            {
+                "query_vectors": [json.dumps(vector) for vector in query_vectors],
+                "top_k": top_k,
+                **params,
+            },
+        )
+        grouped: list[list[dict]] = [[] for _ in query_vectors]
+        for r in result:
+            grouped[r.position - 1].append({"id": r.id, "title": r.title})
+        return grouped
+
+
+class NumpySearch:
+    """Exact nearest neighbour search over an in-process embedding matrix
+
+    The `movies` embeddings are dumped to an `EmbeddingStore` and kept as a
+    contiguous, memory-mapped float32 matrix (shared through the page cache
+    by every worker on the host). A search is one matrix-vector product plus
+    `argpartition`, followed by an exact re-rank of the few candidates so the
+    order matches pgvector's `<->` (L2 distance, ties broken by id). Metadata
+    filters are applied as a mask before the distance computation.
+
+    The table is re-checked at most every `reload_interval` seconds and the
+    matrix is rebuilt when `catalog_version` changes.
+    """
+
+    name = "numpy"
+
+    def __init__(self, cache_dir: str, reload_interval: float = 30.0):
+        self.cache_dir = Path(cache_dir)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._checked_at = float("-inf")
+        self._version: str | None = None
+        # (ids, titles, matrix, squared norms, metadata columns), swapped as
+        # one unit on reload
+        self._state: tuple | None = None
+
+    def search(
+        self,
+        query_vector: list[float],
+        top_k: int,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        query_text: str | None = None,
+        filters: dict | None = None,
+    ) -> list[dict]:
+        """Find the movies closest to a query vector
+
+        `ef_search` and `probes` are accepted for interface parity with
+        `PgVectorSearch` and ignored, the vector ranking is always exact. With
+        a `query_text` it is fused with the full text ranking, which is read
+        from postgres' index like for `PgVectorSearch`.
+
+        Args:
+            query_vector (list[float]): The query embedding
+            top_k (int): The number of movies to return
+            query_text (str | None): The raw query, enables hybrid ranking
+            filters (dict | None): Metadata filters, see `FILTERS`
+
+        Returns:
+            list[dict]: `id` and `title` of each movie, best first
+        """
+        if query_text:
+            return hybrid_search(self, query_vector, top_k, query_text, filters=filters)
+        ids, titles, matrix, norms, metadata = self._current()
+        query = np.asarray(query_vector, dtype=np.float32)
+        filters = clean_filters(filters)
+        if filters:
+            rows = np.flatnonzero(self._mask(metadata, filters))
+            subset, subset_norms = matrix[rows], norms[rows]
+        else:
+            rows, subset, subset_norms = np.arange(len(ids)), matrix, norms
+        if top_k <= 0 or len(rows) == 0:
+            return []
+
+        # ||m - q||^2 = ||m||^2 - 2 m.q + ||q||^2, ||q||^2 is constant per query
+        approx = subset_norms - 2.0 * (subset @ query)
+        count = min(len(rows), top_k + RERANK_MARGIN)
+        if count < len(rows):
+            candidates = rows[np.argpartition(approx, count - 1)[:count]]
+        else:
+            candidates = rows
+
+        diff = matrix[candidates].astype(np.float64) - query.astype(np.float64)
+        exact = np.einsum("ij,ij->i", diff, diff)
+        order = np.lexsort((ids[candidates], exact))[:top_k]
+        return [{"id": int(ids[i]), "title": titles[i]} for i in candidates[order]]
+
+    def search_many(
+        self,
+        query_vectors: list[list[float]],
+        top_k: int,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        filters: dict | None = None,
+    ) -> list[list[dict]]:
+        """Run `search` for each query vector
+
+        Args:
+            query_vectors (list[list[float]]): The query embeddings
+            top_k (int): The number of movies to return per query
+            filters (dict | None): Metadata filters, see `FILTERS`
+
+        Returns:
+            list[list[dict]]: One result list per query vector, in order
+        """
+        return [self.search(vector, top_k, filters=filters) for vector in query_vectors]
+
+    @staticmethod
+    def _mask(metadata: dict, filters: dict) -> np.ndarray:
+        comparisons = {
+            "=": np.equal,
+            ">=": np.greater_equal,
+            "<=": np.less_equal,
+        }
+        mask = None
+        for name, value in filters.items():
+            column, comparison = FILTERS[name]
+            # missing values never match, like NULL in SQL
+            values = metadata[column]
+            present = np.array([v is not None for v in values], dtype=bool)
+            filled = np.where(present, values, value if column == "genre" else 0)
+            matches = present & comparisons[comparison](filled, value).astype(bool)
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    def invalidate(self):
+        """Force a version check (and reload if needed) on the next search"""
+        self._checked_at = float("-inf")
+
+    def _current(self):
+        now = time.monotonic()
+        if self._state is not None and now - self._checked_at < self.reload_interval:
+            return self._state
+        with self._lock:
+            if self._state is None or now - self._checked_at >= self.reload_interval:
+                version = catalog_version()
+                if version != self._version or self._state is None:
+                    self._state = self._load(version)
+                    self._version = version
+                self._checked_at = now
+        return self._state
+
+    def _load(self, version: str):
+        digest = hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+        path = self.cache_dir / f"movies-{digest}"
+        if not EmbeddingStore.exists(path):
+            self._dump(path)
+            self._prune(keep=path.name)
+
+        store = EmbeddingStore.load(path)
+        matrix = store.as_float32()
+        ids = np.asarray(store.ids, dtype=np.int64)
+        norms = np.einsum("ij,ij->i", matrix, matrix)
+        metadata = {
+            column: np.asarray(store.metadata.get(column, [None] * len(ids)), object)
+            for column in ("year", "genre", "runtime")
+        }
+        logger.info("Loaded %d movie embeddings (version %s)", len(ids), version)
+        return ids, store.titles, matrix, norms, metadata
+
+    def _dump(self, path: Path):
+        rows = db.session.execute(
+            text("""
+                SELECT id, title, year, genre, runtime, embedding::text AS embedding
+                FROM movies
+                WHERE embedding IS NOT NULL
+                ORDER BY id
+            """)
+        ).all()
+        matrix = np.empty((len(rows), Vector.dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            matrix[i] = json.loads(row.embedding)
+        EmbeddingStore.write(
+            path,
+            [r.title for r in rows],
+            matrix,
+            model=Config.EMBEDDING_MODEL,
+            ids=[r.id for r in rows],
+            metadata={
+                "year": [r.year for r in rows],
+                "genre": [r.genre for r in rows],
+                "runtime": [r.runtime for r in rows],
+            },
+        )
+
+    def _prune(self, keep: str):
+        for path in self.cache_dir.glob("movies-*"):
+            if path.name != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Get the configured search backend (`VECTOR_SEARCH_BACKEND`)
+
+    Returns:
+        PgVectorSearch | NumpySearch: The process-wide backend instance
+    """
+    global _backend
+    if _backend is None:
+        if Config.VECTOR_SEARCH_BACKEND == "numpy":
+            _backend = NumpySearch(
+                cache_dir=Config.VECTOR_SEARCH_CACHE_DIR,
+                reload_interval=Config.VECTOR_SEARCH_RELOAD_INTERVAL,
+            )
+        elif Config.VECTOR_SEARCH_BACKEND == "pgvector":
+            _backend = PgVectorSearch()
+        else:
+            raise ValueError(
+                f"Unknown VECTOR_SEARCH_BACKEND: {Config.VECTOR_SEARCH_BACKEND}"
+            )
+    return _backend
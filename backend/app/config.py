@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,3 +13,115 @@ class Config:
     SESSION_COOKIE_SAMESITE = "Lax"
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SECURE = False
+
+    # embeddings
+    EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")
+    # provider-sized chunks for get_embeddings, sent on a bounded pool
+    EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 512))
+    EMBEDDING_MAX_WORKERS = int(os.environ.get("EMBEDDING_MAX_WORKERS", 4))
+    # columnar embedding store used to seed the movies table
+    EMBEDDING_STORE_PATH = os.environ.get(
+        "EMBEDDING_STORE_PATH",
+        os.path.join(os.path.dirname(__file__), "chat/utils/embeddings/catalog"),
+    )
+    CATALOG_CSV_PATH = os.environ.get(
+        "CATALOG_CSV_PATH",
+        os.path.join(os.path.dirname(__file__), "chat/utils/data/movies.csv"),
+    )
+    # embeddings calls of at most this many texts are sent again when the
+    # first request takes longer than the delay (seconds), 0 turns this off
+    EMBEDDING_HEDGE_DELAY = float(os.environ.get("EMBEDDING_HEDGE_DELAY", 0))
+    EMBEDDING_HEDGE_MAX_TEXTS = int(os.environ.get("EMBEDDING_HEDGE_MAX_TEXTS", 16))
+    EMBEDDING_HEDGE_WORKERS = int(os.environ.get("EMBEDDING_HEDGE_WORKERS", 16))
+    # in-process LRU tier (entries / seconds), persistent tier lives in postgres
+    EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 1024))
+    EMBEDDING_CACHE_TTL = int(os.environ.get("EMBEDDING_CACHE_TTL", 3600))
+    EMBEDDING_CACHE_PERSIST = (
+        os.environ.get("EMBEDDING_CACHE_PERSIST", "true").lower() == "true"
+    )
+    # seconds a persisted embedding is served before it is pruned
+    EMBEDDING_CACHE_PERSIST_TTL = int(
+        os.environ.get("EMBEDDING_CACHE_PERSIST_TTL", 30 * 24 * 3600)
+    )
+
+    # ANN recall knobs, applied per query (higher = better recall, slower)
+    VECTOR_EF_SEARCH = int(os.environ.get("VECTOR_EF_SEARCH", 40))
+    VECTOR_PROBES = int(os.environ.get("VECTOR_PROBES", 10))
+    # keep scanning the ANN index until filtered queries have enough rows
+    VECTOR_ITERATIVE_SCAN = os.environ.get("VECTOR_ITERATIVE_SCAN", "strict_order")
+
+    # "pgvector" searches in postgres, "numpy" in process (small/medium catalogs)
+    VECTOR_SEARCH_BACKEND = os.environ.get("VECTOR_SEARCH_BACKEND", "pgvector")
+    VECTOR_SEARCH_CACHE_DIR = os.environ.get(
+        "VECTOR_SEARCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "rag-vectors")
+    )
+    VECTOR_SEARCH_RELOAD_INTERVAL = float(
+        os.environ.get("VECTOR_SEARCH_RELOAD_INTERVAL", 30)
+    )
+
+    # hybrid retrieval: fuse pgvector and full text ranks (reciprocal rank fusion)
+    RECOMMEND_HYBRID = os.environ.get("RECOMMEND_HYBRID", "true").lower() == "true"
+    RECOMMEND_RRF_K = int(os.environ.get("RECOMMEND_RRF_K", 60))
+    RECOMMEND_CANDIDATES = int(os.environ.get("RECOMMEND_CANDIDATES", 50))
+
+    # admission control per process: turns running at once, turns waiting for
+    # a slot (seconds at most), and per user turns per minute with a burst
+    CHAT_MAX_CONCURRENT_TURNS = int(os.environ.get("CHAT_MAX_CONCURRENT_TURNS", 16))
+    CHAT_MAX_QUEUED_TURNS = int(os.environ.get("CHAT_MAX_QUEUED_TURNS", 32))
+    CHAT_QUEUE_TIMEOUT = float(os.environ.get("CHAT_QUEUE_TIMEOUT", 30))
+    CHAT_USER_TURNS_PER_MINUTE = float(os.environ.get("CHAT_USER_TURNS_PER_MINUTE", 10))
+    CHAT_USER_BURST = int(os.environ.get("CHAT_USER_BURST", 3))
+
+    # chat sessions held in memory (count / idle seconds) and history per session
+    CHAT_SESSION_CACHE_SIZE = int(os.environ.get("CHAT_SESSION_CACHE_SIZE", 1000))
+    CHAT_SESSION_IDLE_TTL = int(os.environ.get("CHAT_SESSION_IDLE_TTL", 1800))
+    CHAT_HISTORY_MAX_MESSAGES = int(os.environ.get("CHAT_HISTORY_MAX_MESSAGES", 50))
+
+    # prompt token budget per model call, tool results and the note that
+    # replaces dropped turns are capped separately
+    CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 8000))
+    CONTEXT_TOOL_RESULT_TOKENS = int(os.environ.get("CONTEXT_TOOL_RESULT_TOKENS", 1500))
+    CONTEXT_SUMMARY_TOKENS = int(os.environ.get("CONTEXT_SUMMARY_TOKENS", 300))
+
+    # outbound http to OpenAI and Composio: pooled keep-alive connections,
+    # timeouts (seconds) and retries with jittered backoff on 429/5xx
+    HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_MAX_KEEPALIVE", 20))
+    HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+    HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 60))
+    HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 2))
+    HTTP2 = os.environ.get("HTTP2", "false").lower() == "true"
+
+    # tool calls of a chat turn run concurrently on a shared bounded pool
+    TOOL_MAX_WORKERS = int(os.environ.get("TOOL_MAX_WORKERS", 8))
+
+    # composio result cache (entries / seconds per tool)
+    TOOL_CACHE_SIZE = int(os.environ.get("TOOL_CACHE_SIZE", 512))
+    TOOL_CACHE_NEWS_TTL = int(os.environ.get("TOOL_CACHE_NEWS_TTL", 300))
+    TOOL_CACHE_SEARCH_TTL = int(os.environ.get("TOOL_CACHE_SEARCH_TTL", 3600))
+
+    # text deltas are merged into one SSE frame per window (seconds) or once
+    # this many characters are buffered, a window of 0 sends every delta
+    SSE_COALESCE_WINDOW = float(os.environ.get("SSE_COALESCE_WINDOW", 0.05))
+    SSE_COALESCE_MAX_CHARS = int(os.environ.get("SSE_COALESCE_MAX_CHARS", 256))
+
+    # tool results sent to the model: longest list / description or snippet
+    TOOL_RESULT_MAX_ITEMS = int(os.environ.get("TOOL_RESULT_MAX_ITEMS", 5))
+    TOOL_RESULT_MAX_CHARS = int(os.environ.get("TOOL_RESULT_MAX_CHARS", 200))
+
+    # span tracing of chat turns, off by default (see app/tracing.py)
+    TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 1.0))
+    TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "memory")
+    TRACING_FILE = os.environ.get(
+        "TRACING_FILE", os.path.join(tempfile.gettempdir(), "rag-traces.jsonl")
+    )
+    TRACING_MAX_SPANS = int(os.environ.get("TRACING_MAX_SPANS", 2000))
+
+    # semantic result cache: reuse recommendations for near-identical queries
+    SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", 512))
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.95))
+    SEMANTIC_CACHE_CHECK_INTERVAL = float(
+        os.environ.get("SEMANTIC_CACHE_CHECK_INTERVAL", 30)
+    )
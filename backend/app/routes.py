@@ -1,7 +1,9 @@
 from app.user.controllers import users
 from app.chat.controllers import chat
+from app.chat.metrics import metrics
 
 
 def register_routes(app):
     app.register_blueprint(users)
     app.register_blueprint(chat, url_prefix="/api/chat")
+    app.register_blueprint(metrics)
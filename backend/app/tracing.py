@@ -0,0 +1,223 @@
+"""Span based tracing for the chat pipeline.
+
+A trace is a tree of spans: a chat turn, the model streams and tool calls
+inside it, and the database queries those run. Whether a trace is recorded
+is decided once, when its root span starts, by `TRACING_SAMPLE_RATE`.
+Unsampled (or disabled) spans are a shared no-op object, so instrumented
+code does a contextvar lookup and nothing else.
+
+Finished traces go to an exporter:
+
+    memory  the latest spans in a ring buffer, see `GET /api/chat/traces`
+    file    one json object per span appended to `TRACING_FILE`
+    log     one DEBUG record per span on the `app.tracing` logger
+
+Spans follow the current context, so work handed to a thread pool must be
+submitted with `contextvars.copy_context().run` to stay in the same trace.
+"""
+
+from app.config import Config
+from collections import deque
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation, its attributes and the trace it belongs to"""
+
+    def __init__(self, tracer: "Tracer", name: str, parent: "Span | None", attrs):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration: float | None = None
+        self.error: str | None = None
+        self._started = time.perf_counter()
+        self._token = None
+
+    def set(self, **attrs):
+        """Add attributes to the span"""
+        self.attrs.update(attrs)
+
+    def end(self):
+        """Finish the span and hand it to the exporter"""
+        self.duration = time.perf_counter() - self._started
+        self.tracer.exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration else None,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:  # generator closed from another context
+            pass
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """Stands in for spans that are not recorded"""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _UnsampledRoot(_NoopSpan):
+    """Root of a trace that is not recorded, its children are no-ops too"""
+
+    def __enter__(self):
+        self._token = _current_span.set(NOOP_SPAN)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current_span.reset(self._token)
+        except ValueError:  # generator closed from another context
+            pass
+        return False
+
+
+class InMemoryExporter:
+    """Keeps the latest `max_spans` finished spans"""
+
+    def __init__(self, max_spans: int = 2000):
+        self.spans: deque[dict] = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self.spans.append(span.to_dict())
+
+    def recent(self, limit: int = 200) -> list[dict]:
+        return list(self.spans)[-limit:]
+
+
+class FileExporter:
+    """Appends finished spans to a file as json lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class LogExporter:
+    """Logs finished spans at DEBUG level"""
+
+    def export(self, span: Span):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span %s", json.dumps(span.to_dict(), default=str))
+
+
+class Tracer:
+    """Creates spans, sampling whole traces at `sample_rate`"""
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 1.0, exporter=None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter or InMemoryExporter()
+
+    def span(self, name: str, **attrs):
+        """Start a span under the current one, use it as a context manager
+
+        A span without a current parent starts a new trace, which is sampled
+        or not as a whole.
+
+        Args:
+            name (str): What the span measures, e.g. "tool_call"
+            **attrs: Attributes to record with it
+
+        Returns:
+            Span: The span, a no-op span when the trace is not recorded
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        if parent is NOOP_SPAN:
+            return NOOP_SPAN
+        if parent is None and random.random() >= self.sample_rate:
+            return _UnsampledRoot()
+        return Span(self, name, parent, attrs)
+
+
+def make_tracer(config) -> Tracer:
+    """Build the tracer from the `TRACING_*` settings"""
+    if config.TRACING_EXPORTER == "file":
+        exporter = FileExporter(config.TRACING_FILE)
+    elif config.TRACING_EXPORTER == "log":
+        exporter = LogExporter()
+    else:
+        exporter = InMemoryExporter(config.TRACING_MAX_SPANS)
+    return Tracer(config.TRACING_ENABLED, config.TRACING_SAMPLE_RATE, exporter)
+
+
+tracer = make_tracer(Config)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None or parent is NOOP_SPAN:
+        return
+    span = Span(parent.tracer, "db_query", parent, {"statement": statement[:200]})
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        span = spans.pop()
+        span.set(rows=cursor.rowcount)
+        span.end()
+
+
+@event.listens_for(Engine, "handle_error")
+def _failed_query(context):
+    connection = context.connection
+    spans = connection.info.get("trace_spans") if connection is not None else None
+    if spans:
+        span = spans.pop()
+        span.error = f"{type(context.original_exception).__name__}"
+        span.end()
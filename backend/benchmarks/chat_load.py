@@ -0,0 +1,197 @@
+"""Load driver for the chat stream: N concurrent users, each running turns.
+
+Every virtual user signs up (or logs in) as `<prefix>-<n>` and sends
+`--turns` messages to `GET /api/chat/message`, reading the SSE stream to the
+end. Reports throughput, time to first token (first text frame) and turn
+latency percentiles, plus turns refused with a 429 or ended by an error
+event.
+
+Point the app at `benchmarks.fake_upstream` to run it offline and for free.
+Raise `CHAT_USER_TURNS_PER_MINUTE` / `CHAT_USER_BURST` on the app when
+`--turns` is above the burst, otherwise the rate limit is what gets measured.
+
+Usage (from the backend directory, with the app running):
+
+    python -m benchmarks.chat_load --url http://127.0.0.1:5000 --users 50 --turns 3
+    python -m benchmarks.chat_load --users 200 --ramp 10 --upstream http://127.0.0.1:8765
+"""
+
+from dataclasses import dataclass, field
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import httpx
+
+MESSAGES = (
+    "recommend a slow burn sci-fi movie",
+    "any news about the next Nolan film?",
+    "what is Dune: Part Two about and who is in it?",
+    "movies like Heat but set in the 2010s",
+    "what are the popular movies right now?",
+)
+TEXT_EVENTS = ("init_response", "final_response")
+
+
+@dataclass
+class Turn:
+    """Timings of one chat turn, in seconds from sending the request"""
+
+    status: int = 0
+    ttft: float | None = None
+    latency: float | None = None
+    frames: int = 0
+    queued: bool = False
+    error: str | None = None
+
+
+@dataclass
+class Results:
+    turns: list[Turn] = field(default_factory=list)
+    failed_logins: int = 0
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest rank percentile, nan for no values"""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+async def login(client: httpx.AsyncClient, username: str) -> bool:
+    """Sign up the user if needed and log in, the session cookie stays on `client`"""
+    credentials = {"username": username, "password": "load-test"}
+    try:
+        await client.post(
+            "/signup", json={**credentials, "email": f"{username}@load.test"}
+        )
+        response = await client.post("/login", json=credentials)
+    except httpx.HTTPError:
+        return False
+    return response.status_code == 200
+
+
+async def run_turn(client: httpx.AsyncClient, message: str) -> Turn:
+    """Send one message and read its SSE stream to the end"""
+    turn = Turn()
+    started = time.perf_counter()
+    try:
+        async with client.stream(
+            "GET", "/api/chat/message", params={"message": message}
+        ) as response:
+            turn.status = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                turn.error = f"http {response.status_code}"
+                return turn
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                turn.frames += 1
+                event = json.loads(line[6:])
+                if event["type"] in TEXT_EVENTS and turn.ttft is None:
+                    turn.ttft = time.perf_counter() - started
+                elif event["type"] == "queue":
+                    turn.queued = True
+                elif event["type"] == "error":
+                    turn.error = event.get("text", "error")
+    except httpx.HTTPError as e:
+        turn.error = type(e).__name__
+        return turn
+    turn.latency = time.perf_counter() - started
+    return turn
+
+
+async def virtual_user(args, number: int, results: Results):
+    """Log in, then run `args.turns` turns with `args.think` seconds between"""
+    await asyncio.sleep(args.ramp * number / max(args.users, 1))
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=httpx.Timeout(args.timeout)
+    ) as client:
+        if not await login(client, f"{args.prefix}-{number}"):
+            results.failed_logins += 1
+            return
+        for i in range(args.turns):
+            if i:
+                await asyncio.sleep(random.uniform(0, 2 * args.think))
+            results.turns.append(await run_turn(client, random.choice(MESSAGES)))
+
+
+def report(results: Results, elapsed: float) -> dict:
+    """Summary of a run"""
+    turns = results.turns
+    done = [t for t in turns if t.latency is not None and t.error is None]
+    ttfts = [t.ttft for t in done if t.ttft is not None]
+    latencies = [t.latency for t in done]
+    return {
+        "turns": len(turns),
+        "completed": len(done),
+        "rejected": sum(t.status == 429 for t in turns),
+        "errors": sum(t.error is not None and t.status != 429 for t in turns),
+        "queued": sum(t.queued for t in turns),
+        "failed_logins": results.failed_logins,
+        "seconds": round(elapsed, 2),
+        "turns_per_second": round(len(done) / elapsed, 2) if elapsed else 0,
+        "frames_per_second": (
+            round(sum(t.frames for t in done) / elapsed, 1) if elapsed else 0
+        ),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p90": percentile(ttfts, 90),
+        "ttft_p99": percentile(ttfts, 99),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p90": percentile(latencies, 90),
+        "latency_p99": percentile(latencies, 99),
+    }
+
+
+def print_report(summary: dict, upstream: dict | None):
+    width = max(len(key) for key in summary)
+    for key, value in summary.items():
+        if isinstance(value, float) and key.startswith(("ttft", "latency")):
+            value = f"{value * 1000:.0f} ms"
+        print(f"{key:<{width}}  {value}")
+    if upstream:
+        print("upstream requests:", json.dumps(upstream, sort_keys=True))
+
+
+async def run(args) -> dict:
+    results = Results()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(virtual_user(args, number, results) for number in range(args.users))
+    )
+    summary = report(results, time.perf_counter() - started)
+    upstream = None
+    if args.upstream:
+        async with httpx.AsyncClient(base_url=args.upstream) as client:
+            upstream = (await client.get("/stats")).json()
+    if args.json:
+        print(json.dumps({**summary, "upstream": upstream}))
+    else:
+        print_report(summary, upstream)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--users", type=int, default=20, help="concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="turns per user")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds")
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds to start all")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--prefix", default="load")
+    parser.add_argument("--upstream", help="fake_upstream url, adds its counts")
+    parser.add_argument("--json", action="store_true", help="one json line")
+    args = parser.parse_args()
+    summary = asyncio.run(run(args))
+    if not summary["completed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
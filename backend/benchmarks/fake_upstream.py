@@ -0,0 +1,388 @@
+"""Local stand-in for the OpenAI and Composio APIs, for offline load tests.
+
+Serves the endpoints the chat pipeline calls, with configurable latencies:
+
+- `POST /v1/responses` streams Responses API events. A call that offers
+  tools asks for one (`--tool-rate` of the time) with `output_item.added`
+  and `function_call_arguments.delta/.done`, any other call streams a text
+  answer of `--answer-tokens` tokens at `--tokens-per-second` after `--ttft`.
+- `POST /v1/embeddings` returns deterministic unit vectors per text.
+- `GET /api/<version>/tools/<slug>` and `POST /api/<version>/tools/execute/<slug>`
+  answer like Composio, with the recorded responses in `benchmarks/fixtures`.
+- `GET /stats` counts the requests served.
+
+`--error-rate` of the model and tool requests fail with a 429 or 503 to
+exercise the clients' retries. Every delay is jittered by `--jitter`.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.fake_upstream --port 8765 --ttft 0.4 --tokens-per-second 60
+
+and start the app against it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 COMPOSIO_BASE_URL=http://127.0.0.1:8765 \\
+    COMPOSIO_TOOLKIT_VERSION_COMPOSIO_SEARCH=20250101_00 uvicorn app.asgi:app --port 5000
+"""
+
+from collections import Counter
+from pathlib import Path
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import random
+import time
+import numpy as np
+import uvicorn
+
+FIXTURES = Path(__file__).parent / "fixtures"
+WORDS = (
+    "a quiet thriller with a sharp script and a cast that keeps every scene "
+    "moving, worth watching for the final act alone"
+).split()
+
+_ids = itertools.count(1)
+
+
+def jittered(seconds: float, jitter: float) -> float:
+    """`seconds` scaled by a random factor in [1 - jitter, 1 + jitter]"""
+    return max(0.0, seconds * random.uniform(1 - jitter, 1 + jitter))
+
+
+def sse(event: dict) -> str:
+    """One Responses API event as an SSE frame"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def last_user_text(items) -> str:
+    """Text of the last user message of a Responses API input"""
+    if isinstance(items, str):
+        return items
+    for item in reversed(items or []):
+        if item.get("role") == "user" and isinstance(item.get("content"), str):
+            return item["content"]
+    return ""
+
+
+def response_object(body: dict, status: str, output: list, usage=None) -> dict:
+    """The `response` of `response.created` and `response.completed` events"""
+    return {
+        "id": f"resp_{next(_ids)}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model", "fake"),
+        "status": status,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": body.get("tool_choice", "auto"),
+        "tools": body.get("tools", []),
+        "usage": usage,
+    }
+
+
+def load_fixtures(path: Path) -> dict[str, list[dict]]:
+    """Recorded Composio responses by tool slug"""
+    fixtures: dict[str, list[dict]] = {}
+    for file in sorted(path.glob("*.json")):
+        fixture = json.loads(file.read_text())
+        fixtures.setdefault(fixture["tool"], []).append(fixture["response"])
+    return fixtures
+
+
+class FakeUpstream:
+    """Request handlers sharing the latency settings and request counts"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.tools = [name for name in args.tools.split(",") if name]
+        self.fixtures = load_fixtures(args.fixtures)
+        self.stats: Counter = Counter()
+
+    def delay(self, seconds: float):
+        return asyncio.sleep(jittered(seconds, self.args.jitter))
+
+    def injected_error(self, kind: str) -> JSONResponse | None:
+        if random.random() >= self.args.error_rate:
+            return None
+        self.stats[f"{kind}_errors"] += 1
+        status = random.choice((429, 503))
+        return JSONResponse(
+            {"error": {"message": "injected failure", "type": "fake"}},
+            status_code=status,
+            headers={"retry-after-ms": "50"},
+        )
+
+    async def responses(self, request: Request):
+        body = await request.json()
+        self.stats["responses"] += 1
+        error = self.injected_error("responses")
+        if error is not None:
+            return error
+        if not body.get("stream"):
+            return JSONResponse(
+                {"error": {"message": "only streaming is faked"}}, status_code=400
+            )
+        wants_tool = (
+            bool(body.get("tools"))
+            and bool(self.tools)
+            and random.random() < self.args.tool_rate
+        )
+        events = self.tool_call_events if wants_tool else self.text_events
+        return StreamingResponse(events(body), media_type="text/event-stream")
+
+    async def tool_call_events(self, body: dict):
+        self.stats["tool_calls"] += 1
+        sequence = itertools.count()
+        item = {
+            "type": "function_call",
+            "id": f"fc_{next(_ids)}",
+            "call_id": f"call_{next(_ids)}",
+            "name": random.choice(self.tools),
+            "arguments": "",
+            "status": "in_progress",
+        }
+        arguments = json.dumps({"query": last_user_text(body.get("input")) or "news"})
+        await self.delay(self.args.ttft)
+        yield sse(
+            {
+                "type": "response.created",
+                "sequence_number": next(sequence),
+                "response": response_object(body, "in_progress", []),
+            }
+        )
+        yield sse(
+            {
+                "type": "response.output_item.added",
+                "sequence_number": next(sequence),
+                "output_index": 0,
+                "item": item,
+            }
+        )
+        # arguments arrive in a few fragments, like a real stream
+        step = max(1, len(arguments) // 3)
+        for start in range(0, len(arguments), step):
+            await self.delay(1 / self.args.tokens_per_second)
+            yield sse(
+                {
+                    "type": "response.function_call_arguments.delta",
+                    "sequence_number": next(sequence),
+                    "item_id": item["id"],
+                    "output_index": 0,
+                    "delta": arguments[start : start + step],
+                }
+            )
+        yield sse(
+            {
+                "type": "response.function_call_arguments.done",
+                "sequence_number": next(sequence),
+                "item_id": item["id"],
+                "output_index": 0,
+                "arguments": arguments,
+            }
+        )
+        done = {**item, "arguments": arguments, "status": "completed"}
+        yield sse(
+            {
+                "type": "response.output_item.done",
+                "sequence_number": next(sequence),
+                "output_index": 0,
+                "item": done,
+            }
+        )
+        yield self.completed(body, next(sequence), [done], len(arguments) // 4)
+
+    async def text_events(self, body: dict):
+        sequence = itertools.count()
+        item_id = f"msg_{next(_ids)}"
+        await self.delay(self.args.ttft)
+        yield sse(
+            {
+                "type": "response.created",
+                "sequence_number": next(sequence),
+                "response": response_object(body, "in_progress", []),
+            }
+        )
+        tokens = [f" {WORDS[i % len(WORDS)]}" for i in range(self.args.answer_tokens)]
+        for i, token in enumerate(tokens):
+            if i:
+                await self.delay(1 / self.args.tokens_per_second)
+            yield sse(
+                {
+                    "type": "response.output_text.delta",
+                    "sequence_number": next(sequence),
+                    "item_id": item_id,
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": token,
+                    "logprobs": [],
+                }
+            )
+        message = {
+            "type": "message",
+            "id": item_id,
+            "role": "assistant",
+            "status": "completed",
+            "content": [
+                {"type": "output_text", "text": "".join(tokens), "annotations": []}
+            ],
+        }
+        yield self.completed(body, next(sequence), [message], len(tokens))
+
+    def completed(self, body: dict, sequence: int, output: list, tokens: int):
+        # about four characters per input token
+        input_tokens = len(json.dumps(body.get("input", ""))) // 4
+        usage = {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + tokens,
+        }
+        return sse(
+            {
+                "type": "response.completed",
+                "sequence_number": sequence,
+                "response": response_object(body, "completed", output, usage),
+            }
+        )
+
+    async def embeddings(self, request: Request):
+        body = await request.json()
+        self.stats["embeddings"] += 1
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await self.delay(self.args.embedding_latency)
+        data = []
+        for i, text in enumerate(texts):
+            vector = self.embed(str(text))
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(str(text)) // 4 + 1 for text in texts)
+        return JSONResponse(
+            {
+                "object": "list",
+                "model": body.get("model", "fake"),
+                "data": data,
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+    def embed(self, text: str) -> np.ndarray:
+        # the same text always gets the same vector, so caches behave
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.args.embedding_dim)
+        return (vector / np.linalg.norm(vector)).astype("<f4")
+
+    async def tool_definition(self, request: Request):
+        slug = request.path_params["slug"]
+        toolkit = slug.split("_")[0].lower()
+        if slug.startswith("COMPOSIO_SEARCH"):
+            toolkit = "composio_search"
+        version = "20250101_00"
+        return JSONResponse(
+            {
+                "slug": slug,
+                "name": slug,
+                "description": "fake tool",
+                "version": version,
+                "available_versions": [version],
+                "is_deprecated": False,
+                "deprecated": {
+                    "available_versions": [version],
+                    "displayName": slug,
+                    "is_deprecated": False,
+                    "toolkit": {"logo": ""},
+                    "version": version,
+                },
+                "input_parameters": {"type": "object", "properties": {}},
+                "output_parameters": {"type": "object", "properties": {}},
+                "no_auth": True,
+                "scopes": [],
+                "tags": [],
+                "toolkit": {"logo": "", "name": toolkit, "slug": toolkit},
+            }
+        )
+
+    async def execute_tool(self, request: Request):
+        slug = request.path_params["slug"]
+        self.stats["tool_executions"] += 1
+        error = self.injected_error("tool")
+        if error is not None:
+            return error
+        await self.delay(self.args.tool_latency)
+        recorded = self.fixtures.get(slug)
+        result = (
+            random.choice(recorded)
+            if recorded
+            else {"data": {}, "successful": True, "error": None}
+        )
+        return JSONResponse({**result, "log_id": f"log_{next(_ids)}"})
+
+    async def get_stats(self, request: Request):
+        return JSONResponse(dict(self.stats))
+
+    async def ignore(self, request: Request):
+        # anything else the SDKs send (telemetry, logs) is accepted and dropped
+        self.stats["other"] += 1
+        return JSONResponse({})
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/v1/responses", self.responses, methods=["POST"]),
+                Route("/v1/embeddings", self.embeddings, methods=["POST"]),
+                Route(
+                    "/api/{version}/tools/execute/{slug}",
+                    self.execute_tool,
+                    methods=["POST"],
+                ),
+                Route("/api/{version}/tools/{slug}", self.tool_definition),
+                Route("/stats", self.get_stats),
+                Route(
+                    "/{path:path}",
+                    self.ignore,
+                    methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
+                ),
+            ]
+        )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--tool-rate", type=float, default=0.5)
+    parser.add_argument(
+        "--tools",
+        default="COMPOSIO_SEARCH_NEWS_SEARCH,COMPOSIO_SEARCH_SEARCH",
+        help="comma separated tools the fake model calls",
+    )
+    parser.add_argument("--tool-latency", type=float, default=0.5, help="seconds")
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    uvicorn.run(
+        FakeUpstream(args).app(), host=args.host, port=args.port, log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Parse time and allocations of the Composio result formatters.
+
+Runs each fixture in `benchmarks/fixtures` (a tool slug and its response)
+through the single pass parser and the item by item reference parser at
+three sizes: small (every list cut to one item), typical (as recorded) and
+huge (every list repeated `--scale` times). Both parsers must return the
+same bytes, the run fails otherwise.
+
+Allocations are counted with tracemalloc, memory pydantic-core allocates
+outside the Python allocator is not included.
+
+Usage (from the backend directory, with the app's environment set since
+importing `app` builds the chat service):
+
+    python -m benchmarks.formaters
+    python -m benchmarks.formaters --scale 200 --repeat 20 --fixtures path/to/dir
+"""
+
+from app.chat.utils.formaters import (
+    parse_composio_news_search_results,
+    parse_composio_news_search_results_by_item,
+    parse_composio_search_results,
+    parse_composio_search_results_by_item,
+)
+from pathlib import Path
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+PARSERS = {
+    "COMPOSIO_SEARCH_SEARCH": (
+        parse_composio_search_results,
+        parse_composio_search_results_by_item,
+    ),
+    "COMPOSIO_SEARCH_NEWS_SEARCH": (
+        parse_composio_news_search_results,
+        parse_composio_news_search_results_by_item,
+    ),
+}
+
+
+def resize(value, scale: float):
+    """Copy a payload with every list of objects cut or repeated to `scale`x"""
+    if isinstance(value, dict):
+        return {k: resize(v, scale) for k, v in value.items()}
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        count = max(1, int(len(value) * scale)) if scale >= 1 else 1
+        return [resize(value[i % len(value)], scale) for i in range(count)]
+    return value
+
+
+def time_call(parse, payload, repeat: int, number: int) -> float:
+    """Median seconds per call over `repeat` rounds of `number` calls"""
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            parse(payload)
+        rounds.append((time.perf_counter() - started) / number)
+    return statistics.median(rounds)
+
+
+def peak_allocated(parse, payload) -> int:
+    """Peak bytes allocated during one call"""
+    tracemalloc.start()
+    try:
+        parse(payload)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", type=Path, default=FIXTURES)
+    parser.add_argument("--scale", type=int, default=50, help="huge list factor")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=0.2, help="seconds per round")
+    args = parser.parse_args()
+    # payloads that fail to parse are logged on every call
+    logging.getLogger("app.chat.utils.formaters").setLevel(logging.ERROR)
+
+    sizes = {"small": 0, "typical": 1, "huge": args.scale}
+    print(
+        f"{'fixture':<32} {'size':<8} {'bytes':>9} {'single us':>10} "
+        f"{'by item us':>11} {'speedup':>8} {'peak KiB':>9} {'by item':>8} same"
+    )
+    mismatches = 0
+    for path in sorted(args.fixtures.glob("*.json")):
+        fixture = json.loads(path.read_text())
+        fast, reference = PARSERS[fixture["tool"]]
+        for size, scale in sizes.items():
+            payload = resize(fixture["response"], scale)
+            same = json.dumps(fast(payload)) == json.dumps(reference(payload))
+            mismatches += not same
+            # calls per round so a round takes about `budget` seconds
+            number = max(
+                1, int(args.budget / max(time_call(reference, payload, 1, 1), 1e-6))
+            )
+            fast_s = time_call(fast, payload, args.repeat, number)
+            reference_s = time_call(reference, payload, args.repeat, number)
+            fast_peak = peak_allocated(fast, payload)
+            reference_peak = peak_allocated(reference, payload)
+            print(
+                f"{path.stem:<32} {size:<8} {len(json.dumps(payload)):>9} "
+                f"{fast_s * 1e6:>10.1f} {reference_s * 1e6:>11.1f} "
+                f"{reference_s / fast_s:>7.1f}x {fast_peak / 1024:>9.1f} "
+                f"{reference_peak / 1024:>8.1f} {'yes' if same else 'NO'}"
+            )
+    if mismatches:
+        print(f"\n{mismatches} outputs differ from the item by item parser")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Recall and latency benchmark for the pgvector ANN index on `movies`.
+
+Builds a synthetic, clustered catalog of unit-norm vectors in a scratch
+table, indexes it the same way as `movies.embedding`, then compares the ANN
+answers against exact (brute force) search for a sweep of recall knobs.
+
+Usage (from the backend directory, with DATABASE_URL set):
+
+    python -m benchmarks.vector_index --rows 100000
+    python -m benchmarks.vector_index --rows 1000000 --ef-search 40,100,200
+    python -m benchmarks.vector_index --index ivfflat --lists 1000 --probes 1,10,40
+"""
+
+from app.config import Config
+from sqlalchemy import create_engine
+import argparse
+import io
+import time
+import numpy as np
+
+TABLE = "bench_vectors"
+CHUNK_ROWS = 20_000
+
+
+def make_centers(seed: int, clusters: int, dim: int) -> np.ndarray:
+    """Cluster centers shared by the catalog and the queries"""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((clusters, dim)).astype(np.float32)
+
+
+def make_chunk(centers: np.ndarray, seed: int, chunk: int, rows: int) -> np.ndarray:
+    """Deterministically generate one chunk of unit-norm catalog vectors
+
+    Chunks are regenerated from their seed during exact search so the whole
+    catalog never has to sit in memory at once.
+    """
+    rng = np.random.default_rng([seed, chunk])
+    assign = rng.integers(0, len(centers), size=rows)
+    noise = rng.standard_normal((rows, centers.shape[1])).astype(np.float32)
+    vectors = centers[assign] + 0.5 * noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(centers: np.ndarray, seed: int, count: int) -> np.ndarray:
+    """Queries drawn from the same distribution as the catalog"""
+    return make_chunk(centers, seed + 1, 0, count)
+
+
+def chunks(rows: int):
+    """Yield (chunk number, first id, row count) over the catalog"""
+    for number, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        yield number, start, min(CHUNK_ROWS, rows - start)
+
+
+def copy_payload(ids: np.ndarray, vectors: np.ndarray) -> io.BytesIO:
+    """Encode rows in postgres binary COPY format (id int4, embedding vector)"""
+    dim = vectors.shape[1]
+    row = np.dtype(
+        [
+            ("fields", ">i2"),
+            ("id_len", ">i4"),
+            ("id", ">i4"),
+            ("vec_len", ">i4"),
+            ("dim", ">i2"),
+            ("unused", ">i2"),
+            ("vec", ">f4", (dim,)),
+        ]
+    )
+    data = np.empty(len(ids), dtype=row)
+    data["fields"] = 2
+    data["id_len"] = 4
+    data["id"] = ids
+    data["vec_len"] = 4 + 4 * dim
+    data["dim"] = dim
+    data["unused"] = 0
+    data["vec"] = vectors
+    header = b"PGCOPY\n\xff\r\n\x00" + (0).to_bytes(4, "big") * 2
+    trailer = (-1).to_bytes(2, "big", signed=True)
+    return io.BytesIO(header + data.tobytes() + trailer)
+
+
+def load_catalog(conn, args, centers: np.ndarray):
+    """Create the scratch table, COPY the catalog in and build the index"""
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cur.execute(
+        f"CREATE TABLE {TABLE} (id int PRIMARY KEY, embedding vector({args.dim}))"
+    )
+    started = time.perf_counter()
+    for number, start, count in chunks(args.rows):
+        vectors = make_chunk(centers, args.seed, number, count)
+        ids = np.arange(start, start + count, dtype=np.int32)
+        cur.copy_expert(
+            f"COPY {TABLE} (id, embedding) FROM STDIN WITH (FORMAT binary)",
+            copy_payload(ids, vectors),
+        )
+    conn.commit()
+    print(f"loaded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    if args.index == "hnsw":
+        cur.execute(
+            f"CREATE INDEX ON {TABLE} USING hnsw (embedding vector_l2_ops) "
+            f"WITH (m = {args.m}, ef_construction = {args.ef_construction})"
+        )
+    else:
+        cur.execute(
+            f"CREATE INDEX ON {TABLE} USING ivfflat (embedding vector_l2_ops) "
+            f"WITH (lists = {args.lists})"
+        )
+    cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+    print(f"built {args.index} index in {time.perf_counter() - started:.1f}s")
+
+
+def exact_neighbours(args, centers: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Brute force top-k ids for every query, streamed over catalog chunks"""
+    k = args.k
+    best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+    best_dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+    query_norms = (queries**2).sum(axis=1)[:, None]
+    for number, start, count in chunks(args.rows):
+        vectors = make_chunk(centers, args.seed, number, count)
+        dist = query_norms - 2 * queries @ vectors.T + (vectors**2).sum(axis=1)
+        ids = np.broadcast_to(np.arange(start, start + count), dist.shape)
+        dist = np.concatenate([best_dist, dist], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        best_dist = np.take_along_axis(dist, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return best_ids
+
+
+def run_queries(conn, args, queries: np.ndarray, setting: str, value: int):
+    """Time every query at one knob value, returning latencies and ids"""
+    cur = conn.cursor()
+    cur.execute(f"SET {setting} = {int(value)}")
+    latencies, results = [], []
+    for query in queries:
+        literal = "[" + ",".join(f"{x:.7g}" for x in query) + "]"
+        started = time.perf_counter()
+        cur.execute(
+            f"SELECT id FROM {TABLE} ORDER BY embedding <-> %s::vector LIMIT %s",
+            (literal, args.k),
+        )
+        rows = cur.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([row[0] for row in rows])
+    conn.rollback()
+    return np.array(latencies), results
+
+
+def report(label: str, latencies: np.ndarray, recall: float | None):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    recall_text = f"recall@k={recall:.4f}  " if recall is not None else ""
+    print(
+        f"{label:<22} {recall_text}p50={p50:7.2f}ms  p99={p99:7.2f}ms  "
+        f"qps={1000 / latencies.mean():8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=1000)
+    parser.add_argument("--ef-search", default="20,40,80,200")
+    parser.add_argument("--probes", default="1,10,40")
+    parser.add_argument(
+        "--exact-sql-queries",
+        type=int,
+        default=20,
+        help="queries timed with the index disabled (sequential scan baseline)",
+    )
+    parser.add_argument("--reuse", action="store_true", help="skip (re)loading")
+    parser.add_argument("--keep", action="store_true", help="keep the table")
+    args = parser.parse_args()
+
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+    conn = engine.raw_connection()
+    centers = make_centers(args.seed, args.clusters, args.dim)
+    queries = make_queries(centers, args.seed, args.queries)
+    print(f"catalog: {args.rows} x {args.dim} on {engine.url.render_as_string()}")
+
+    try:
+        if not args.reuse:
+            load_catalog(conn, args, centers)
+
+        started = time.perf_counter()
+        truth = exact_neighbours(args, centers, queries)
+        print(f"exact ground truth in {time.perf_counter() - started:.1f}s\n")
+        truth_sets = [set(row.tolist()) for row in truth]
+
+        if args.exact_sql_queries:
+            latencies, _ = run_queries(
+                conn, args, queries[: args.exact_sql_queries], "enable_indexscan", 0
+            )
+            report("exact (seq scan)", latencies, None)
+
+        if args.index == "hnsw":
+            setting, values = "hnsw.ef_search", args.ef_search
+        else:
+            setting, values = "ivfflat.probes", args.probes
+        for value in (int(v) for v in values.split(",")):
+            latencies, results = run_queries(conn, args, queries, setting, value)
+            recall = np.mean(
+                [
+                    len(want & set(got)) / args.k
+                    for want, got in zip(truth_sets, results)
+                ]
+            )
+            report(f"{setting}={value}", latencies, recall)
+    finally:
+        if not args.keep:
+            cur = conn.cursor()
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Build the movie embedding store.
+
+python build_embeddings.py convert   # legacy pickles -> store
+python build_embeddings.py embed     # re-embed movies.csv -> store
+python build_embeddings.py info      # print the store header
+"""
+
+from app.chat.utils.embedding_store import (
+    DTYPES,
+    EmbeddingStore,
+    convert_pickles,
+    embed_catalog,
+)
+from app.config import Config
+import argparse
+import json
+
+parser = argparse.ArgumentParser(description="Build the movie embedding store")
+parser.add_argument("command", choices=["convert", "embed", "info"])
+parser.add_argument("--store", default=Config.EMBEDDING_STORE_PATH)
+parser.add_argument("--pickles", default="./app/chat/utils/embeddings/")
+parser.add_argument("--csv", default="./app/chat/utils/data/movies.csv")
+parser.add_argument("--dtype", choices=DTYPES, default="float32")
+args = parser.parse_args()
+
+if args.command == "convert":
+    store = convert_pickles(args.pickles, args.store, dtype=args.dtype)
+    print(f"wrote {len(store)} embeddings to {store.path}")
+elif args.command == "embed":
+    store = embed_catalog(args.csv, args.store, dtype=args.dtype)
+    print(f"wrote {len(store)} embeddings to {store.path}")
+else:
+    print(json.dumps(EmbeddingStore.load(args.store).header, indent=2))
@@ -0,0 +1,33 @@
+"""add embedding cache table
+
+Revision ID: 09a1d6b8f7b0
+Revises: 8322353e76e5
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from app.chat.models import Vector
+
+# revision identifiers, used by Alembic.
+revision = "09a1d6b8f7b0"
+down_revision = "8322353e76e5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "embedding_cache",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("query", sa.Text(), nullable=False),
+        sa.Column("embedding", Vector(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("key"),
+    )
+
+
+def downgrade():
+    op.drop_table("embedding_cache")
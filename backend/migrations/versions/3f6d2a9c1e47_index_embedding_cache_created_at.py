@@ -0,0 +1,23 @@
+"""index embedding cache created_at
+
+Revision ID: 3f6d2a9c1e47
+Revises: 92531db74c69
+Create Date: 2026-10-18 21:14:07.552310
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f6d2a9c1e47"
+down_revision = "92531db74c69"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_embedding_cache_created_at", "embedding_cache", ["created_at"])
+
+
+def downgrade():
+    op.drop_index("ix_embedding_cache_created_at", table_name="embedding_cache")
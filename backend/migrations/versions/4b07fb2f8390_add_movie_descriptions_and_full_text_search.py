@@ -0,0 +1,46 @@
+"""add movie descriptions and full text search
+
+Revision ID: 4b07fb2f8390
+Revises: acccd8538ddf
+Create Date: 2026-10-18 13:41:09.227310
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "4b07fb2f8390"
+down_revision = "acccd8538ddf"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("movies", sa.Column("description", sa.Text(), nullable=True))
+    op.add_column(
+        "movies",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_movies_search_vector",
+        "movies",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade():
+    op.drop_index("ix_movies_search_vector", table_name="movies")
+    op.drop_column("movies", "search_vector")
+    op.drop_column("movies", "description")
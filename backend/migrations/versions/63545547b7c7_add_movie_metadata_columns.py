@@ -0,0 +1,34 @@
+"""add movie metadata columns
+
+Revision ID: 63545547b7c7
+Revises: 4b07fb2f8390
+Create Date: 2026-10-18 14:32:55.610472
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "63545547b7c7"
+down_revision = "4b07fb2f8390"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("movies", sa.Column("year", sa.Integer(), nullable=True))
+    op.add_column("movies", sa.Column("genre", sa.String(), nullable=True))
+    op.add_column("movies", sa.Column("runtime", sa.Integer(), nullable=True))
+    op.create_index("ix_movies_year", "movies", ["year"])
+    op.create_index("ix_movies_genre", "movies", ["genre"])
+    op.create_index("ix_movies_runtime", "movies", ["runtime"])
+
+
+def downgrade():
+    op.drop_index("ix_movies_runtime", table_name="movies")
+    op.drop_index("ix_movies_genre", table_name="movies")
+    op.drop_index("ix_movies_year", table_name="movies")
+    op.drop_column("movies", "runtime")
+    op.drop_column("movies", "genre")
+    op.drop_column("movies", "year")
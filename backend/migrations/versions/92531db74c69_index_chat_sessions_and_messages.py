@@ -0,0 +1,25 @@
+"""index chat sessions and messages
+
+Revision ID: 92531db74c69
+Revises: 63545547b7c7
+Create Date: 2026-10-18 16:05:12.381904
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "92531db74c69"
+down_revision = "63545547b7c7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_chat_sessions_user_id", "chat_sessions", ["user_id"])
+    op.create_index("ix_chat_messages_session_id", "chat_messages", ["session_id"])
+
+
+def downgrade():
+    op.drop_index("ix_chat_messages_session_id", table_name="chat_messages")
+    op.drop_index("ix_chat_sessions_user_id", table_name="chat_sessions")
@@ -0,0 +1,31 @@
+"""unique movie titles
+
+Revision ID: acccd8538ddf
+Revises: fd9da544cd42
+Create Date: 2026-10-18 12:20:51.903311
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "acccd8538ddf"
+down_revision = "fd9da544cd42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the old seed script stored the pickle file name ("drop.pkl") as the title
+    op.execute(r"UPDATE movies SET title = regexp_replace(title, '\.pkl$', '')")
+    # keep the oldest row per title so the constraint can be added
+    op.execute("""
+        DELETE FROM movies a
+        USING movies b
+        WHERE a.title = b.title AND a.id > b.id
+    """)
+    op.create_unique_constraint("uq_movies_title", "movies", ["title"])
+
+
+def downgrade():
+    op.drop_constraint("uq_movies_title", "movies", type_="unique")
@@ -0,0 +1,30 @@
+"""add hnsw index on movies embedding
+
+Revision ID: fd9da544cd42
+Revises: 09a1d6b8f7b0
+Create Date: 2026-10-18 11:02:17.540913
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "fd9da544cd42"
+down_revision = "09a1d6b8f7b0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY can't run inside a transaction, so step out of alembic's
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_movies_embedding_hnsw
+            ON movies USING hnsw (embedding vector_l2_ops)
+            WITH (m = 16, ef_construction = 64)
+        """)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_movies_embedding_hnsw")
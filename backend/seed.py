@@ -1,9 +1,10 @@
 from app import create_app
 from app.extensions import db, bcrypt
 from app.user.models import User
-from app.chat.models import Movie
-import os
-import pickle
+from app.chat.ingest import ingest_store, read_catalog
+from app.chat.utils.embedding_store import EmbeddingStore, convert_pickles
+from app.config import Config
+import sys
 
 app = create_app()
 
@@ -23,27 +24,15 @@ with app.app_context():
         db.session.add_all([admin])
         db.session.commit()
 
-    with os.scandir("./app/chat/utils/embeddings/") as entries:
-        for entry in entries:  # Iterate over the entries
-            if entry.is_file():  # Check if the entry is a file
-                print(entry.path)  # Print the file path
-                # Check if the movie already exists
-                exists = Movie.query.filter_by(title=entry.name).first()
-                if not exists:  # if it doesnt exists
-                    # get the movie embedding
-                    with open(
-                        "./app/chat/agent/utils/embeddings/" + entry.name, "rb"
-                    ) as f:
-                        # load the embedding
-                        movie_emembedding = pickle.load(f)
-                        # create movie object and add embedding
-                        movie = Movie(
-                            title=entry.name,
-                            embedding=movie_emembedding.data[0].embedding,
-                        )
-                        # add movie
-                        db.session.add(movie)
-                        # commit
-                        db.session.commit()
+    # one-time conversion of the legacy pickles into the columnar store
+    if not EmbeddingStore.exists(Config.EMBEDDING_STORE_PATH):
+        convert_pickles("./app/chat/utils/embeddings/", Config.EMBEDDING_STORE_PATH)
+
+    # bulk load the movie embeddings, `--update` overwrites existing ones
+    ingest_store(
+        Config.EMBEDDING_STORE_PATH,
+        update="--update" in sys.argv,
+        catalog=read_catalog(Config.CATALOG_CSV_PATH),
+    )
 
     print("Seed data added!")
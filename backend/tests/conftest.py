@@ -0,0 +1,84 @@
+"""Shared fixtures: the app on in-memory sqlite with dummy api keys, a clock.
+
+Nothing here talks to OpenAI, Composio or postgres, tests that need them
+replace the client or skip.
+"""
+
+import os
+
+os.environ.update(
+    DATABASE_URL="sqlite://",
+    COMPOSIO_API_KEY="test",
+    OPENAI_API_KEY="test",
+    EMBEDDING_CACHE_PERSIST="false",
+)
+
+from app import create_app  # noqa: E402
+from app.chat.models import ChatMessage, ChatSession  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.user.models import User  # noqa: E402
+import pytest  # noqa: E402
+import time  # noqa: E402
+
+# tables that run on sqlite, the movie tables need pgvector
+TABLES = [User.__table__, ChatSession.__table__, ChatMessage.__table__]
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=TABLES)
+        yield app
+
+
+@pytest.fixture
+def db_session(app):
+    yield db.session
+    db.session.rollback()
+    for table in reversed(TABLES):
+        db.session.execute(table.delete())
+    db.session.commit()
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "clock(*modules): modules whose time.monotonic `clock` replaces"
+    )
+
+
+class Clock:
+    """A `time.monotonic` that only moves when a test sets `now`"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _ClockTime:
+    # the `time` module as seen by the code under test, only monotonic is fake
+    def __init__(self, clock: Clock):
+        self.monotonic = clock
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def clock(request, monkeypatch):
+    """A fake clock for the modules named by the test's `clock` marker
+
+    Mark the test module with e.g. `pytestmark = pytest.mark.clock(sse)`. Only
+    the marked modules see the fake clock, asyncio and the rest of the
+    process keep the real one.
+    """
+    marker = request.node.get_closest_marker("clock")
+    if marker is None or not marker.args:
+        raise pytest.UsageError("mark the test with @pytest.mark.clock(module)")
+    clock = Clock()
+    for module in marker.args:
+        monkeypatch.setattr(module, "time", _ClockTime(clock))
+    return clock
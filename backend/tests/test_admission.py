@@ -0,0 +1,149 @@
+from app.chat import admission as admission_module
+from app.chat import controllers
+from app.chat.admission import AdmissionController, AdmissionRejected, TokenBucket
+import asyncio
+import math
+import pytest
+
+pytestmark = pytest.mark.clock(admission_module)
+
+
+def rejected(admit) -> str:
+    with pytest.raises(AdmissionRejected) as e:
+        admit()
+    assert e.value.retry_after >= 1
+    return e.value.reason
+
+
+def test_token_bucket_allows_a_burst_then_refills(clock):
+    bucket = TokenBucket(rate=0.5, burst=2)
+    assert bucket.take() == bucket.take() == 0
+    assert bucket.take() == pytest.approx(2.0)
+    clock.now += 1
+    assert bucket.take() == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.take() == 0
+    # never more than the burst
+    clock.now += 60
+    assert [bucket.take() > 0 for _ in range(3)] == [False, False, True]
+
+
+def test_token_bucket_without_refill_never_frees_up(clock):
+    bucket = TokenBucket(rate=0, burst=1)
+    bucket.take()
+    assert bucket.take() == math.inf
+
+
+def test_admits_up_to_the_limit_then_queues(clock):
+    controller = AdmissionController(max_concurrent=2, max_queue=2, user_burst=5)
+    first, second = controller.admit("a"), controller.admit("b")
+    third, fourth = controller.admit("c"), controller.admit("d")
+    assert first.admitted and second.admitted
+    assert not third.admitted and controller.position(fourth) == 2
+    assert rejected(lambda: controller.admit("e")) == "queue_full"
+    controller.finish(first)
+    controller.finish(first)  # a second finish changes nothing
+    assert third.admitted and controller.position(fourth) == 1
+    assert controller.stats()["running"] == 2 and controller.stats()["queued"] == 1
+
+
+def test_one_queued_turn_per_user(clock):
+    controller = AdmissionController(max_concurrent=1, max_queue=5, user_burst=5)
+    controller.admit("a")
+    controller.admit("b")
+    assert rejected(lambda: controller.admit("b")) == "already_queued"
+
+
+def test_a_finished_queued_turn_leaves_the_queue(clock):
+    controller = AdmissionController(max_concurrent=1, max_queue=5, user_burst=5)
+    running = controller.admit("a")
+    queued, behind = controller.admit("b"), controller.admit("c")
+    controller.finish(queued)
+    assert controller.position(behind) == 1
+    controller.finish(running)
+    assert behind.admitted and not queued.admitted
+
+
+def test_users_over_their_rate_are_rejected(clock):
+    controller = AdmissionController(user_turns_per_minute=6, user_burst=2)
+    controller.finish(controller.admit("a"))
+    controller.finish(controller.admit("a"))
+    with pytest.raises(AdmissionRejected) as e:
+        controller.admit("a")
+    assert e.value.reason == "rate_limited" and e.value.retry_after == 10
+    controller.admit("b")
+    clock.now += 10
+    controller.admit("a")
+
+
+def test_without_queue_a_full_server_rejects(clock):
+    controller = AdmissionController(max_concurrent=1, user_burst=1)
+    running = controller.admit("a")
+    assert rejected(lambda: controller.admit("b", queue=False)) == "busy"
+    assert controller.stats()["queued"] == 0
+    # the refused turn did not use up the user's burst
+    controller.finish(running)
+    assert controller.admit("b", queue=False).admitted
+
+
+def test_a_queued_turn_reports_its_place_until_admitted():
+    controller = AdmissionController(max_concurrent=1, max_queue=5, user_burst=5)
+    tickets = [controller.admit(user) for user in "abc"]
+    positions = []
+
+    async def wait():
+        async for position in controller.aqueue_positions(tickets[2], interval=1):
+            positions.append(position)
+            # each finished turn moves the queue up, the event wakes the wait
+            controller.finish(tickets[len(positions) - 1])
+
+    asyncio.run(asyncio.wait_for(wait(), 5))
+    assert positions == [2, 1]
+    assert tickets[2].admitted
+
+
+def test_a_queued_turn_times_out():
+    controller = AdmissionController(max_concurrent=1, queue_timeout=0.05)
+
+    async def run():
+        controller.admit("a")
+        queued = controller.admit("b")
+        async for _ in controller.aqueue_positions(queued, interval=0.01):
+            pass
+
+    with pytest.raises(AdmissionRejected) as e:
+        asyncio.run(run())
+    assert e.value.reason == "timeout"
+    assert controller.stats()["queued"] == 0
+
+
+@pytest.fixture
+def client(app, db_session):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 7
+    return client
+
+
+def test_flask_rejects_before_loading_the_conversation(client, monkeypatch):
+    full = AdmissionController(max_concurrent=1)
+    full.admit("someone else")
+    monkeypatch.setattr(controllers, "admission", full)
+
+    def load(*args):
+        raise AssertionError("loaded the conversation of a refused turn")
+
+    monkeypatch.setattr(controllers.conversations, "get", load)
+    response = client.get("/api/chat/message?message=hi")
+    assert response.status_code == 429
+    assert response.get_json()["reason"] == "busy"
+    assert response.headers["Retry-After"]
+    assert full.stats()["queued"] == 0
+
+
+def test_flask_frees_the_slot_of_a_missing_session(client, monkeypatch):
+    controller = AdmissionController(max_concurrent=1)
+    monkeypatch.setattr(controllers, "admission", controller)
+    response = client.get("/api/chat/message?message=hi&session_id=12345")
+    assert response.status_code == 404
+    assert controller.stats()["running"] == 0
@@ -0,0 +1,124 @@
+from app.chat.utils import clients
+from app.chat.utils.clients import hedged
+from concurrent.futures import Future
+from prometheus_client import REGISTRY
+import contextvars
+import threading
+import time
+import pytest
+
+DELAY = 0.02
+
+
+def hedges(outcome: str) -> float:
+    clients.HEDGED_REQUESTS.labels(outcome)  # the sample exists from here on
+    return REGISTRY.get_sample_value("http_hedged_requests_total", {"outcome": outcome})
+
+
+@pytest.fixture
+def counted():
+    """The change of the hedge counters over a test"""
+    before = {outcome: hedges(outcome) for outcome in ("sent", "won")}
+    return lambda outcome: hedges(outcome) - before[outcome]
+
+
+def requests(*behaviours):
+    """A call whose n-th run sleeps and then returns or raises `behaviours[n]`"""
+    runs = []
+
+    def call():
+        seconds, outcome = behaviours[len(runs)]
+        runs.append(threading.current_thread().name)
+        time.sleep(seconds)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return call, runs
+
+
+def test_no_delay_sends_one_request_inline(counted):
+    call, runs = requests((0, "only"))
+    assert hedged(call, 0) == "only"
+    assert runs == [threading.current_thread().name]
+    assert counted("sent") == 0
+
+
+def test_a_fast_request_is_not_hedged(counted):
+    call, runs = requests((0, "first"))
+    assert hedged(call, 1) == "first"
+    assert len(runs) == 1 and counted("sent") == 0
+
+
+def test_the_hedge_wins_a_slow_request(counted):
+    call, runs = requests((0.5, "first"), (0, "second"))
+    assert hedged(call, DELAY) == "second"
+    assert len(runs) == 2
+    assert counted("sent") == 1 and counted("won") == 1
+
+
+def test_the_first_request_can_still_win(counted):
+    call, runs = requests((DELAY * 3, "first"), (0.5, "second"))
+    assert hedged(call, DELAY) == "first"
+    assert counted("sent") == 1 and counted("won") == 0
+
+
+def test_a_failed_request_is_rescued_by_the_hedge(counted):
+    call, _ = requests((DELAY * 2, ValueError("first")), (DELAY * 4, "second"))
+    assert hedged(call, DELAY) == "second"
+    assert counted("won") == 1
+
+
+def test_an_error_before_the_delay_is_raised_without_hedging(counted):
+    call, runs = requests((0, ValueError("first")))
+    with pytest.raises(ValueError):
+        hedged(call, 1)
+    assert len(runs) == 1 and counted("sent") == 0
+
+
+def test_the_last_error_is_raised_when_both_fail():
+    call, _ = requests((DELAY * 2, ValueError("first")), (DELAY * 4, KeyError("x")))
+    with pytest.raises(KeyError):
+        hedged(call, DELAY)
+
+
+class BusyExecutor:
+    """Runs the first call on a thread, later ones wait for a worker forever"""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        if len(self.futures) == 1:
+
+            def run():
+                future.set_running_or_notify_cancel()
+                future.set_result(fn(*args))
+
+            threading.Thread(target=run).start()
+        return future
+
+
+def test_a_hedge_still_waiting_for_a_worker_is_cancelled(monkeypatch, counted):
+    executor = BusyExecutor()
+    monkeypatch.setattr(clients, "_hedge_executor", executor)
+    call, runs = requests((DELAY * 3, "first"))
+    assert hedged(call, DELAY) == "first"
+    assert len(runs) == 1 and counted("sent") == 1
+    assert executor.futures[1].cancelled()
+
+
+def test_requests_run_in_the_callers_context():
+    request_id = contextvars.ContextVar("request_id", default=None)
+    request_id.set("abc")
+    seen = []
+
+    def call():
+        seen.append(request_id.get())
+        time.sleep(DELAY * 2 if len(seen) == 1 else 0)
+        return len(seen)
+
+    assert hedged(call, DELAY) == 2
+    assert seen == ["abc", "abc"]
@@ -0,0 +1,111 @@
+from app.chat import context_window
+from app.chat.context_window import CHARS_PER_TOKEN, TRUNCATED, ContextWindow
+import pytest
+
+
+@pytest.fixture
+def estimate(monkeypatch):
+    """Count tokens from the text length, as without tiktoken"""
+    monkeypatch.setattr(context_window, "tiktoken", None)
+
+    def make(**kwargs) -> ContextWindow:
+        window = ContextWindow(**kwargs)
+        assert window.encoding is None
+        return window
+
+    return make
+
+
+def message(role: str, tokens: int, fill: str = "x") -> dict:
+    """A message whose content estimates to `tokens` tokens"""
+    return {"role": role, "content": fill * (tokens * CHARS_PER_TOKEN)}
+
+
+PINNED = message("developer", 10, "p")
+
+
+def test_estimate_rounds_up(estimate):
+    window = estimate()
+    assert window.count("") == 0
+    assert window.count("abcd") == 1
+    assert window.count("abcde") == 2
+
+
+def test_truncate_cuts_and_marks_the_text(estimate):
+    window = estimate()
+    text = "a" * 100
+    assert window.truncate(text, 25) is text
+    assert window.truncate(text, 10) == "a" * 40 + TRUNCATED
+
+
+def test_fits_everything_within_the_budget(estimate):
+    window = estimate(budget=100)
+    messages = [PINNED, message("user", 10), message("assistant", 10)]
+    fitted = window.fit(messages)
+    assert fitted == messages and fitted is not messages
+    assert window.fit([]) == []
+
+
+def test_keeps_the_pinned_prompt_and_the_newest_messages(estimate):
+    # every message costs 14 tokens with its overhead
+    window = estimate(budget=120, summary_tokens=45)
+    history = [
+        message(role, 10, fill)
+        for role, fill in zip(["user", "assistant"] * 4, "abcdefgh")
+    ]
+    messages = [PINNED] + history
+    fitted = window.fit(messages)
+    # 14 for the prompt, then the newest four up to budget - summary_tokens
+    assert fitted[0] is PINNED
+    assert fitted[2:] == history[-4:]
+    summary = fitted[1]
+    assert summary["role"] == "developer"
+    assert summary["content"].splitlines()[1:] == [
+        "- " + "a" * 40,
+        "- " + "c" * 40,
+    ]
+    assert messages == [PINNED] + history
+
+
+def test_the_newest_message_is_always_sent_cut_down(estimate):
+    window = estimate(budget=30)
+    newest = message("user", 100)
+    fitted = window.fit([PINNED, message("user", 10, "o"), newest])
+    # 30 - 14 for the prompt - 4 overhead leaves 12 tokens
+    assert fitted[-1] == {"role": "user", "content": "x" * 48 + TRUNCATED}
+    assert fitted[0] is PINNED and fitted[1]["content"].endswith("- " + "o" * 40)
+    assert newest["content"] == "x" * 400
+
+
+def test_only_tool_results_are_clipped(estimate):
+    window = estimate(budget=1000, tool_result_tokens=10)
+    tool_result = {"role": "assistant", "content": "TOOL_NAME: x, RESULT: " + "y" * 200}
+    answer = message("assistant", 60)
+    fitted = window.fit([PINNED, tool_result, answer])
+    assert fitted[1]["content"] == tool_result["content"][:40] + TRUNCATED
+    assert fitted[2] is answer
+
+
+def test_the_note_keeps_the_latest_questions(estimate):
+    window = estimate()
+    header = window.summarize([message("user", 1)])["content"].splitlines()[0]
+    # each line is "- " and 18 characters, 5 tokens
+    window = estimate(summary_tokens=window.count(header) + 10)
+    dropped = [
+        {"role": "user", "content": "first  question\n.."},
+        {"role": "assistant", "content": "an answer"},
+        {"role": "user", "content": "second question..."},
+        {"role": "user", "content": "third question...."},
+    ]
+    assert window.summarize(dropped)["content"].splitlines() == [
+        header,
+        "- second question...",
+        "- third question....",
+    ]
+    assert window.summarize(dropped[1:2]) is None
+
+
+def test_long_questions_are_cut_in_the_note(estimate):
+    window = estimate(summary_tokens=300)
+    note = window.summarize([message("user", 100)])["content"]
+    assert note.splitlines()[1] == "- " + "x" * 160 + TRUNCATED
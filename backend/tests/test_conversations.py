@@ -0,0 +1,184 @@
+from app.chat.conversations import ConversationStore
+from app.chat.models import ChatMessage
+from app.chat import services
+from app.chat.admission import admission
+from app.chat.services import ChatService, conversations
+from app.extensions import db
+from concurrent.futures import Future
+import json
+import pytest
+
+
+@pytest.fixture
+def store(db_session):
+    return ConversationStore(max_sessions=10, idle_ttl=60, max_messages=4)
+
+
+def history(conversation) -> list[tuple[str, str]]:
+    # without the pinned developer prompt
+    return [(m["role"], m["content"]) for m in conversation.messages[1:]]
+
+
+def test_rehydrates_a_saved_conversation(store):
+    conversation = store.create(7)
+    conversation.add("user", "recommend a movie")
+    conversation.add("assistant", "Heat")
+    store.save(conversation)
+
+    restarted = ConversationStore(max_messages=4)
+    loaded = restarted.get(7, conversation.session_id)
+    assert loaded is not conversation
+    assert history(loaded) == [("user", "recommend a movie"), ("assistant", "Heat")]
+    assert loaded.unsaved == []
+
+
+def test_defaults_to_the_latest_session(store):
+    store.create(7)
+    latest = store.create(7)
+    latest.add("user", "hi")
+    store.save(latest)
+    assert ConversationStore().get(7).session_id == latest.session_id
+
+
+def test_creates_a_session_for_a_new_user(store):
+    conversation = store.get(8)
+    assert conversation is not None and history(conversation) == []
+
+
+def test_another_users_session_is_not_found(store):
+    conversation = store.create(7)
+    assert ConversationStore().get(8, conversation.session_id) is None
+    assert store.get(7, 12345) is None
+
+
+def test_rehydrates_only_the_latest_messages(store):
+    conversation = store.create(7)
+    for i in range(6):
+        conversation.add("user", str(i))
+    assert history(conversation) == [("user", str(i)) for i in range(2, 6)]
+    store.save(conversation)
+    assert db.session.query(ChatMessage).count() == 6
+    loaded = ConversationStore(max_messages=4).get(7, conversation.session_id)
+    assert history(loaded) == [("user", str(i)) for i in range(2, 6)]
+
+
+def test_evicts_idle_and_least_recently_used_conversations(db_session):
+    store = ConversationStore(max_sessions=2)
+    first, second = store.create(7), store.create(7)
+    store.get(7, first.session_id)
+    store.create(7)
+    assert store.stats()["active"] == 2
+    # `second` was dropped from memory but still loads from the database
+    assert store.get(7, second.session_id) is not second
+
+
+def test_discard_turn_drops_only_the_turns_messages(store):
+    conversation = store.create(7)
+    conversation.add("user", "again")
+    store.save(conversation)
+    conversation.add("user", "again")
+    assert conversation.start_turn()
+    conversation.add("user", "again")
+    conversation.add("assistant", "TOOL_NAME: x, RESULT: {}")
+    conversation.discard_turn()
+    # equal messages from before the turn stay
+    assert history(conversation) == [("user", "again"), ("user", "again")]
+    assert conversation.unsaved == [{"role": "user", "content": "again"}]
+
+
+def test_one_turn_at_a_time(store):
+    conversation = store.create(7)
+    assert conversation.start_turn()
+    assert not conversation.start_turn()
+    conversation.end_turn()
+    conversation.end_turn()
+    assert conversation.start_turn()
+
+
+def test_a_conversation_in_a_turn_is_not_evicted(db_session):
+    store = ConversationStore(max_sessions=1)
+    busy = store.create(7)
+    busy.start_turn()
+    store.create(7)
+    assert store.get(7, busy.session_id) is busy
+    assert store.stats()["in_turn"] == 1
+    busy.end_turn()
+    store.create(7)
+    assert store.get(7, busy.session_id) is not busy
+
+
+def test_a_cancelled_turn_leaves_no_dangling_message(store, monkeypatch):
+    service = ChatService()
+
+    def turn(message, conversation, futures):
+        conversation.add("user", message)
+        yield "first chunk"
+        yield "never sent"
+
+    monkeypatch.setattr(service, "_process_message", turn)
+    conversation = store.create(7)
+    conversation.start_turn()
+    stream = service.process_message("are you there?", conversation)
+    assert next(stream) == "first chunk"
+    stream.close()
+    assert history(conversation) == [] and conversation.unsaved == []
+
+
+def test_tool_results_are_encoded_once_for_event_and_history(store, monkeypatch):
+    service = ChatService()
+    encodings = []
+    encode = services.encode_compact
+
+    def counting(projected):
+        encodings.append(projected)
+        return encode(projected)
+
+    monkeypatch.setattr(services, "encode_compact", counting)
+    future = Future()
+    future.set_result({"error": "Ünknown movie"})
+    results = {}
+    event = service.tool_result_event(results, (0, "SEARCH", {"q": "é"}), future)
+    conversation = store.create(7)
+    service.add_tool_results(conversation, results)
+    assert json.loads(event) == {
+        "type": "tool_result",
+        "tool_name": "SEARCH",
+        "tool_input": {"q": "é"},
+        "tool_result": {"error": "Ünknown movie"},
+    }
+    assert len(encodings) == 1
+    assert history(conversation) == [
+        ("assistant", 'TOOL_NAME: SEARCH, RESULT: {"error":"Ünknown movie"}')
+    ]
+
+
+def test_rejects_a_malformed_session_id(app, db_session):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 7
+    response = client.get("/api/chat/message?message=hi&session_id=abc")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid session_id"}
+
+
+def test_a_second_turn_on_a_busy_session_is_refused(app, db_session):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 7
+    conversation = conversations.create(7)
+    conversation.start_turn()
+    url = f"/api/chat/message?message=hi&session_id={conversation.session_id}"
+    response = client.get(url)
+    assert response.status_code == 409
+    assert admission.stats()["running"] == 0
+    conversation.end_turn()
+
+
+def test_reports_the_conversations_in_memory(app, db_session):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 7
+    conversations.create(7)
+    stats = client.get("/api/chat/conversations").get_json()
+    assert stats["active"] >= 1 and stats["in_turn"] == 0
+    assert stats["max_sessions"] == conversations.max_sessions
@@ -0,0 +1,69 @@
+from app.chat import services
+from types import SimpleNamespace
+import threading
+import pytest
+
+
+class FakeEmbeddings:
+    """Records requests, the vector of a text is [len(text), call number]"""
+
+    def __init__(self):
+        self.requests = []
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def create(self, model, input):
+        with self.lock:
+            self.requests.append(list(input))
+            self.threads.append(threading.current_thread())
+            number = len(self.requests)
+        # answered out of order, callers must sort on index
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text)), float(number)])
+            for i, text in enumerate(input)
+        ]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+@pytest.fixture
+def embeddings(app, monkeypatch):
+    fake = FakeEmbeddings()
+    client = SimpleNamespace(embeddings=fake)
+    monkeypatch.setattr(services, "get_openai_client", lambda: client)
+    services.embedding_cache.clear()
+    yield fake
+    services.embedding_cache.clear()
+
+
+def test_keeps_input_order(embeddings):
+    texts = ["a", "bbb", "cc"]
+    result = services.get_embeddings(texts, use_cache=False)
+    assert [vector[0] for vector in result] == [1.0, 3.0, 2.0]
+    assert embeddings.requests == [texts]
+
+
+def test_sends_normalized_duplicates_once(embeddings):
+    result = services.get_embeddings(["Heat", "  heat ", "HEAT", "Dunes"])
+    assert embeddings.requests == [["Heat", "Dunes"]]
+    assert result[0] == result[1] == result[2]
+    assert result[3] != result[0]
+
+
+def test_cached_texts_skip_the_api(embeddings):
+    services.get_embeddings(["heat"])
+    services.get_embeddings(["Heat", "dune"])
+    assert embeddings.requests == [["heat"], ["dune"]]
+
+
+def test_single_chunk_runs_on_the_calling_thread(embeddings):
+    services.get_embedding("heat")
+    assert embeddings.threads == [threading.current_thread()]
+
+
+def test_chunks_are_sent_on_the_shared_pool(embeddings, monkeypatch):
+    monkeypatch.setattr(services.Config, "EMBEDDING_BATCH_SIZE", 2)
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    result = services.get_embeddings(texts, use_cache=False)
+    assert sorted(map(len, embeddings.requests)) == [1, 2, 2]
+    assert [vector[0] for vector in result] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert all(t.name.startswith("embedding") for t in embeddings.threads)
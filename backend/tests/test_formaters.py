@@ -0,0 +1,81 @@
+from app.chat.utils import formaters
+from app.chat.utils.formaters import (
+    parse_composio_news_search_results,
+    parse_composio_search_results,
+    parse_composio_search_results_by_item,
+)
+from benchmarks.formaters import FIXTURES, PARSERS, resize
+import json
+import pytest
+
+SIZES = {"small": 0, "typical": 1, "huge": 20}
+
+
+def load(name: str) -> dict:
+    return json.loads((FIXTURES / f"{name}.json").read_text())["response"]
+
+
+def knowledge(payload: dict) -> dict:
+    return payload["data"]["results"]["knowledge_graph"]
+
+
+@pytest.fixture
+def no_fallback(monkeypatch):
+    """Fail the test if a payload takes the item by item path"""
+
+    def fail(composio_result):
+        raise AssertionError("fell back to the item by item parser")
+
+    monkeypatch.setattr(formaters, "parse_composio_search_results_by_item", fail)
+    monkeypatch.setattr(formaters, "parse_composio_news_search_results_by_item", fail)
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("path", sorted(FIXTURES.glob("*.json")), ids=lambda p: p.stem)
+def test_single_pass_matches_item_by_item(path, size):
+    fixture = json.loads(path.read_text())
+    fast, reference = PARSERS[fixture["tool"]]
+    payload = resize(fixture["response"], SIZES[size])
+    expected = reference(payload)
+    assert "error" not in expected
+    assert json.dumps(fast(payload)) == json.dumps(expected)
+
+
+@pytest.mark.parametrize("path", sorted(FIXTURES.glob("*.json")), ids=lambda p: p.stem)
+def test_fixtures_take_the_single_pass(path, no_fallback):
+    fixture = json.loads(path.read_text())
+    fast, _ = PARSERS[fixture["tool"]]
+    assert "error" not in fast(fixture["response"])
+
+
+def test_role_lists_are_joined(no_fallback):
+    payload = load("search_movie_info_role_lists")
+    knowledge(payload)["cast"][0]["extensions"] = ["Dom Cobb", "Narrator"]
+    cast = parse_composio_search_results(payload)["cast"]
+    assert cast[0] == {"name": "Leonardo DiCaprio", "role": "Dom Cobb, Narrator"}
+    assert cast[1]["role"] == "Arthur"
+
+
+def test_a_review_without_rating_is_an_error_like_item_by_item():
+    payload = load("search_movie_info")
+    del knowledge(payload)["editorial_reviews"][1]["rating"]
+    result = parse_composio_search_results(payload)
+    assert "error" in result
+    assert result == parse_composio_search_results_by_item(payload)
+
+
+def test_missing_keys_get_the_item_by_item_defaults(no_fallback):
+    payload = load("search_movie_info")
+    results = payload["data"]["results"]
+    for item in knowledge(payload)["cast"] + results["available_on"]:
+        item.pop("extensions", None)
+        item.pop("price", None)
+    expected = parse_composio_search_results_by_item(payload)
+    assert parse_composio_search_results(payload) == expected
+
+
+def test_invalid_payloads_fall_back_to_item_by_item():
+    payload = load("news_search")
+    payload["data"]["results"]["news_results"][0]["title"] = None
+    result = parse_composio_news_search_results(payload)
+    assert "error" in result
@@ -0,0 +1,71 @@
+from app.chat import admission as admission_module
+from app.chat import controllers
+from app.chat.admission import AdmissionController
+from prometheus_client import REGISTRY
+import json
+import pytest
+
+pytestmark = pytest.mark.clock(admission_module)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def client(app, db_session):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 7
+    return client
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController(max_concurrent=1, user_burst=5)
+    monkeypatch.setattr(controllers, "admission", controller)
+    return controller
+
+
+def test_a_turn_is_active_until_its_stream_closes(client, controller, monkeypatch):
+    active = []
+
+    def process_message(message, conversation):
+        active.append(sample("chat_active_turns"))
+        yield json.dumps({"type": "final_response", "text": "hi"})
+
+    monkeypatch.setattr(controllers.chat_service, "process_message", process_message)
+    response = client.get("/api/chat/message?message=hi")
+    assert "final_response" in response.get_data(as_text=True)
+    response.close()
+    assert active == [1]
+    assert sample("chat_active_turns") == 0
+
+
+def test_a_refused_turn_counts_as_rejected(client, controller):
+    controller.admit("someone else")
+    before = sample("chat_rejected_turns_total", reason="busy")
+    assert client.get("/api/chat/message?message=hi").status_code == 429
+    assert sample("chat_rejected_turns_total", reason="busy") == before + 1
+
+
+def test_the_wait_of_a_queued_turn_is_observed(clock):
+    controller = AdmissionController(max_concurrent=1, user_burst=5)
+    count = sample("chat_queue_wait_seconds_count")
+    total = sample("chat_queue_wait_seconds_sum")
+    running = controller.admit("a")
+    controller.admit("b")
+    assert sample("chat_queue_depth") == 1
+    clock.now += 2.5
+    controller.finish(running)
+    # "a" started without waiting, "b" waited 2.5 seconds
+    assert sample("chat_queue_wait_seconds_count") == count + 2
+    assert sample("chat_queue_wait_seconds_sum") == pytest.approx(total + 2.5)
+    assert sample("chat_queue_depth") == 0
+    assert sample("chat_active_turns") == 1
+
+
+def test_metrics_are_exported(app):
+    body = app.test_client().get("/metrics").get_data(as_text=True)
+    for name in ("chat_active_turns", "chat_queue_wait_seconds", "chat_queue_depth"):
+        assert f"# TYPE {name} " in body
@@ -0,0 +1,116 @@
+from app.chat import services
+from app.chat.utils.semantic_cache import SemanticCache
+import threading
+import time
+import pytest
+
+
+def test_returns_results_of_a_similar_query():
+    cache = SemanticCache(threshold=0.95)
+    cache.put([1.0, 0.0], ["heat"])
+    assert cache.get([2.0, 0.1]) == ["heat"]
+    assert cache.get([1.0, 1.0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_scope_must_match():
+    cache = SemanticCache()
+    cache.put([1.0, 0.0], ["heat"], scope=(3,))
+    assert cache.get([1.0, 0.0], scope=(5,)) is None
+    assert cache.get([1.0, 0.0], scope=(3,)) == ["heat"]
+
+
+def test_evicts_the_least_recently_used_entry():
+    cache = SemanticCache(max_entries=2)
+    cache.put([1.0, 0.0, 0.0], ["a"])
+    cache.put([0.0, 1.0, 0.0], ["b"])
+    cache.get([1.0, 0.0, 0.0])
+    cache.put([0.0, 0.0, 1.0], ["c"])
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.get([1.0, 0.0, 0.0]) == ["a"]
+    assert cache.get([0.0, 0.0, 1.0]) == ["c"]
+
+
+def test_zero_vectors_are_never_cached():
+    cache = SemanticCache()
+    cache.put([0.0, 0.0], ["nothing"])
+    assert cache.get([0.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_a_new_catalog_version_drops_the_cache():
+    version = {"current": 1}
+    cache = SemanticCache(version_fn=lambda: version["current"], check_interval=0)
+    cache.put([1.0, 0.0], ["heat"])
+    assert cache.get([1.0, 0.0]) == ["heat"]
+    version["current"] = 2
+    assert cache.get([1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_concurrent_lookups_check_the_version_once():
+    calls = []
+
+    def version_fn():
+        calls.append(1)
+        time.sleep(0.05)
+        return 1
+
+    cache = SemanticCache(version_fn=version_fn, check_interval=60)
+    threads = [threading.Thread(target=cache.get, args=([1.0, 0.0],)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self):
+        self.searches = []
+
+    def search(self, query_vector, top_k, **kwargs):
+        self.searches.append(top_k)
+        return [{"id": i, "title": f"vector {i}"} for i in range(1, top_k + 1)]
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    fake = FakeBackend()
+    fake.text_searches = []
+
+    def text_search(query_text, limit, filters=None):
+        fake.text_searches.append(query_text)
+        return [{"id": 99, "title": query_text}]
+
+    # every query gets the same embedding, only the scope tells them apart
+    monkeypatch.setattr(services, "get_embedding", lambda text: [1.0, 0.0])
+    monkeypatch.setattr(services, "get_search_backend", lambda: fake)
+    monkeypatch.setattr(services, "text_search", text_search)
+    monkeypatch.setattr(services, "semantic_cache", SemanticCache())
+    monkeypatch.setattr(services.Config, "RECOMMEND_CANDIDATES", 10)
+    monkeypatch.setattr(services.Config, "RECOMMEND_RRF_K", 60)
+    return fake
+
+
+def test_hybrid_queries_share_vector_candidates(backend, monkeypatch):
+    monkeypatch.setattr(services.Config, "RECOMMEND_HYBRID", True)
+    first = services.recommend("Heat", top_k=2)
+    second = services.recommend("something like heat", top_k=2)
+    # one vector search for the candidates, the text ranking runs every time
+    assert backend.searches == [10]
+    assert backend.text_searches == ["Heat", "something like heat"]
+    assert first == [{"movie": "vector 1"}, {"movie": "Heat"}]
+    assert second == [{"movie": "vector 1"}, {"movie": "something like heat"}]
+
+
+def test_vector_only_results_are_shared_by_similar_queries(backend, monkeypatch):
+    monkeypatch.setattr(services.Config, "RECOMMEND_HYBRID", False)
+    services.recommend("Heat")
+    assert services.recommend("dune", top_k=3) == [
+        {"movie": f"vector {i}"} for i in (1, 2, 3)
+    ]
+    assert backend.searches == [3]
+    assert backend.text_searches == []
@@ -0,0 +1,148 @@
+from app.chat.utils import sse
+from app.chat.utils.sse import FrameCoalescer, acoalesce, coalesce, frame
+import asyncio
+import json
+import time
+import pytest
+
+pytestmark = pytest.mark.clock(sse)
+
+
+def text(kind: str, delta: str) -> dict:
+    return {"type": kind, "text": delta}
+
+
+def events(frames: list[str]) -> list[dict]:
+    assert all(f.startswith("data: ") and f.endswith("\n\n") for f in frames)
+    return [json.loads(f[6:]) for f in frames]
+
+
+def test_merges_deltas_within_the_window(clock):
+    coalescer = FrameCoalescer(window=0.05, max_chars=256)
+    # the first delta goes out right away
+    assert events(coalescer.push(text("init_response", "He"))) == [
+        {"type": "init_response", "text": "He"}
+    ]
+    assert coalescer.push(text("init_response", "ll")) == []
+    clock.now += 0.02
+    assert coalescer.push(text("init_response", "o ")) == []
+    assert coalescer.time_left() == pytest.approx(0.03)
+    clock.now += 0.03
+    assert events(coalescer.push(text("init_response", "world"))) == [
+        {"type": "init_response", "text": "llo world"}
+    ]
+    assert coalescer.flush() == []
+
+
+def test_flushes_at_max_chars(clock):
+    coalescer = FrameCoalescer(window=10, max_chars=5)
+    coalescer.push(text("init_response", "a"))
+    assert coalescer.push(text("init_response", "bcd")) == []
+    assert events(coalescer.push(text("init_response", "ef"))) == [
+        {"type": "init_response", "text": "bcdef"}
+    ]
+
+
+def test_other_events_flush_the_buffer_first(clock):
+    coalescer = FrameCoalescer(window=10)
+    coalescer.push(text("init_response", "a"))
+    coalescer.push(text("init_response", "b"))
+    tool_use = json.dumps({"type": "tool_use", "tool_name": "SEARCH"})
+    assert events(coalescer.push(tool_use)) == [
+        {"type": "init_response", "text": "b"},
+        {"type": "tool_use", "tool_name": "SEARCH"},
+    ]
+    # the first delta after another event is not held back
+    assert events(coalescer.push(text("final_response", "c"))) == [
+        {"type": "final_response", "text": "c"}
+    ]
+
+
+def test_a_new_kind_flushes_the_old_one(clock):
+    coalescer = FrameCoalescer(window=10)
+    coalescer.push(text("init_response", "a"))
+    coalescer.push(text("init_response", "b"))
+    coalescer.push(text("final_response", "c"))
+    assert events(coalescer.flush()) == [{"type": "final_response", "text": "c"}]
+
+
+def test_a_zero_window_sends_every_event():
+    payloads = [text("init_response", delta) for delta in "abc"]
+    assert list(coalesce(payloads, window=0)) == [
+        frame(json.dumps(p)) for p in payloads
+    ]
+
+
+def test_encoded_text_is_not_merged(clock):
+    # only the structured deltas of the chat service are merged, whatever an
+    # encoded event looks like
+    coalescer = FrameCoalescer(window=10)
+    encoded = json.dumps(text("init_response", "b"))
+    coalescer.push(text("init_response", "a"))
+    assert coalescer.push(encoded) == [frame(encoded)]
+    assert events(coalescer.push(text("init_response", "c"))) == [
+        {"type": "init_response", "text": "c"}
+    ]
+
+
+def test_coalesce_keeps_the_text_and_order():
+    payloads = [text("init_response", delta) for delta in "Hello"]
+    payloads.append(json.dumps({"type": "tool_use", "tool_name": "SEARCH"}))
+    payloads += [text("final_response", delta) for delta in "world"]
+    out = events(list(coalesce(payloads, window=10)))
+    assert [e["type"] for e in out] == [
+        "init_response",
+        "init_response",
+        "tool_use",
+        "final_response",
+        "final_response",
+    ]
+    assert "".join(e.get("text", "") for e in out) == "Helloworld"
+
+
+def test_coalesce_flushes_before_an_error():
+    def turn():
+        yield text("init_response", "a")
+        yield text("init_response", "b")
+        raise RuntimeError("model stream failed")
+
+    frames = []
+    with pytest.raises(RuntimeError):
+        for chunk in coalesce(turn(), window=10):
+            frames.append(chunk)
+    assert "".join(e["text"] for e in events(frames)) == "ab"
+
+
+def test_acoalesce_sends_buffered_text_when_the_window_ends():
+    async def turn():
+        for delta in "abc":
+            yield text("init_response", delta)
+        # the model pauses, the buffered "bc" is due before it resumes
+        await asyncio.sleep(0.3)
+        yield text("init_response", "d")
+
+    async def collect():
+        started, received = time.monotonic(), []
+        async for chunk in acoalesce(turn(), window=0.02):
+            received.append((time.monotonic() - started, events([chunk])[0]["text"]))
+        return received
+
+    received = asyncio.run(collect())
+    assert [chunk for _, chunk in received] == ["a", "bc", "d"]
+    assert received[1][0] < 0.2
+
+
+def test_acoalesce_flushes_before_an_error():
+    async def turn():
+        yield text("init_response", "a")
+        yield text("init_response", "b")
+        raise RuntimeError("model stream failed")
+
+    async def collect():
+        received = []
+        with pytest.raises(RuntimeError):
+            async for chunk in acoalesce(turn(), window=10):
+                received.append(chunk)
+        return received
+
+    assert "".join(e["text"] for e in events(asyncio.run(collect()))) == "ab"
@@ -0,0 +1,124 @@
+from app.chat.utils import tool_cache
+from app.chat.utils.tool_cache import ToolResultCache
+import threading
+import time
+import pytest
+
+pytestmark = pytest.mark.clock(tool_cache)
+
+
+def counting(result=None):
+    """A tool call that counts its runs, returns `result` or the run number"""
+    calls = []
+
+    def call():
+        calls.append(1)
+        return len(calls) if result is None else result
+
+    return call, calls
+
+
+def test_equivalent_arguments_share_a_key():
+    cache = ToolResultCache()
+    assert cache.make_key("SEARCH", {"query": " Dune  Part  Two", "n": 3}) == (
+        cache.make_key("SEARCH", {"n": 3, "query": "dune part two"})
+    )
+    assert cache.make_key("SEARCH", {"query": "dune"}) != cache.make_key(
+        "NEWS", {"query": "dune"}
+    )
+
+
+def test_results_expire_after_the_tool_ttl(clock):
+    cache = ToolResultCache(ttls={"NEWS": 60}, default_ttl=600)
+    call, calls = counting()
+    assert cache.get_or_call("NEWS", {"q": "x"}, call) == 1
+    clock.now += 59
+    assert cache.get_or_call("NEWS", {"q": "x"}, call) == 1
+    clock.now += 2
+    assert cache.get_or_call("NEWS", {"q": "x"}, call) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_a_zero_ttl_turns_caching_off(clock):
+    cache = ToolResultCache(ttls={"NEWS": 0}, default_ttl=600)
+    call, calls = counting()
+    cache.get_or_call("NEWS", {}, call)
+    cache.get_or_call("NEWS", {}, call)
+    assert len(calls) == 2
+
+
+def test_failed_results_are_not_cached(clock):
+    cache = ToolResultCache(default_ttl=600)
+    call, calls = counting({"successful": False, "error": "rate limited"})
+    cache.get_or_call("SEARCH", {}, call)
+    cache.get_or_call("SEARCH", {}, call)
+    assert len(calls) == 2
+
+
+def test_evicts_the_least_recently_used_result(clock):
+    cache = ToolResultCache(default_ttl=600, max_entries=2)
+    for query in ("a", "b"):
+        cache.get_or_call("SEARCH", {"q": query}, lambda: query)
+    cache.get_or_call("SEARCH", {"q": "a"}, lambda: "again")
+    cache.get_or_call("SEARCH", {"q": "c"}, lambda: "c")
+    assert cache.get_or_call("SEARCH", {"q": "a"}, lambda: "again") == "a"
+    assert cache.get_or_call("SEARCH", {"q": "b"}, lambda: "again") == "again"
+
+
+def run_concurrently(cache, call, n=5):
+    """Start `n` identical lookups, returns their results (or errors)"""
+    results = [None] * n
+
+    def lookup(i):
+        try:
+            results[i] = cache.get_or_call("SEARCH", {"q": "dune"}, call)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=lookup, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_waiters(cache, n):
+    deadline = time.monotonic() + 5
+    while cache.stats()["shared"] < n and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_request():
+    cache = ToolResultCache(default_ttl=0)
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return {"successful": True, "data": "dune"}
+
+    threads, results = run_concurrently(cache, call)
+    wait_for_waiters(cache, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"successful": True, "data": "dune"}] * 5
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_an_error_reaches_every_waiter_and_is_retried():
+    cache = ToolResultCache(default_ttl=600)
+    release = threading.Event()
+
+    def call():
+        release.wait(5)
+        raise TimeoutError("composio timed out")
+
+    threads, results = run_concurrently(cache, call)
+    wait_for_waiters(cache, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(result, TimeoutError) for result in results)
+    assert cache.get_or_call("SEARCH", {"q": "dune"}, lambda: "ok") == "ok"
@@ -0,0 +1,98 @@
+from app.extensions import db
+from app.tracing import NOOP_SPAN, InMemoryExporter, Tracer
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+
+@pytest.fixture
+def tracer():
+    return Tracer(enabled=True, exporter=InMemoryExporter())
+
+
+def spans(tracer: Tracer) -> dict[str, dict]:
+    return {span["name"]: span for span in tracer.exporter.recent()}
+
+
+def test_spans_nest_and_reach_the_exporter(tracer):
+    with tracer.span("chat_turn", pipeline="sync") as turn:
+        with tracer.span("model_stream") as stream:
+            stream.set(events=3)
+        with tracer.span("tool_call", tool="SEARCH"):
+            pass
+        turn.set(tool_calls=1)
+    exported = spans(tracer)
+    # children finish first
+    assert [span["name"] for span in tracer.exporter.recent()] == [
+        "model_stream",
+        "tool_call",
+        "chat_turn",
+    ]
+    root = exported["chat_turn"]
+    assert root["parent_id"] is None
+    assert root["attrs"] == {"pipeline": "sync", "tool_calls": 1}
+    for name in ("model_stream", "tool_call"):
+        assert exported[name]["trace_id"] == root["trace_id"]
+        assert exported[name]["parent_id"] == root["span_id"]
+    assert exported["model_stream"]["attrs"] == {"events": 3}
+    assert all(span["duration_ms"] is not None for span in exported.values())
+
+
+def test_a_new_root_starts_a_new_trace(tracer):
+    with tracer.span("first"):
+        pass
+    with tracer.span("second"):
+        pass
+    exported = spans(tracer)
+    assert exported["first"]["trace_id"] != exported["second"]["trace_id"]
+
+
+def test_errors_are_recorded_and_raised(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("tool_call"):
+            raise ValueError("bad input")
+    assert spans(tracer)["tool_call"]["error"] == "ValueError: bad input"
+
+
+def test_a_closed_generator_is_not_an_error(tracer):
+    def turn():
+        with tracer.span("chat_turn"):
+            yield "chunk"
+            yield "never sent"
+
+    stream = turn()
+    next(stream)
+    stream.close()
+    assert spans(tracer)["chat_turn"]["error"] is None
+
+
+def test_an_unsampled_trace_records_nothing(tracer):
+    tracer.sample_rate = 0
+    with tracer.span("chat_turn"):
+        assert tracer.span("tool_call") is NOOP_SPAN
+    assert tracer.exporter.recent() == []
+
+
+def test_a_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False, exporter=InMemoryExporter())
+    assert tracer.span("chat_turn") is NOOP_SPAN
+    assert tracer.exporter.recent() == []
+
+
+def test_work_submitted_with_the_context_joins_the_trace(tracer):
+    def tool_call():
+        with tracer.span("tool_call"):
+            pass
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with tracer.span("chat_turn") as turn:
+            pool.submit(copy_context().run, tool_call).result()
+    assert spans(tracer)["tool_call"]["parent_id"] == turn.span_id
+
+
+def test_database_queries_are_child_spans(tracer, app):
+    with tracer.span("recommend") as parent:
+        db.session.execute(db.text("SELECT 1"))
+    query = spans(tracer)["db_query"]
+    assert query["parent_id"] == parent.span_id
+    assert query["attrs"]["statement"] == "SELECT 1"
@@ -0,0 +1,271 @@
+from app.chat import vector_search
+from app.chat.models import Vector
+from app.chat.utils.embedding_store import EmbeddingStore
+from app.chat.vector_search import (
+    NumpySearch,
+    PgVectorSearch,
+    clean_filters,
+    fuse,
+)
+from app.extensions import db
+from flask import Flask
+from types import SimpleNamespace
+import json
+import os
+import numpy as np
+import pytest
+
+GENRES = ["drama", "comedy", "horror", None]
+
+
+def make_catalog(rows: int, dim: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "ids": list(range(1, rows + 1)),
+        "titles": [f"movie {i}" for i in range(1, rows + 1)],
+        "matrix": rng.standard_normal((rows, dim)).astype(np.float32),
+        "metadata": {
+            "year": [None if i % 7 == 0 else 1980 + i % 40 for i in range(rows)],
+            "genre": [GENRES[i % len(GENRES)] for i in range(rows)],
+            "runtime": [80 + i % 90 for i in range(rows)],
+        },
+    }
+
+
+def brute_force(catalog: dict, query, top_k: int, keep=lambda i: True) -> list[int]:
+    """Reference: exact L2 distance in float64, ties broken by id"""
+    matrix = catalog["matrix"].astype(np.float64)
+    distances = np.linalg.norm(matrix - np.asarray(query, np.float64), axis=1)
+    rows = [i for i in range(len(catalog["ids"])) if keep(i)]
+    rows.sort(key=lambda i: (distances[i], catalog["ids"][i]))
+    return [catalog["ids"][i] for i in rows[:top_k]]
+
+
+@pytest.fixture
+def numpy_search(tmp_path, monkeypatch):
+    """A NumpySearch over a synthetic catalog, `catalogs` holds the versions"""
+    catalogs = {"v1": make_catalog(300, 16)}
+    version = {"current": "v1"}
+    monkeypatch.setattr(vector_search, "catalog_version", lambda: version["current"])
+
+    def dump(self, path):
+        catalog = catalogs[version["current"]]
+        EmbeddingStore.write(
+            path,
+            catalog["titles"],
+            catalog["matrix"],
+            model="test",
+            ids=catalog["ids"],
+            metadata=catalog["metadata"],
+        )
+
+    monkeypatch.setattr(NumpySearch, "_dump", dump)
+    search = NumpySearch(cache_dir=str(tmp_path), reload_interval=3600)
+    search.catalogs, search.version = catalogs, version
+    return search
+
+
+def ids(results: list[dict]) -> list[int]:
+    return [result["id"] for result in results]
+
+
+def test_numpy_search_matches_brute_force(numpy_search):
+    catalog = numpy_search.catalogs["v1"]
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        query = rng.standard_normal(16)
+        assert ids(numpy_search.search(query, 10)) == brute_force(catalog, query, 10)
+
+
+def test_numpy_search_applies_filters_like_sql(numpy_search):
+    catalog = numpy_search.catalogs["v1"]
+    metadata = catalog["metadata"]
+    query = np.random.default_rng(2).standard_normal(16)
+    filters = {"genre": " Drama ", "min_year": "1990", "max_runtime": 150}
+
+    def keep(i):
+        # NULLs never match, like in SQL
+        year, genre, runtime = (metadata[c][i] for c in ("year", "genre", "runtime"))
+        return (
+            genre == "drama"
+            and year is not None
+            and year >= 1990
+            and runtime is not None
+            and runtime <= 150
+        )
+
+    expected = brute_force(catalog, query, 5, keep)
+    assert ids(numpy_search.search(query, 5, filters=filters)) == expected
+
+
+def test_numpy_search_breaks_ties_by_id(numpy_search):
+    catalog = make_catalog(100, 16)
+    catalog["matrix"][[40, 10, 25]] = catalog["matrix"][0]
+    numpy_search.catalogs["v2"] = catalog
+    numpy_search.version["current"] = "v2"
+    assert ids(numpy_search.search(catalog["matrix"][0], 4)) == [1, 11, 26, 41]
+
+
+def test_numpy_search_reloads_when_the_catalog_changes(numpy_search):
+    query = np.random.default_rng(3).standard_normal(16)
+    before = numpy_search.search(query, 3)
+    numpy_search.catalogs["v2"] = make_catalog(50, 16, seed=9)
+    numpy_search.version["current"] = "v2"
+    # within the reload interval the loaded matrix keeps serving
+    assert numpy_search.search(query, 3) == before
+    numpy_search.invalidate()
+    expected = brute_force(numpy_search.catalogs["v2"], query, 3)
+    assert ids(numpy_search.search(query, 3)) == expected
+
+
+def test_search_many_matches_search(numpy_search):
+    queries = np.random.default_rng(4).standard_normal((3, 16))
+    assert numpy_search.search_many(queries, 4) == [
+        numpy_search.search(query, 4) for query in queries
+    ]
+
+
+def test_clean_filters_drops_unknown_and_empty_values():
+    assert clean_filters(
+        {"genre": " Horror", "year": "1999", "max_year": None, "actor": "x"}
+    ) == {"genre": "horror", "year": 1999}
+
+
+def test_fuse_ranks_by_reciprocal_rank(monkeypatch):
+    monkeypatch.setattr(vector_search.Config, "RECOMMEND_RRF_K", 60)
+    vector = [{"id": i, "title": f"movie {i}"} for i in (3, 1, 2)]
+    lexical = [{"id": i, "title": f"movie {i}"} for i in (4, 2)]
+    # 2 is in both, 3 and 4 are first in one ranking and tie, broken by id
+    assert ids(fuse([vector, lexical], 4)) == [2, 3, 4, 1]
+    assert ids(fuse([vector, []], 2)) == [3, 1]
+
+
+def test_numpy_search_fuses_the_text_ranking(numpy_search, monkeypatch):
+    monkeypatch.setattr(vector_search.Config, "RECOMMEND_CANDIDATES", 20)
+    catalog = numpy_search.catalogs["v1"]
+    query = np.random.default_rng(7).standard_normal(16)
+    text_hits = [{"id": 249, "title": "movie 249"}, {"id": 17, "title": "movie 17"}]
+    calls = []
+
+    def text_search(query_text, limit, filters=None):
+        calls.append((query_text, limit, filters))
+        return text_hits
+
+    monkeypatch.setattr(vector_search, "text_search", text_search)
+    filters = {"genre": "drama"}
+    result = numpy_search.search(query, 5, query_text="heat", filters=filters)
+    vector_hits = numpy_search.search(query, 20, filters=filters)
+    assert result == fuse([vector_hits, text_hits], 5)
+    assert calls == [("heat", 20, filters)]
+    assert 249 in ids(result) and 249 not in ids(vector_hits)
+    assert ids(numpy_search.search(query, 5)) == brute_force(catalog, query, 5)
+
+
+class RecordingSession:
+    """Stands in for `db.session`, keeps the ANN settings of each statement"""
+
+    def __init__(self):
+        self.settings = []
+
+    def execute(self, statement, params=None):
+        if "set_config" in str(statement):
+            self.settings.append(params)
+        return []
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    session = RecordingSession()
+    monkeypatch.setattr(vector_search, "db", SimpleNamespace(session=session))
+    monkeypatch.setattr(vector_search.Config, "VECTOR_EF_SEARCH", 40)
+    monkeypatch.setattr(vector_search.Config, "RECOMMEND_CANDIDATES", 50)
+    return session.settings
+
+
+def test_ef_search_covers_the_hybrid_candidates(recorded):
+    PgVectorSearch().search([0.0], 5, query_text="heat")
+    PgVectorSearch().search([0.0], 5)
+    PgVectorSearch().search([0.0], 5, ef_search=100, query_text="heat")
+    assert [settings["ef_search"] for settings in recorded] == ["50", "40", "100"]
+
+
+def test_ef_search_covers_every_batched_scan(recorded):
+    PgVectorSearch().search_many([[0.0], [1.0]], 5)
+    PgVectorSearch().search_many([[0.0], [1.0]], 60)
+    PgVectorSearch().search_many([[0.0]], 5000)
+    assert [settings["ef_search"] for settings in recorded] == ["40", "60", "1000"]
+
+
+@pytest.fixture
+def pgvector_app():
+    """An app on the pgvector database in `TEST_PGVECTOR_URL`
+
+    The tests work on a temporary `movies` table (it shadows a real one for
+    the session) and roll back, nothing is written to the database.
+    """
+    url = os.environ.get("TEST_PGVECTOR_URL")
+    if not url:
+        pytest.skip("set TEST_PGVECTOR_URL to a postgres database with pgvector")
+    app = Flask("pgvector-tests")
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    db.init_app(app)
+    with app.app_context():
+        yield app
+        db.session.rollback()
+        db.session.remove()
+
+
+def test_numpy_and_pgvector_return_the_same_movies(pgvector_app, tmp_path):
+    catalog = make_catalog(200, Vector.dim, seed=5)
+    # a few shared words so the text ranking has ties and misses
+    words = ["heat", "drop", "night", "city", "river"]
+    catalog["titles"] = [
+        f"{words[i % 5]} {words[i % 3]} {i}" for i in range(len(catalog["ids"]))
+    ]
+    db.session.execute(
+        db.text(f"""
+            CREATE TEMP TABLE movies (
+                id integer PRIMARY KEY,
+                title text,
+                year integer,
+                genre text,
+                runtime integer,
+                embedding vector({Vector.dim}),
+                search_vector tsvector
+                    GENERATED ALWAYS AS (to_tsvector('english', title)) STORED
+            )
+        """)
+    )
+    db.session.execute(
+        db.text("""
+            INSERT INTO movies (id, title, year, genre, runtime, embedding)
+            VALUES (:id, :title, :year, :genre, :runtime, CAST(:embedding AS vector))
+        """),
+        [
+            {
+                "id": catalog["ids"][i],
+                "title": catalog["titles"][i],
+                "year": catalog["metadata"]["year"][i],
+                "genre": catalog["metadata"]["genre"][i],
+                "runtime": catalog["metadata"]["runtime"][i],
+                "embedding": json.dumps(catalog["matrix"][i].tolist()),
+            }
+            for i in range(len(catalog["ids"]))
+        ],
+    )
+    pgvector = PgVectorSearch()
+    numpy_search = NumpySearch(cache_dir=str(tmp_path))
+    rng = np.random.default_rng(6)
+    for filters in (None, {"genre": "comedy"}, {"min_year": 2000, "max_runtime": 120}):
+        queries = rng.standard_normal((5, Vector.dim)).astype(np.float32).tolist()
+        for query in queries:
+            assert numpy_search.search(query, 8, filters=filters) == pgvector.search(
+                query, 8, filters=filters
+            )
+            for query_text in ("heat", "movies like drop", "city river 12"):
+                assert numpy_search.search(
+                    query, 8, query_text=query_text, filters=filters
+                ) == pgvector.search(query, 8, query_text=query_text, filters=filters)
+        assert numpy_search.search_many(
+            queries, 8, filters=filters
+        ) == pgvector.search_many(queries, 8, filters=filters)
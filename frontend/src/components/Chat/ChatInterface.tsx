@@ -76,6 +76,7 @@ const ChatInterface = () => {
         .join("\n\n");
       last.content = latestText;
       last.isLoading = !isFinal;
+      last.queuePosition = undefined;
       last.timestamp = new Date();
 
       newMessages[lastIndex] = last;
@@ -103,6 +104,7 @@ const ChatInterface = () => {
 
       // update last message
       last.response = { ...last.response, blocks };
+      last.queuePosition = undefined;
       // mark timestamp as now
       last.timestamp = new Date();
       // add new message with the last index
@@ -111,6 +113,20 @@ const ChatInterface = () => {
     });
   };
 
+  // Show the turn's place in the server's wait queue (queue events)
+  const setQueuePosition = (position: number) => {
+    setMessages((prev) => {
+      if (prev.length === 0) return prev;
+      const newMessages = [...prev];
+      const lastIndex = newMessages.length - 1;
+      newMessages[lastIndex] = {
+        ...newMessages[lastIndex],
+        queuePosition: position,
+      };
+      return newMessages;
+    });
+  };
+
   // Finalize streaming text blocks (convert any remaining init_response to final_response)
   const finalizeTextBlocks = () => {
     setMessages((prev) => {
@@ -146,6 +162,7 @@ const ChatInterface = () => {
           .join("\n\n");
       last.content = finalText;
       last.isLoading = false;
+      last.queuePosition = undefined;
       last.timestamp = new Date();
 
       newMessages[lastIndex] = last;
@@ -231,6 +248,11 @@ const ChatInterface = () => {
                     tool_result: parsed.tool_result,
                   });
                   break;
+                case "queue": // the server is busy, the turn waits for a slot
+                  setQueuePosition(parsed.position);
+                  break;
+                case "session": // the chat session the turn belongs to
+                  break;
                 default: // if it's anything else log a warning of an unknown type
                   console.warn("Unknown SSE chunk type:", parsed.type);
               }
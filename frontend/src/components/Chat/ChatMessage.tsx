@@ -26,6 +26,9 @@ const ChatMessage = ({ message }: ChatMessageProps) => {
 
   // assistant
   const blocks = message.response?.blocks ?? [];
+  const loadingText = message.queuePosition
+    ? `Waiting for a free slot (#${message.queuePosition} in line)...`
+    : "Thinking...";
   const hasBlocks = blocks.length > 0;
 
   return (
@@ -90,7 +93,7 @@ const ChatMessage = ({ message }: ChatMessageProps) => {
               <div className="px-4 py-3 border-t border-gray-100">
                 <div className="flex items-center space-x-2">
                   <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-blue-600"></div>
-                  <span className="text-gray-600">Thinking...</span>
+                  <span className="text-gray-600">{loadingText}</span>
                 </div>
               </div>
             )}
@@ -108,7 +111,7 @@ const ChatMessage = ({ message }: ChatMessageProps) => {
               <div className="mt-2">
                 <div className="flex items-center space-x-2">
                   <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-blue-600"></div>
-                  <span className="text-gray-600">Thinking...</span>
+                  <span className="text-gray-600">{loadingText}</span>
                 </div>
               </div>
             ) : (
@@ -22,6 +22,7 @@ export interface Message {
   response?: ChatResponse;
   timestamp: Date;
   isLoading?: boolean;
+  queuePosition?: number; // place in the server's wait queue, until the turn starts
 }
 
 export interface ChatMessageProps {